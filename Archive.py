@@ -0,0 +1,594 @@
+"""Article archives: files storing the articles previously loaded for each ``Source``.
+
+Archives use the 'JSON Lines' format: one JSON dictionary per line, each describing a single
+article (see ``Source.ent_to_dict``).  New articles are appended to the end of the file, so that
+saving costs time and I/O proportional to the number of *new* articles, not the archive size.
+
+A sidecar 'keys' file (the archive filename, followed by the key method and ``KEYS_SUFFIX``)
+stores the key of each archived article, one JSON string per line.  The keys identify articles
+which have already been saved, without loading (or parsing) the archive itself; they are held in a
+``set`` so that each check is O(1).  After each save, the size of the archive (in bytes) is also
+written to the keys file, as a JSON number.  If the keys file is missing (e.g. because the key
+method has changed), or its last size does not match the archive (e.g. after an interrupted save),
+it is rebuilt from the archive, dropping any partial line.  Checking this only needs the size of
+the archive, not reading it.
+
+Articles are identified using one of the ``KEY_METHODS`` (see ``articleKey``):
+    'guid'  : the entry 'id' (RSS 'guid' or Atom 'id'), falling back to 'link', then 'hash'.
+    'link'  : the normalized article link, falling back to 'hash'.
+    'hash'  : a hash of the article title, link and summary.
+    'title' : the article title (the original behavior; distinct articles can be merged).
+
+Older archives, written as a single JSON list, are converted to the new format when they are next
+saved to, and can still be read directly.
+
+Alternatively (``Settings.archive_backend = 'sqlite'``), the articles of all sources are stored in
+a single SQLite database (``Settings.file_archive_db``), with indices on (source, time) and on
+(source, key).  The database uses write-ahead logging ('WAL'), and articles are inserted in
+batches, so the articles of many sources can be saved in a single transaction.
+
+Objects
+-------
+    JSONLArchive  : Append-only archive of article dictionaries for a single ``Source``.
+    ArticleDB     : SQLite database of article dictionaries for any number of sources.
+    SQLiteArchive : Archive of a single ``Source`` within an ``ArticleDB``.
+
+Functions
+---------
+    getArticleDB  : Get the (shared) ``ArticleDB`` object for the given database filename.
+    articleKey    : Construct the key identifying an article dictionary.
+    normalizeLink : Normalize a URL so that trivially different links compare equal.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import hashlib
+import io
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+except ImportError:
+    from urlparse import urlsplit, urlunsplit, parse_qsl
+    from urllib import urlencode
+
+import Settings
+
+KEYS_SUFFIX = '.keys'
+KEY_METHODS = ['guid', 'link', 'hash', 'title']
+BACKENDS = ['jsonl', 'sqlite']
+
+# Shared ``ArticleDB`` objects, by filename
+_DATABASES = {}
+_DATABASES_LOCK = threading.Lock()
+
+# Query parameters which only track the referrer, and are removed by ``normalizeLink``
+_TRACKING_PARAMS = ['fbclid', 'gclid', 'mc_cid', 'mc_eid', 'ref', 'cmpid', 'smid', 'partner']
+
+
+class JSONLArchive(object):
+    """Append-only archive of article dictionaries for a single ``Source``.
+
+    Methods
+    -------
+        keys      : Set of keys for all archived articles.
+        add       : Append article dictionaries whose keys are not already archived.
+        iterDicts : Iterate over the dictionaries of all archived articles.
+        exists    : Whether the archive exists.
+
+        _isLegacy      : Check whether the archive is in the old (single JSON list) format.
+        _convertLegacy : Rewrite an old-style archive in the JSON Lines format.
+        _readKeys      : Read the keys file: the set of keys, and the archive size last recorded.
+        _rebuildKeys   : Reconstruct the keys file from the archive itself.
+
+    """
+
+    def __init__(self, fname, method=None):
+        """
+        Arguments
+        ---------
+            fname  <str> : filename of the archive.
+            method <str> : method used to identify articles, one of ``KEY_METHODS``
+                           (`None` for ``Settings.dedup_key``).
+
+        """
+        method = _checkMethod(method)
+        self.fname = fname
+        self.method = method
+        self.keyfile = fname + '.' + method + KEYS_SUFFIX
+        self._keys = None
+        return
+
+    def keys(self):
+        """Set of keys for all archived articles (loaded from the keys file on first call).
+        """
+        if(self._keys is not None): return self._keys
+
+        if(os.path.exists(self.fname) and self._isLegacy()): self._convertLegacy()
+
+        keys, size = self._readKeys()
+        # Rebuild the keys if they are missing, or do not match the archive (interrupted save)
+        if(os.path.exists(self.fname) and size != os.path.getsize(self.fname)):
+            self._rebuildKeys()
+            keys, size = self._readKeys()
+
+        self._keys = keys
+        return keys
+
+    def add(self, dicts):
+        """Append article dictionaries whose keys are not already archived.
+
+        Arguments
+        ---------
+            dicts <dict>[N] : JSON-serializable article dictionaries (see ``Source.ent_to_dict``).
+
+        Returns
+        -------
+            numNew <int> : number of articles appended to the archive.
+
+        """
+        keys = self.keys()
+
+        newKeys = []
+        newLines = []
+        for dic in dicts:
+            kk = articleKey(dic, self.method)
+            if(kk in keys): continue
+            keys.add(kk)
+            newKeys.append(json.dumps(kk))
+            newLines.append(json.dumps(dic))
+
+        if(len(newLines) == 0): return 0
+
+        # Write the articles before their keys, then the new size of the archive.  If a save is
+        #    interrupted, the size no longer matches, and the keys are rebuilt from the archive
+        #    (without any partial line) the next time they are loaded; any partial line is also
+        #    removed before appending.
+        try:
+            _appendLines(self.fname, newLines)
+            newKeys.append(json.dumps(os.path.getsize(self.fname)))
+            _appendLines(self.keyfile, newKeys)
+        except:
+            self._keys = None
+            raise
+
+        return len(newLines)
+
+    def iterDicts(self):
+        """Iterate over the dictionaries of all archived articles, in the order they were saved.
+        """
+        if(not os.path.exists(self.fname)): return
+
+        if(self._isLegacy()):
+            with io.open(self.fname, 'r', encoding='utf-8') as data:
+                for dic in json.load(data):
+                    yield dic
+
+            return
+
+        with io.open(self.fname, 'r', encoding='utf-8') as data:
+            for line in data:
+                line = line.strip()
+                if(len(line) == 0): continue
+                # Skip lines which are incomplete (e.g. from an interrupted save)
+                try:
+                    dic = json.loads(line)
+                except ValueError:
+                    continue
+
+                yield dic
+
+        return
+
+    def exists(self):
+        """Whether the archive exists.
+        """
+        return os.path.exists(self.fname)
+
+    def _isLegacy(self):
+        """Check whether the archive is in the old format (a single JSON list).
+        """
+        with io.open(self.fname, 'r', encoding='utf-8') as data:
+            while(True):
+                ch = data.read(1)
+                if(len(ch) == 0 or not ch.isspace()): break
+
+        return (ch == '[')
+
+    def _convertLegacy(self):
+        """Rewrite an old-style archive (a single JSON list) in the JSON Lines format.
+        """
+        temp = self.fname + '.temp'
+        with io.open(temp, 'w', encoding='utf-8') as out:
+            for dic in self.iterDicts():
+                out.write(json.dumps(dic) + '\n')
+
+        os.remove(self.fname)
+        os.rename(temp, self.fname)
+        self._rebuildKeys()
+        return
+
+    def _readKeys(self):
+        """Read the keys file: the set of keys, and the archive size last recorded.
+
+        The size is `None` if the keys file is missing, incomplete, or does not end with a size.
+        """
+        keys = set()
+        size = None
+        if(not os.path.exists(self.keyfile)): return keys, size
+
+        with io.open(self.keyfile, 'r', encoding='utf-8') as keyfile:
+            for line in keyfile:
+                if(not line.endswith('\n')): return keys, None
+                line = line.strip()
+                if(len(line) == 0): continue
+                try:
+                    val = json.loads(line)
+                except ValueError:
+                    return keys, None
+
+                if(isinstance(val, int)):
+                    size = val
+                else:
+                    keys.add(val)
+                    size = None
+
+        return keys, size
+
+    def _rebuildKeys(self):
+        """Reconstruct the keys file from the archive itself.
+
+        Lines of the archive which cannot be read (e.g. from an interrupted save) are dropped, and
+        the size of the rewritten archive is recorded at the end of the keys file.
+        """
+        tempData = self.fname + '.temp'
+        tempKeys = self.keyfile + '.temp'
+        with io.open(tempData, 'w', encoding='utf-8') as data, \
+                io.open(tempKeys, 'w', encoding='utf-8') as keys:
+            for dic in self.iterDicts():
+                data.write(json.dumps(dic) + '\n')
+                keys.write(json.dumps(articleKey(dic, self.method)) + '\n')
+
+            data.flush()
+            keys.write(json.dumps(os.path.getsize(tempData)) + '\n')
+
+        for temp, fname in [(tempData, self.fname), (tempKeys, self.keyfile)]:
+            if(os.path.exists(fname)): os.remove(fname)
+            os.rename(temp, fname)
+
+        return
+
+
+class ArticleDB(object):
+    """SQLite database of article dictionaries for any number of sources.
+
+    A single connection is shared between threads, and guarded by a lock.  Use ``getArticleDB``
+    to get the shared object for a given filename.
+
+    Methods
+    -------
+        transaction : Context manager grouping many operations into a single transaction.
+        add         : Insert article dictionaries for a source, ignoring those already stored.
+        iterDicts   : Iterate over the article dictionaries of a source, in the order saved.
+        count       : Number of articles stored for a source (or for all sources).
+        close       : Close the database connection.
+
+        _checkMethod : Make sure stored keys were constructed with the given key method.
+
+    """
+
+    _SCHEMA = [
+        "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)",
+        "CREATE TABLE IF NOT EXISTS articles ("
+        "id INTEGER PRIMARY KEY, source TEXT NOT NULL, key TEXT NOT NULL, time REAL, "
+        "data TEXT NOT NULL)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS articles_source_key ON articles (source, key)",
+        "CREATE INDEX IF NOT EXISTS articles_source_time ON articles (source, time)",
+    ]
+    _KEY_INDEX = _SCHEMA[2]
+
+    def __init__(self, fname):
+        self.fname = fname
+        dname = os.path.dirname(fname)
+        if(len(dname) > 0 and not os.path.exists(dname)): os.makedirs(dname)
+
+        self._lock = threading.RLock()
+        self._depth = 0
+        import sqlite3
+        self._conn = sqlite3.connect(fname, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for stmt in self._SCHEMA:
+            self._conn.execute(stmt)
+
+        self._methods = set()
+        return
+
+    @contextmanager
+    def transaction(self):
+        """Context manager grouping many operations into a single transaction (can be nested).
+        """
+        with self._lock:
+            if(self._depth == 0): self._conn.execute("BEGIN")
+            self._depth += 1
+            try:
+                yield self._conn
+            except:
+                self._depth -= 1
+                if(self._depth == 0): self._conn.execute("ROLLBACK")
+                raise
+
+            self._depth -= 1
+            if(self._depth == 0): self._conn.execute("COMMIT")
+
+        return
+
+    def add(self, source, dicts, method=None):
+        """Insert article dictionaries for a source, ignoring those whose keys are already stored.
+
+        Arguments
+        ---------
+            source <str>     : identifier of the source (its URL).
+            dicts  <dict>[N] : JSON-serializable article dictionaries.
+            method <str>     : key method, one of ``KEY_METHODS`` (`None` for ``Settings``).
+
+        Returns
+        -------
+            numNew <int> : number of articles inserted.
+
+        """
+        method = _checkMethod(method)
+        rows = []
+        for dic in dicts:
+            tt = _dictTime(dic)
+            rows.append((source, articleKey(dic, method), tt, json.dumps(dic)))
+
+        if(len(rows) == 0): return 0
+
+        with self.transaction() as conn:
+            self._checkMethod(method)
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO articles (source, key, time, data) "
+                             "VALUES (?, ?, ?, ?)", rows)
+            numNew = conn.total_changes - before
+
+        return numNew
+
+    def iterDicts(self, source, batch=1000):
+        """Iterate over the article dictionaries of a source, in the order they were saved.
+        """
+        with self._lock:
+            rows = self._conn.execute("SELECT id, data FROM articles WHERE source = ? "
+                                      "ORDER BY id LIMIT ?", (source, batch)).fetchall()
+
+        while(len(rows) > 0):
+            for _, data in rows:
+                yield json.loads(data)
+
+            last = rows[-1][0]
+            with self._lock:
+                rows = self._conn.execute("SELECT id, data FROM articles WHERE source = ? AND "
+                                          "id > ? ORDER BY id LIMIT ?",
+                                          (source, last, batch)).fetchall()
+
+        return
+
+    def count(self, source=None):
+        """Number of articles stored for a source (or for all sources, if `None`).
+        """
+        with self._lock:
+            if(source is None): cur = self._conn.execute("SELECT COUNT(*) FROM articles")
+            else: cur = self._conn.execute("SELECT COUNT(*) FROM articles WHERE source = ?",
+                                           (source,))
+            return cur.fetchone()[0]
+
+    def close(self):
+        """Close the database connection.
+        """
+        with _DATABASES_LOCK:
+            if(_DATABASES.get(self.fname) is self): del _DATABASES[self.fname]
+
+        with self._lock:
+            self._conn.close()
+
+        return
+
+    def _checkMethod(self, method):
+        """Make sure stored keys were constructed with ``method``, recompute them if not.
+
+        Articles which become duplicates under the new method (i.e. same source and key) are
+        merged, keeping only the newest (latest time, then latest saved).  The unique index on
+        (source, key) is dropped while keys are recomputed, and then rebuilt.
+
+        Must be called within a transaction (so that an interrupted change leaves the old keys).
+        """
+        if(method in self._methods): return
+
+        row = self._conn.execute("SELECT value FROM meta WHERE name = 'key_method'").fetchone()
+        if(row is not None and row[0] != method):
+            rows = self._conn.execute("SELECT id, source, time, data FROM articles").fetchall()
+            newest = {}
+            for ii, source, tt, data in rows:
+                kk = (source, articleKey(json.loads(data), method))
+                rank = (tt is not None, tt or 0.0, ii)
+                if(kk not in newest or rank > newest[kk][0]): newest[kk] = (rank, ii)
+
+            keep = set(ii for _, ii in newest.values())
+            self._conn.execute("DROP INDEX IF EXISTS articles_source_key")
+            self._conn.executemany("DELETE FROM articles WHERE id = ?",
+                                   [(ii,) for ii, _, _, _ in rows if ii not in keep])
+            self._conn.executemany("UPDATE articles SET key = ? WHERE id = ?",
+                                   [(kk[1], ii) for kk, (_, ii) in newest.items()])
+            self._conn.execute(self._KEY_INDEX)
+
+        self._conn.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('key_method', ?)",
+                           (method,))
+        self._methods = set([method])
+        return
+
+
+class SQLiteArchive(object):
+    """Archive of a single ``Source`` within an ``ArticleDB`` (same interface as ``JSONLArchive``).
+    """
+
+    def __init__(self, fname, source, method=None):
+        """
+        Arguments
+        ---------
+            fname  <str> : filename of the database.
+            source <str> : identifier of the source (its URL).
+            method <str> : method used to identify articles, one of ``KEY_METHODS``.
+
+        """
+        self.fname = fname
+        self.source = source
+        self.method = _checkMethod(method)
+        self.db = getArticleDB(fname)
+        return
+
+    def add(self, dicts):
+        return self.db.add(self.source, dicts, self.method)
+
+    def iterDicts(self):
+        return self.db.iterDicts(self.source)
+
+    def exists(self):
+        return (self.db.count(self.source) > 0)
+
+
+def getArticleDB(fname=None):
+    """Get the (shared) ``ArticleDB`` object for the given filename (`None` for ``Settings``).
+    """
+    if(fname is None): fname = Settings.Settings().file_archive_db
+    with _DATABASES_LOCK:
+        db = _DATABASES.get(fname)
+        if(db is None):
+            db = ArticleDB(fname)
+            _DATABASES[fname] = db
+
+    return db
+
+
+def _checkMethod(method):
+    """Return the given key method (`None` for ``Settings.dedup_key``) after checking it is valid.
+    """
+    if(method is None): method = Settings.Settings().dedup_key
+    if(method not in KEY_METHODS):
+        raise ValueError("Unrecognized key method '%s', must be one of %s" %
+                         (method, str(KEY_METHODS)))
+
+    return method
+
+
+def _dictTime(dic):
+    """Time (seconds since the epoch) of an article dictionary: 'updated', else 'published'.
+    """
+    for key in ['updated_parsed', 'published_parsed']:
+        val = dic.get(key)
+        if(val is None): continue
+        try:
+            return float(val)
+        except (TypeError, ValueError):
+            continue
+
+    return None
+
+
+def _appendLines(fname, lines):
+    """Append the given strings to a file, one per line (after removing any partial last line).
+    """
+    _truncatePartial(fname)
+    with io.open(fname, 'a', encoding='utf-8') as out:
+        out.write('\n'.join(lines) + '\n')
+
+    return
+
+
+def _truncatePartial(fname, chunk=4096):
+    """Remove a partial (not newline terminated) last line from a file, e.g. from an interrupted
+    write, so that appended lines are not joined to it.
+    """
+    if(not os.path.exists(fname)): return
+    with io.open(fname, 'rb+') as data:
+        end = data.seek(0, io.SEEK_END)
+        if(end == 0): return
+        data.seek(end - 1)
+        if(data.read(1) == b'\n'): return
+
+        # Search backwards for the end of the last complete line
+        pos = end
+        while(pos > 0):
+            beg = max(pos - chunk, 0)
+            data.seek(beg)
+            idx = data.read(pos - beg).rfind(b'\n')
+            if(idx >= 0):
+                data.truncate(beg + idx + 1)
+                return
+            pos = beg
+
+        data.truncate(0)
+
+    return
+
+
+def articleKey(dic, method='guid'):
+    """Construct the key identifying an article dictionary.
+
+    Keys are prefixed by the type of value used (e.g. 'link:'), so that keys from different
+    fallbacks can never collide.
+
+    Arguments
+    ---------
+        dic    <dict> : article dictionary (i.e. a feedparser entry, or its saved form).
+        method <str>  : one of ``KEY_METHODS``.
+
+    Returns
+    -------
+        key    <str>  : key for this article.
+
+    """
+    if(method == 'title'):
+        return 'title:' + (dic.get('title') or '')
+
+    if(method == 'guid'):
+        guid = (dic.get('id') or '').strip()
+        if(len(guid) > 0): return 'id:' + guid
+        method = 'link'
+
+    if(method == 'link'):
+        link = normalizeLink(dic.get('link') or '')
+        if(len(link) > 0): return 'link:' + link
+
+    # Hash of the content (also used as a fallback by the other methods)
+    title = ' '.join((dic.get('title') or '').split())
+    content = '\n'.join([title, normalizeLink(dic.get('link') or ''), dic.get('summary') or ''])
+    return 'sha1:' + hashlib.sha1(content.encode('utf-8')).hexdigest()
+
+
+def normalizeLink(link):
+    """Normalize a URL so that trivially different links compare equal.
+
+    The scheme, fragment, trailing slashes, 'www.' prefix and tracking query parameters (e.g.
+    'utm_source') are removed, the host is lower-cased, and the remaining query is sorted.
+    e.g. 'HTTPS://www.A.com/b/?utm_source=rss&y=2&x=1#top' ==> 'a.com/b?x=1&y=2'
+
+    """
+    link = link.strip()
+    if(len(link) == 0): return ''
+
+    try:
+        parts = urlsplit(link)
+    except ValueError:
+        return link
+
+    host = parts.netloc.lower()
+    if(host.startswith('www.')): host = host[4:]
+    path = parts.path.rstrip('/')
+    query = [(kk, vv) for kk, vv in parse_qsl(parts.query, keep_blank_values=True)
+             if not (kk.startswith('utm_') or kk in _TRACKING_PARAMS)]
+    query = urlencode(sorted(query))
+
+    return urlunsplit(('', host, path, query, '')).lstrip('/')
@@ -0,0 +1,211 @@
+"""Columnar storage of many articles, for fast (vectorized) bulk queries.
+
+Each article is stored as one element in each of a set of parallel ``numpy`` arrays: its time
+(seconds since the epoch, `NaN` if unknown), the index of its source, and the indices of its title
+and link in lists of unique (interned) strings.  Articles are added to Python lists, which are
+converted to arrays the first time a query is made after adding.
+
+Objects
+-------
+    ArticleStore : Columnar store of article times, source indices, titles and links.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import numpy as np
+
+import Source
+
+
+class ArticleStore(object):
+    """Columnar store of article times, source indices, titles and links.
+
+    Methods
+    -------
+        fromSources : Construct a store from the articles of the given sources.
+        addArticles : Add ``Article`` objects belonging to a single source.
+        addDicts    : Add archived article dictionaries belonging to a single source.
+        mostRecent  : Time of the most recent article for each source (or one source).
+        window      : Indices of articles within a time window, newest first.
+        counts      : Number of articles from each source (optionally within a time window).
+        titles      : Titles of the articles with the given indices.
+        links       : Links of the articles with the given indices.
+
+        _intern      : Get the index of a string in an interned list, adding it if needed.
+        _consolidate : Convert pending additions into the ``numpy`` arrays.
+
+    """
+
+    def __init__(self, urls=None):
+        """
+        Arguments
+        ---------
+            urls <str>[M] : URLs of sources, where the index of each is its source number.
+
+        """
+        self.urls = [] if (urls is None) else list(urls)
+
+        # Columns
+        self.time = np.zeros(0, dtype=np.float64)
+        self.source = np.zeros(0, dtype=np.int32)
+        self.title_id = np.zeros(0, dtype=np.int32)
+        self.link_id = np.zeros(0, dtype=np.int32)
+
+        # Interned strings
+        self._titles = []
+        self._title_ids = {}
+        self._links = []
+        self._link_ids = {}
+
+        # Additions not yet converted to arrays, and order of articles by time (built on demand)
+        self._pending = ([], [], [], [])
+        self._order = None
+        self._sorted = None
+        return
+
+    def __len__(self):
+        return self.time.size + len(self._pending[0])
+
+    @classmethod
+    def fromSources(cls, sources, archived=False):
+        """Construct a store from the articles of the given sources.
+
+        Arguments
+        ---------
+            sources  <obj>[M] : ``Source`` objects, their indices are used as source numbers.
+            archived <bool>   : use articles from each source's archive file, instead of those
+                                currently loaded in memory (``Source.articles``).
+
+        Returns
+        -------
+            store    <obj>    : ``ArticleStore`` object.
+
+        """
+        store = cls([src.url for src in sources])
+        for ii, src in enumerate(sources):
+            if(archived): store.addDicts(ii, src._archive().iterDicts())
+            else:         store.addArticles(ii, src.articles)
+
+        return store
+
+    def addArticles(self, index, arts):
+        """Add ``Article`` objects belonging to the source with number ``index``.
+        """
+        times, srcs, tids, lids = self._pending
+        for art in arts:
+            times.append(np.nan if (art.time is None) else art.time)
+            srcs.append(index)
+            tids.append(self._intern(art.title, self._titles, self._title_ids))
+            lids.append(self._intern(art.link, self._links, self._link_ids))
+
+        return
+
+    def addDicts(self, index, dicts):
+        """Add archived article dictionaries belonging to the source with number ``index``.
+
+        Uses the same conventions as ``Source.Article``: the 'updated' time is used if it exists,
+        otherwise the 'published' time.
+        """
+        times, srcs, tids, lids = self._pending
+        for dic in dicts:
+            tt = Source._toEpoch(dic.get('updated_parsed'))
+            if(tt is None): tt = Source._toEpoch(dic.get('published_parsed'))
+            times.append(np.nan if (tt is None) else tt)
+            srcs.append(index)
+            tids.append(self._intern(dic.get('title'), self._titles, self._title_ids))
+            lids.append(self._intern(dic.get('link'), self._links, self._link_ids))
+
+        return
+
+    def mostRecent(self, index=None):
+        """Time of the most recent article for each source, or for the source number ``index``.
+
+        Returns
+        -------
+            recent <flt>([M]) : times in seconds since the epoch, `NaN` for sources without times.
+
+        """
+        self._consolidate()
+        if(index is not None):
+            times = self.time[self.source == index]
+            times = times[np.isfinite(times)]
+            return times.max() if times.size > 0 else np.nan
+
+        num = len(self.urls)
+        if(self.source.size > 0): num = max(num, int(self.source.max()) + 1)
+        recent = np.full(num, np.nan)
+        np.fmax.at(recent, self.source, self.time)
+        return recent
+
+    def window(self, since=None, until=None, index=None):
+        """Indices of articles with times in the window [``since``, ``until``), newest first.
+
+        Arguments
+        ---------
+            since <flt> : earliest time (seconds since the epoch), `None` for no limit.
+            until <flt> : latest time (exclusive), `None` for no limit.
+            index <int> : only include articles from this source number (`None` for all).
+
+        Returns
+        -------
+            inds  <int>[N] : indices of matching articles.
+
+        """
+        self._consolidate()
+        times = self._sorted
+        lo = 0 if (since is None) else np.searchsorted(times, since, side='left')
+        hi = times.size if (until is None) else np.searchsorted(times, until, side='left')
+        inds = self._order[lo:hi][::-1]
+        if(index is not None): inds = inds[self.source[inds] == index]
+        return inds
+
+    def counts(self, since=None, until=None):
+        """Number of articles from each source, optionally within a time window (see ``window``).
+        """
+        self._consolidate()
+        if(since is None and until is None): srcs = self.source
+        else:                                srcs = self.source[self.window(since, until)]
+        return np.bincount(srcs, minlength=len(self.urls)).astype(int)
+
+    def titles(self, inds):
+        """Titles of the articles with the given indices.
+        """
+        self._consolidate()
+        return [self._titles[ii] for ii in self.title_id[inds]]
+
+    def links(self, inds):
+        """Links of the articles with the given indices.
+        """
+        self._consolidate()
+        return [self._links[ii] for ii in self.link_id[inds]]
+
+    def _intern(self, val, vals, ids):
+        """Get the index of string ``val`` in the list ``vals``, adding it if needed.
+        """
+        ii = ids.get(val)
+        if(ii is None):
+            ii = len(vals)
+            vals.append(val)
+            ids[val] = ii
+
+        return ii
+
+    def _consolidate(self):
+        """Convert pending additions into the ``numpy`` arrays, and update the order by time.
+        """
+        times, srcs, tids, lids = self._pending
+        if(len(times) > 0):
+            self.time = np.concatenate([self.time, np.array(times, dtype=np.float64)])
+            self.source = np.concatenate([self.source, np.array(srcs, dtype=np.int32)])
+            self.title_id = np.concatenate([self.title_id, np.array(tids, dtype=np.int32)])
+            self.link_id = np.concatenate([self.link_id, np.array(lids, dtype=np.int32)])
+            self._pending = ([], [], [], [])
+            self._order = None
+
+        # Indices of articles with known times, sorted by time (``argsort`` places `NaN` last)
+        if(self._order is None):
+            order = np.argsort(self.time, kind='stable')
+            self._order = order[:np.count_nonzero(np.isfinite(self.time))]
+            self._sorted = self.time[self._order]
+
+        return
@@ -0,0 +1,428 @@
+"""Benchmark the feed pipeline against a local server of synthetic feeds.
+
+An in-process HTTP server (``FeedServer``) serves any number of synthetic RSS or Atom feeds, each
+with a configurable number of articles, summary length and response latency.  A ``SourceList`` of
+these feeds is built in a temporary directory, and each stage of the pipeline is timed:
+    'getFeeds'     : ``SourceList.getFeeds`` (download and parse all feeds, construct articles).
+    'makeArticles' : ``Source.makeArticles`` on all downloaded entries.
+    'saveArticles' : ``SourceList.saveArticles`` into empty archives.
+    'loadArticles' : ``Source.loadArticles`` for every source.
+    'loadSources'  : constructing a ``SourceList`` (with its default logger) from the save file.
+Each stage is repeated, and the minimum, median and maximum times are reported as JSON, along
+with the number of items processed and the throughput (items per second, based on the median).
+
+The time to import each of the main modules is also measured (``importTimes``), each in a fresh
+interpreter, along with which heavy dependencies (e.g. ``feedparser``, ``numpy``) they load.
+
+No network access is needed, so results are reproducible offline, e.g.
+    $ python Benchmark.py --feeds 50 --items 100 --latency 0.05 --output bench.json
+
+Objects
+-------
+    FeedServer : HTTP server of synthetic feeds, running in a background thread.
+
+Functions
+---------
+    makeFeed    : Construct the XML of a synthetic RSS or Atom feed.
+    benchmark   : Time each stage of the pipeline, returning the results.
+    importTimes : Time importing each module in a fresh interpreter.
+    main        : Run the benchmark from the command line, printing (or saving) JSON results.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+
+import Settings
+
+FEED_TYPES = ['rss', 'atom']
+STAGES = ['getFeeds', 'makeArticles', 'saveArticles', 'loadArticles', 'loadSources']
+IMPORT_MODULES = ['Settings', 'MyLogger', 'Source', 'SourceList', 'Feeder']
+HEAVY_MODULES = ['feedparser', 'bs4', 'numpy', 'configobj', 'zcode']
+
+# Run in a fresh interpreter to time an import, printing the time and heavy modules loaded
+_IMPORT_CODE = ("import json, sys, time; beg = time.time(); import {mod}; dur = time.time() - beg; "
+                "print(json.dumps([dur, [mm for mm in {heavy} if mm in sys.modules]]))")
+
+# Time between the synthetic articles of each feed (seconds), and time of the newest one
+_ARTICLE_GAP = 3600.0
+_EPOCH = 1.5e9
+
+_WORDS = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+          "incididunt ut labore et dolore magna aliqua").split()
+
+
+class FeedServer(object):
+    """HTTP server of synthetic feeds, running in a background thread.
+
+    Feed number ``ii`` is served from '/feed/<ii>.xml'; feeds are constructed on first request
+    and cached.  Each response is delayed by ``latency`` seconds.  Connections are kept alive
+    ('HTTP/1.1'), as by most real servers.
+
+    Methods
+    -------
+        start : Start serving (on a free port) in a background thread.
+        stop  : Stop serving.
+        url   : URL of the feed with the given number.
+
+    """
+
+    def __init__(self, num_items=100, kind='rss', latency=0.0, summary_len=50):
+        """
+        Arguments
+        ---------
+            num_items   <int> : number of articles in each feed.
+            kind        <str> : type of feed, one of ``FEED_TYPES``.
+            latency     <flt> : delay (seconds) before each response.
+            summary_len <int> : number of words in each article summary.
+
+        """
+        if(kind not in FEED_TYPES):
+            raise ValueError("Unrecognized feed type '%s', must be one of %s" %
+                             (kind, str(FEED_TYPES)))
+
+        self.num_items = num_items
+        self.kind = kind
+        self.latency = latency
+        self.summary_len = summary_len
+        self.num_requests = 0
+        self._feeds = {}
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+        return
+
+    def start(self):
+        """Start serving (on a free port) in a background thread.
+        """
+        server = self
+
+        class _Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                server._respond(self)
+
+            def log_message(self, *args):
+                pass
+
+        class _Server(ThreadingMixIn, HTTPServer):
+            daemon_threads = True
+
+        self._server = _Server(('127.0.0.1', 0), _Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return
+
+    def stop(self):
+        """Stop serving.
+        """
+        if(self._server is None): return
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+        self._server = None
+        self._thread = None
+        return
+
+    def url(self, index):
+        """URL of the feed with number ``index``.
+        """
+        host, port = self._server.server_address[:2]
+        return "http://%s:%d/feed/%d.xml" % (host, port, index)
+
+    def _feed(self, index):
+        """Body of the feed with number ``index`` (constructed on first use).
+        """
+        with self._lock:
+            self.num_requests += 1
+            body = self._feeds.get(index)
+            if(body is None):
+                body = makeFeed(index, self.num_items, self.kind, self.summary_len)
+                body = body.encode('utf-8')
+                self._feeds[index] = body
+
+        return body
+
+    def _respond(self, handler):
+        """Respond to a request of the given ``BaseHTTPRequestHandler``.
+        """
+        if(self.latency > 0): time.sleep(self.latency)
+
+        name = handler.path.split('/')[-1]
+        try:
+            index = int(name.split('.')[0])
+            body = self._feed(index)
+        except ValueError:
+            handler.send_error(404)
+            return
+
+        ctype = 'application/atom+xml' if (self.kind == 'atom') else 'application/rss+xml'
+        handler.send_response(200)
+        handler.send_header('Content-Type', ctype + '; charset=utf-8')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+        return
+
+
+def makeFeed(index, num_items, kind='rss', summary_len=50):
+    """Construct the XML of a synthetic RSS or Atom feed.
+
+    Articles are one ``_ARTICLE_GAP`` apart, newest first, with unique links and ids.
+
+    Arguments
+    ---------
+        index       <int> : number of this feed (used in titles, links and ids).
+        num_items   <int> : number of articles.
+        kind        <str> : type of feed, one of ``FEED_TYPES``.
+        summary_len <int> : number of words in each article summary.
+
+    Returns
+    -------
+        xml <str> : feed document.
+
+    """
+    link = "http://feed%d.example.com/" % (index)
+    items = []
+    for jj in range(num_items):
+        tt = _EPOCH - jj*_ARTICLE_GAP
+        words = [_WORDS[(jj + kk) % len(_WORDS)] for kk in range(summary_len)]
+        summary = "&lt;p&gt;%s &lt;b&gt;%d&lt;/b&gt;&lt;/p&gt;" % (" ".join(words), jj)
+        title = "Feed %d, article %d" % (index, jj)
+        art = "%sarticle/%d" % (link, jj)
+        if(kind == 'atom'):
+            stamp = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(tt))
+            items.append(
+                "<entry><title>%s</title><link href=\"%s\"/><id>%s</id><updated>%s</updated>"
+                "<summary type=\"html\">%s</summary></entry>" % (title, art, art, stamp, summary))
+        else:
+            stamp = time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(tt))
+            items.append(
+                "<item><title>%s</title><link>%s</link><guid>%s</guid><pubDate>%s</pubDate>"
+                "<description>%s</description></item>" % (title, art, art, stamp, summary))
+
+    items = "\n".join(items)
+    if(kind == 'atom'):
+        stamp = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(_EPOCH))
+        return ("<?xml version=\"1.0\" encoding=\"utf-8\"?>\n"
+                "<feed xmlns=\"http://www.w3.org/2005/Atom\"><title>Feed %d</title>"
+                "<link href=\"%s\"/><id>%s</id><updated>%s</updated>\n%s\n</feed>\n" %
+                (index, link, link, stamp, items))
+
+    return ("<?xml version=\"1.0\" encoding=\"utf-8\"?>\n"
+            "<rss version=\"2.0\"><channel><title>Feed %d</title><link>%s</link>"
+            "<description>Synthetic feed</description>\n%s\n</channel></rss>\n" %
+            (index, link, items))
+
+
+def benchmark(num_feeds=20, num_items=100, kind='rss', latency=0.0, summary_len=50, repeats=3,
+              workers=None, backend=None, search=False):
+    """Time each stage of the pipeline, returning the results.
+
+    Every repetition uses a new temporary data directory (so archives and the search index start
+    empty), and the ``Settings`` changed for the benchmark are restored afterwards.
+
+    Arguments
+    ---------
+        num_feeds   <int> : number of feeds (sources).
+        num_items   <int> : number of articles in each feed.
+        kind        <str> : type of feed, one of ``FEED_TYPES``.
+        latency     <flt> : server delay (seconds) before each response.
+        summary_len <int> : number of words in each article summary.
+        repeats     <int> : number of times each stage is repeated.
+        workers     <int> : maximum number of simultaneous fetches (`None` for ``Settings``).
+        backend     <str> : archive backend (`None` for ``Settings``), see ``Archive.BACKENDS``.
+        search      <bool> : index saved articles for search (timed as part of 'saveArticles').
+
+    Returns
+    -------
+        results <dict> : parameters and environment ('config'), and for each of ``STAGES`` the
+                         number of items ('count'), and times in seconds ('min', 'median', 'max')
+                         and throughput ('rate', items per second).
+
+    """
+    import Archive
+    import Search
+    import SourceList
+    import Source
+
+    sets = Settings.Settings()
+    if(backend is None): backend = sets.archive_backend
+    keys = ['dir_data', 'dir_log', 'file_sourcelist', 'file_archive_db', 'archive_backend',
+            'file_search_index', 'search_index', 'verbose', 'debug']
+    saved = dict((nn, getattr(sets, nn)) for nn in keys)
+
+    # Keep the benchmark quiet
+    log = logging.getLogger('Benchmark')
+    log.addHandler(logging.NullHandler())
+    log.propagate = False
+
+    server = FeedServer(num_items=num_items, kind=kind, latency=latency, summary_len=summary_len)
+    server.start()
+    times = dict((stage, []) for stage in STAGES)
+    counts = dict((stage, 0) for stage in STAGES)
+    try:
+        for _ in range(max(int(repeats), 1)):
+            tmp = tempfile.mkdtemp(prefix='feeder_bench_')
+            try:
+                sets.dir_data = os.path.join(tmp, 'data', '')
+                sets.dir_log = os.path.join(tmp, 'log', '')
+                sets.file_sourcelist = sets.dir_data + "sourcelist.conf"
+                sets.file_archive_db = sets.dir_data + "articles.db"
+                sets.file_search_index = sets.dir_data + "search.db"
+                sets.search_index = search
+                sets.archive_backend = backend
+                os.makedirs(sets.dir_data)
+
+                sourceList = SourceList.SourceList(log=log, sets=sets)
+                # Names keep archive filenames distinct (all feeds share a host)
+                urls = [server.url(ii) for ii in range(num_feeds)]
+                names = ["Feed %d" % (ii) for ii in range(num_feeds)]
+                sourceList.add(urls, names, check=False)
+                srcs = sourceList.sources
+
+                beg = time.time()
+                sourceList.getFeeds(workers=workers)
+                times['getFeeds'].append(time.time() - beg)
+                counts['getFeeds'] = len(srcs)
+
+                ents = [ent for src in srcs if (src.valid and not src.not_modified)
+                        for ent in src._feed.entries]
+                beg = time.time()
+                Source.makeArticles(ents)
+                times['makeArticles'].append(time.time() - beg)
+                counts['makeArticles'] = len(ents)
+
+                beg = time.time()
+                counts['saveArticles'] = sourceList.saveArticles()
+                times['saveArticles'].append(time.time() - beg)
+
+                beg = time.time()
+                counts['loadArticles'] = sum(len(src.loadArticles()) for src in srcs)
+                times['loadArticles'].append(time.time() - beg)
+
+                # Quiet the default logger, which logs to a file in the temporary directory
+                sourceList.save(inter=False)
+                sets.verbose = False
+                sets.debug = False
+                beg = time.time()
+                counts['loadSources'] = SourceList.SourceList(sets=sets).count
+                times['loadSources'].append(time.time() - beg)
+
+            finally:
+                if(backend == 'sqlite'): Archive.getArticleDB(sets.file_archive_db).close()
+                if(search): Search.getIndex(sets.file_search_index).close()
+                shutil.rmtree(tmp, ignore_errors=True)
+
+    finally:
+        server.stop()
+        for nn, vv in saved.items():
+            setattr(sets, nn, vv)
+
+    config = dict(feeds=num_feeds, items=num_items, kind=kind, latency=latency,
+                  summary_len=summary_len, repeats=repeats, workers=workers, backend=backend,
+                  search=search,
+                  version=Settings.__version__, python=sys.version.split()[0],
+                  time=time.strftime("%Y-%m-%dT%H:%M:%S"))
+    results = dict(config=config)
+    for stage in STAGES:
+        tt = sorted(times[stage])
+        med = tt[len(tt)//2]
+        rate = counts[stage]/med if (med > 0) else None
+        results[stage] = dict(count=counts[stage], min=tt[0], median=med, max=tt[-1], rate=rate)
+
+    return results
+
+
+def importTimes(modules=None, repeats=5):
+    """Time importing each module in a fresh interpreter.
+
+    Arguments
+    ---------
+        modules <str>[N] : names of modules to import (`None` for ``IMPORT_MODULES``).
+        repeats <int>    : number of times each import is repeated.
+
+    Returns
+    -------
+        results <dict> : for each module, times in seconds ('min', 'median', 'max'), and the
+                         heavy dependencies (of ``HEAVY_MODULES``) loaded by the import ('heavy').
+
+    """
+    if(modules is None): modules = IMPORT_MODULES
+    path = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([path] + [pp for pp in [env.get('PYTHONPATH')] if pp])
+
+    results = {}
+    for mod in modules:
+        code = _IMPORT_CODE.format(mod=mod, heavy=repr(HEAVY_MODULES))
+        times = []
+        for _ in range(max(int(repeats), 1)):
+            out = subprocess.check_output([sys.executable, '-c', code], cwd=path, env=env)
+            dur, heavy = json.loads(out.decode('utf-8').strip().splitlines()[-1])
+            times.append(dur)
+
+        times = sorted(times)
+        results[mod] = dict(min=times[0], median=times[len(times)//2], max=times[-1],
+                            heavy=heavy)
+
+    return results
+
+
+def main():
+    """Run the benchmark from the command line, printing (or saving) JSON results.
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the Feeder pipeline.")
+    parser.add_argument("--feeds", type=int, default=20, help="number of feeds.")
+    parser.add_argument("--items", type=int, default=100, help="number of articles per feed.")
+    parser.add_argument("--kind", default='rss', choices=FEED_TYPES, help="type of feeds.")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="server delay (seconds) before each response.")
+    parser.add_argument("--summary", type=int, default=50,
+                        help="number of words in each article summary.")
+    parser.add_argument("--repeats", type=int, default=3, help="repetitions of each stage.")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="maximum number of feeds to fetch simultaneously.")
+    parser.add_argument("--backend", default=None, help="archive backend, 'jsonl' or 'sqlite'.")
+    parser.add_argument("--search", action='store_true',
+                        help="index saved articles for full-text search.")
+    parser.add_argument("--import-repeats", type=int, default=5,
+                        help="repetitions of each import timing (0 to skip).")
+    parser.add_argument("-o", "--output", default=None, help="file to save results to.")
+    args = parser.parse_args()
+
+    results = benchmark(num_feeds=args.feeds, num_items=args.items, kind=args.kind,
+                        latency=args.latency, summary_len=args.summary, repeats=args.repeats,
+                        workers=args.workers, backend=args.backend, search=args.search)
+    if(args.import_repeats > 0):
+        results['imports'] = importTimes(repeats=args.import_repeats)
+
+    out = json.dumps(results, indent=2, sort_keys=True)
+    if(args.output is None):
+        print(out)
+    else:
+        with open(args.output, 'w') as outfile:
+            outfile.write(out + "\n")
+
+    return
+
+
+if(__name__ == "__main__"): main()
@@ -5,9 +5,11 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 from datetime import datetime
 
+import Poller
 import Settings
 import SourceList
 import MyLogger
+import Stats
 
 
 _LOG_FILENAME = "feeder.log"
@@ -36,20 +38,55 @@ def main():
     # Load Sources
     log.info("Initializing SourceList")
     sourceList = SourceList.SourceList(log=log, sets=sets)
-    log.info("Loading Feeds")
-    # sourceList.getFeeds()
-
-    # Print New Articles
-    for ii, src in enumerate(sourceList.sources):
-        src.getFeed()
-        print("{0:3d} : {1}".format(ii, src.str()))
 
-        if(src.valid):
-            for jj, art in enumerate(src.articles):
-                print("\t{0:3d} : {1}".format(jj, art.str()))
+    # Keep polling sources until interrupted
+    if(sets.daemon):
+        log.info("Polling Feeds")
+        Poller.Poller(sourceList, log=log, sets=sets).run()
+        writeStats(sets, log)
+        end = datetime.now()
+        log.info("Done After %s\n" % (str(end-beg)))
+        return
 
-        else:
-            print("\tINVALID")
+    log.info("Loading Feeds")
+    sourceList.getFeeds()
+
+    # Print newest articles from all sources together
+    if(sets.river > 0 and sets.collapse):
+        for ii, (src, art, dups) in enumerate(sourceList.river(limit=sets.river, collapse=True)):
+            print("{0:3d} : {1} : {2}".format(ii, art.str(), src.title))
+            if(len(dups) > 0):
+                print("\t(+{0} similar: {1})".format(
+                    len(dups), ", ".join(dsrc.title for dsrc, _ in dups)))
+
+    elif(sets.river > 0):
+        for ii, (src, art) in enumerate(sourceList.river(limit=sets.river)):
+            print("{0:3d} : {1} : {2}".format(ii, art.str(), src.title))
+
+    # Print New Articles, by source
+    else:
+        # Near-duplicates are replaced by a reference to the first article of their cluster
+        dups = sourceList.nearDuplicates() if sets.collapse else {}
+        for ii, src in enumerate(sourceList.sources):
+            print("{0:3d} : {1}".format(ii, src.str()))
+
+            if(src.not_modified):
+                print("\tNOT MODIFIED")
+            elif(src.valid):
+                for jj, art in enumerate(src.articles):
+                    if((ii, jj) in dups):
+                        print("\t{0:3d} : (similar to {1[0]:d}.{1[1]:d})".format(jj, dups[ii, jj]))
+                    else:
+                        print("\t{0:3d} : {1}".format(jj, art.str()))
+
+            else:
+                print("\tINVALID")
+
+    # Save updated ``Source`` information (e.g. HTTP validators for conditional requests), only
+    #    appending the records of fetched sources (see ``SourceList.update``)
+    log.info("%d feeds not modified" % (sourceList.num_not_modified))
+    sourceList.update([src for src in sourceList.sources if not src.skipped])
+    writeStats(sets, log)
 
     end = datetime.now()
     log.info("Done After %s\n" % (str(end-beg)))
@@ -57,6 +94,21 @@ def main():
     return
 
 
+def writeStats(sets, log):
+    """
+    Log the timing statistics of this run, and write them to ``Settings.stats_file`` (if set).
+    """
+    stats = Stats.getStats()
+    for line in stats.summary():
+        log.debug(" - " + line)
+
+    if(sets.stats_file is not None):
+        log.info("Writing statistics to '%s'" % (sets.stats_file))
+        stats.dump(sets.stats_file, sets.stats_format)
+
+    return
+
+
 def loadSources(sourceList, log):
     """
     """
@@ -0,0 +1,468 @@
+"""Retrieve feeds for many ``Source`` objects concurrently.
+
+Sources are fetched by a pool of worker threads.  The total number of simultaneous fetches is
+limited by ``Settings.fetch_workers``, and the number of simultaneous fetches from any single host
+is limited by ``Settings.fetch_per_host``.  Sources are only handed to the pool once their host
+has capacity, so a long run of sources from a single host does not tie up every worker.
+
+Feeds are downloaded through an ``HTTPPool``, which keeps persistent ('keep-alive') connections to
+each host, so that sources on the same host (and repeated polling of the same source) reuse
+connections instead of opening a new one (and repeating the TLS handshake) every time.  The number
+of idle connections kept for each host is set by ``Settings.http_pool_size``, and can be set for
+individual hosts with ``Settings.http_pool_hosts``.
+
+Requests time out after ``Settings.fetch_connect_timeout`` seconds when connecting, and
+``Settings.fetch_read_timeout`` seconds waiting for data.  Failed requests (and those answered
+with a temporary error status, e.g. '503') are retried up to ``Settings.fetch_retries`` times,
+after waiting an exponentially increasing, randomized ('jittered') time.
+
+New URLs (e.g. when adding many sources) are checked with ``checkFeeds``, using the same limits on
+simultaneous fetches, a single attempt with a timeout of ``Settings.check_timeout`` seconds, and
+confirming that each response parses as a feed.
+
+Objects
+-------
+    HTTPPool   : Pool of persistent HTTP(S) connections, kept for each host.
+    Response   : Status, headers and body of a completed request.
+    FeedCheck  : Result of checking a URL with ``checkFeeds``.
+    FetchError : Error raised when a request fails.
+
+Functions
+---------
+    fetchAll   : Call ``getFeed`` on each ``Source``, concurrently, returning results in order.
+    checkFeeds : Check that each URL can be fetched and parsed as a feed, concurrently.
+    getPool    : Get the shared ``HTTPPool`` object.
+    getHost    : Extract the (lower-case) host name from a URL.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import random
+import socket
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+try:
+    from urllib.parse import urlparse, urljoin
+    import http.client as httplib
+except ImportError:
+    from urlparse import urlparse, urljoin
+    import httplib
+
+import Settings
+
+_REDIRECTS = [301, 302, 303, 307, 308]
+_MAX_REDIRECTS = 5
+# Status codes indicating temporary errors, which are retried
+_RETRY_STATUS = [429, 500, 502, 503, 504]
+# Longest wait (seconds) between retries, including those requested by the server
+_MAX_BACKOFF = 60.0
+
+# Shared ``HTTPPool`` (see ``getPool``)
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+
+class FetchError(IOError):
+    """Error raised when a request fails (network or protocol errors, too many redirects).
+    """
+    pass
+
+
+# Status, (lower-case) headers, (decompressed) body and final URL of a completed request
+Response = namedtuple('Response', ['status', 'headers', 'body', 'url'])
+
+# Whether a URL is a valid feed, its HTTP status (-1 if the request failed), feed title and error
+FeedCheck = namedtuple('FeedCheck', ['url', 'valid', 'status', 'title', 'error'])
+
+
+class HTTPPool(object):
+    """Pool of persistent HTTP(S) connections, kept for each host.
+
+    Connections are used by one thread at a time: they are taken from the pool for each request
+    and returned afterwards (unless the server closes them).  At most ``size`` idle connections
+    are kept for each host.
+
+    Methods
+    -------
+        get   : Perform a (conditional) GET request, following redirects.
+        close : Close all idle connections.
+
+        _get     : Perform a single GET request (i.e. without retries), following redirects.
+        _backoff : Time to wait before retrying a request.
+        _request : Perform a single request on a pooled connection.
+        _acquire : Take an idle connection for a host from the pool (or create a new one).
+        _release : Return a connection to the pool (or close it, if the pool is full).
+
+    """
+
+    def __init__(self, size=None, hosts=None, sets=None, timeout=None, retries=None):
+        """
+        Arguments
+        ---------
+            size    <int>  : number of idle connections kept per host (`None` for ``Settings``).
+            hosts   <dict> : number of idle connections for particular hosts, overriding ``size``.
+            sets    <obj>  : ``Settings`` object (for timeouts and retries).
+            timeout <flt>  : connect and read timeout (seconds), overriding ``Settings``.
+            retries <int>  : number of retries, overriding ``Settings``.
+
+        """
+        if(sets is None): sets = Settings.Settings()
+        self.size = sets.http_pool_size if (size is None) else size
+        self.hosts = dict(sets.http_pool_hosts if (hosts is None) else hosts)
+        self.connect_timeout = sets.fetch_connect_timeout if (timeout is None) else timeout
+        self.read_timeout = sets.fetch_read_timeout if (timeout is None) else timeout
+        self.retries = sets.fetch_retries if (retries is None) else retries
+        self.backoff = sets.fetch_backoff
+        self.user_agent = "Feeder/%s" % (Settings.__version__)
+        self._idle = {}
+        self._lock = threading.Lock()
+        return
+
+    def get(self, url, etag=None, modified=None):
+        """Perform a (conditional) GET request, following redirects, with retries.
+
+        Network errors and temporary error statuses ('429', '5xx') are retried after a jittered,
+        exponential backoff (or the server's 'Retry-After', if given).  If all attempts fail,
+        the last error is raised, or the last response returned.
+
+        Arguments
+        ---------
+            url      <str> : URL to request.
+            etag     <str> : 'ETag' from a previous response, sent as 'If-None-Match'.
+            modified <str> : 'Last-Modified' from a previous response, sent as 'If-Modified-Since'.
+
+        Returns
+        -------
+            response <obj> : ``Response`` object.
+
+        """
+        headers = {'User-Agent': self.user_agent, 'Accept-Encoding': 'gzip, deflate'}
+        if(etag): headers['If-None-Match'] = etag
+        if(modified): headers['If-Modified-Since'] = modified
+
+        for attempt in range(self.retries + 1):
+            last = (attempt == self.retries)
+            try:
+                response = self._get(url, headers)
+            except FetchError:
+                if(last): raise
+                time.sleep(self._backoff(attempt))
+                continue
+
+            if(response.status not in _RETRY_STATUS or last): return response
+            time.sleep(self._backoff(attempt, response.headers.get('retry-after')))
+
+        return response
+
+    def _get(self, url, headers):
+        """Perform a single GET request (i.e. without retries), following redirects.
+        """
+        for _ in range(_MAX_REDIRECTS + 1):
+            status, resp_headers, body = self._request(url, headers)
+            if(status not in _REDIRECTS or 'location' not in resp_headers): break
+            url = urljoin(url, resp_headers['location'])
+        else:
+            raise FetchError("Too many redirects for '%s'" % (url))
+
+        # Decompress body
+        encoding = resp_headers.get('content-encoding', '').lower()
+        try:
+            if(encoding == 'gzip'): body = zlib.decompress(body, 16 + zlib.MAX_WBITS)
+            elif(encoding == 'deflate'): body = _inflate(body)
+        except zlib.error as err:
+            raise FetchError("Could not decompress '%s': %s" % (url, str(err)))
+
+        resp_headers.pop('content-encoding', None)
+        resp_headers.setdefault('content-location', url)
+        return Response(status, resp_headers, body, url)
+
+    def close(self):
+        """Close all idle connections.
+        """
+        with self._lock:
+            idle = self._idle
+            self._idle = {}
+
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+        return
+
+    def _backoff(self, attempt, retry_after=None):
+        """Time to wait before retrying a request: exponential in ``attempt``, with random jitter.
+        """
+        wait = self.backoff * 2**attempt * random.uniform(0.5, 1.5)
+        # Use the server's requested delay (in seconds) if given
+        try:
+            if(retry_after is not None): wait = max(wait, float(retry_after))
+        except ValueError:
+            pass
+
+        return min(wait, _MAX_BACKOFF)
+
+    def _request(self, url, headers):
+        """Perform a single request on a pooled connection.
+
+        If a reused connection fails (e.g. it was closed by the server while idle), the request
+        is repeated once on a new connection.
+
+        Returns
+        -------
+            status  <int>  : HTTP status code.
+            headers <dict> : response headers, with lower-case names.
+            body    <str>  : (raw) response body.
+
+        """
+        parts = urlparse(url)
+        scheme = parts.scheme.lower()
+        if(scheme not in ['http', 'https']):
+            raise FetchError("Unsupported URL scheme '%s'" % (url))
+
+        key = (scheme, parts.netloc.lower())
+        path = parts.path or '/'
+        if(parts.query): path += '?' + parts.query
+
+        for attempt in range(2):
+            conn, reused = self._acquire(key)
+            try:
+                # Connect with the connect-timeout, then use the read-timeout for all responses
+                if(conn.sock is None):
+                    conn.connect()
+                    conn.sock.settimeout(self.read_timeout)
+                conn.request('GET', path, headers=headers)
+                resp = conn.getresponse()
+                body = resp.read()
+            except (httplib.HTTPException, OSError, socket.timeout) as err:
+                conn.close()
+                if(reused and attempt == 0): continue
+                raise FetchError("Request for '%s' failed: %s" % (url, str(err)))
+
+            resp_headers = dict((kk.lower(), vv) for kk, vv in resp.getheaders())
+            if(resp.will_close): conn.close()
+            else:                self._release(key, conn)
+            return resp.status, resp_headers, body
+
+    def _acquire(self, key):
+        """Take an idle connection for a host from the pool, or create a new one.
+
+        Raises ``FetchError`` if a connection cannot be constructed for the host (e.g. an
+        invalid port).
+
+        Returns
+        -------
+            conn   <obj>  : ``HTTPConnection`` or ``HTTPSConnection`` object.
+            reused <bool> : whether the connection was taken from the pool.
+
+        """
+        with self._lock:
+            conns = self._idle.get(key)
+            if(conns): return conns.pop(), True
+
+        scheme, netloc = key
+        cls = httplib.HTTPSConnection if (scheme == 'https') else httplib.HTTPConnection
+        try:
+            conn = cls(netloc, timeout=self.connect_timeout)
+        except httplib.HTTPException as err:
+            # e.g. ``InvalidURL`` for a non-numeric port
+            raise FetchError("Invalid host '%s': %s" % (netloc, str(err)))
+
+        return conn, False
+
+    def _release(self, key, conn):
+        """Return a connection to the pool, or close it if the pool for its host is full.
+        """
+        size = self.hosts.get(key[1], self.size)
+        with self._lock:
+            conns = self._idle.setdefault(key, [])
+            if(len(conns) < size):
+                conns.append(conn)
+                return
+
+        conn.close()
+        return
+
+
+def fetchAll(sources, workers=None, per_host=None, log=None):
+    """Call ``getFeed`` on each ``Source``, concurrently, returning results in order.
+
+    Each ``Source`` stores its own results (articles, times, etc), so the only shared state is
+    the list of return values, which is filled by index and thus deterministic.
+
+    Arguments
+    ---------
+        sources  <obj>[N] : ``Source`` objects to fetch.
+        workers  <int>    : maximum number of simultaneous fetches (`None` for default).
+        per_host <int>    : maximum number of simultaneous fetches per host (`None` for default).
+        log      <obj>    : ``logging.Logger`` object (optional).
+
+    Returns
+    -------
+        retvals  <bool>[N] : return value of ``getFeed`` for each source, `False` on exception.
+
+    """
+    def _fetch(ii):
+        try:
+            return bool(sources[ii].getFeed())
+        except Exception as err:
+            if(log is not None):
+                log.warning("Fetch of '%s' failed: '%s'" % (sources[ii].url, str(err)))
+            return False
+
+    if(log is not None): log.debug("fetchAll()")
+    return _mapByHost(_fetch, [src.url for src in sources], False, workers, per_host, log)
+
+
+def checkFeeds(urls, workers=None, per_host=None, timeout=None, log=None):
+    """Check that each URL can be fetched and parsed as a feed, concurrently.
+
+    Each URL is requested once (no retries), with a timeout of ``timeout`` seconds, on a separate
+    ``HTTPPool`` (so the connections of the shared pool are not used up by one-off requests).
+
+    Arguments
+    ---------
+        urls     <str>[N] : URLs to check.
+        workers  <int>    : maximum number of simultaneous fetches (`None` for default).
+        per_host <int>    : maximum number of simultaneous fetches per host (`None` for default).
+        timeout  <flt>    : connect and read timeout in seconds (`None` for ``Settings``).
+        log      <obj>    : ``logging.Logger`` object (optional).
+
+    Returns
+    -------
+        checks   <obj>[N] : ``FeedCheck`` for each URL, in order.
+
+    """
+    sets = Settings.Settings()
+    if(timeout is None): timeout = sets.check_timeout
+    pool = HTTPPool(sets=sets, timeout=timeout, retries=0)
+
+    def _check(ii):
+        url = urls[ii]
+        try:
+            response = pool.get(url)
+        except Exception as err:
+            return FeedCheck(url, False, -1, '', str(err))
+
+        if(response.status != 200):
+            return FeedCheck(url, False, response.status, '', "HTTP status %d" % (response.status))
+
+        # Same criterion as ``Source.getFeed``
+        import feedparser
+        try:
+            feed = feedparser.parse(response.body, response_headers=response.headers)
+        except Exception as err:
+            return FeedCheck(url, False, response.status, '', "Invalid feed: %s" % (str(err)))
+
+        if(not hasattr(feed, 'feed') or not hasattr(feed.feed, 'title')):
+            return FeedCheck(url, False, response.status, '', "Invalid feed")
+
+        return FeedCheck(url, True, response.status, feed.feed.title, '')
+
+    if(log is not None): log.debug("checkFeeds()")
+    try:
+        checks = _mapByHost(_check, urls, None, workers, per_host, log)
+    finally:
+        pool.close()
+
+    return checks
+
+
+def getPool():
+    """Get the shared ``HTTPPool`` object (created on first use), reused across polling cycles.
+    """
+    global _POOL
+    with _POOL_LOCK:
+        if(_POOL is None): _POOL = HTTPPool()
+        return _POOL
+
+
+def getHost(url):
+    """Extract the (lower-case) host name from a URL, e.g. 'http://www.a.com/b' ==> 'www.a.com'.
+    """
+    try:
+        host = urlparse(url.strip()).netloc.lower()
+    except Exception:
+        host = ''
+
+    return host
+
+
+def _mapByHost(func, urls, default, workers=None, per_host=None, log=None):
+    """Call ``func(i)`` for the index of each URL, concurrently, limiting fetches per host.
+
+    Arguments
+    ---------
+        func     <func>   : function of the index of a URL, returning its result.
+        urls     <str>[N] : URLs, used to limit the number of simultaneous calls for each host.
+        default  <obj>    : initial value of each result.
+        workers  <int>    : maximum number of simultaneous calls (`None` for default).
+        per_host <int>    : maximum number of simultaneous calls per host (`None` for default).
+        log      <obj>    : ``logging.Logger`` object (optional).
+
+    Returns
+    -------
+        results  <obj>[N] : return value of ``func`` for each URL, in order.
+
+    """
+    sets = Settings.Settings()
+    if(workers is None): workers = sets.fetch_workers
+    if(per_host is None): per_host = sets.fetch_per_host
+    workers = max(int(workers), 1)
+    per_host = max(int(per_host), 1)
+
+    num = len(urls)
+    results = [default]*num
+    if(num == 0): return results
+    if(log is not None):
+        log.debug(" - %d URLs, %d workers, %d per host" % (num, workers, per_host))
+
+    # Queue up the index numbers of URLs for each host (preserving order of first appearance)
+    pending = OrderedDict()
+    for ii, url in enumerate(urls):
+        pending.setdefault(getHost(url), deque()).append(ii)
+
+    active = dict((host, 0) for host in pending)
+    running = {}
+
+    def _submit(pool):
+        # Round-robin over hosts with spare capacity, until all workers are busy
+        while(len(running) < workers):
+            added = False
+            for host in list(pending.keys()):
+                if(len(running) >= workers): break
+                if(active[host] >= per_host): continue
+                ii = pending[host].popleft()
+                if(len(pending[host]) == 0): del pending[host]
+                active[host] += 1
+                running[pool.submit(func, ii)] = (ii, host)
+                added = True
+
+            if(not added): break
+
+        return
+
+    with ThreadPoolExecutor(max_workers=min(workers, num)) as pool:
+        _submit(pool)
+        while(len(running) > 0):
+            done, _ = wait(list(running.keys()), return_when=FIRST_COMPLETED)
+            for fut in done:
+                ii, host = running.pop(fut)
+                active[host] -= 1
+                results[ii] = fut.result()
+
+            _submit(pool)
+
+    return results
+
+
+def _inflate(body):
+    """Decompress a 'deflate' encoded body, which may or may not include the zlib header.
+    """
+    try:
+        return zlib.decompress(body)
+    except zlib.error:
+        return zlib.decompress(body, -zlib.MAX_WBITS)
@@ -1,47 +1,218 @@
 """Logging objects and routines.
 
+Indentation
+-----------
+    Log messages are indented based on one of the following ``INDENT_MODES``:
+        'depth'   : number of frames in the call stack, found by following frame pointers (cheap).
+        'context' : explicit nesting using the ``indent`` context manager (cheapest).
+        'stack'   : length of ``inspect.stack()`` (original method; very slow, reads source files).
+        'none'    : no indentation.
+    Indentation is only computed for records which pass the level of a handler, so records below
+    the threshold are never formatted.
+
+Asynchronous Logging
+--------------------
+    If a queue size is given, records are put on a bounded queue by a ``DroppingQueueHandler``, and
+    written to file and stream by a ``logging.handlers.QueueListener`` in a background thread, so
+    that logging calls never wait for I/O.  When the queue is full, one of ``DROP_POLICIES``
+    applies:
+        'drop_new' : discard the new record.
+        'drop_old' : discard the oldest queued record.
+        'block'    : wait for space in the queue.
+
 Objects
 -------
-    IndentFormatter : Custom ``logging`` Formatter to add indentation based on stack level.
+    IndentFormatter      : Custom ``logging`` Formatter to add indentation based on stack level.
+    DroppingQueueHandler : ``QueueHandler`` for a bounded queue, applying a drop policy when full.
 
 Functions
 ---------
+    indent        : Context manager which increases the indentation of enclosed log messages.
+    stopListener  : Stop the background listener of an asynchronous logger, flushing its queue.
     _getLogger    : Create a standard logger object which logs to file and or stdout stream.
     defaultLogger : Create a basic ``logging.Logger`` object, logging to stream and file.
 
 """
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import atexit
 import logging
+import logging.handlers
 import inspect
-import numpy as np
+import os
+import sys
+import threading
+from contextlib import contextmanager
 
-import zcode.inout as zio
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
 import Settings
 
+INDENT_MODES = ['depth', 'context', 'stack', 'none']
+DROP_POLICIES = ['drop_new', 'drop_old', 'block']
+
+# Background listeners of asynchronous loggers, by logger name
+_LISTENERS = {}
+
+# Thread-local nesting level used by the 'context' indentation mode
+_CONTEXT = threading.local()
+
 
 class IndentFormatter(logging.Formatter):
     """Custom ``logging`` Formatter to add indentation based on stack level.
+
+    If a record already has an ``indent_level`` attribute (e.g. computed in the logging thread
+    before the record was passed elsewhere) it is used directly.
     """
 
-    def __init__(self, fmt=None, datefmt=None):
+    def __init__(self, fmt=None, datefmt=None, mode='depth'):
         logging.Formatter.__init__(self, fmt, datefmt)
+        if(mode not in INDENT_MODES):
+            raise ValueError("Unrecognized indent mode '%s', must be one of %s" %
+                             (mode, str(INDENT_MODES)))
+
+        self.mode = mode
         self.baseline = None
 
     def format(self, rec):
-        stack = inspect.stack()
-        if(self.baseline is None): self.baseline = len(stack)
-        indent = (len(stack)-self.baseline)
-        addSpace = ((indent > 0) & (not rec.msg.startswith(" -")))
+        indent = getattr(rec, 'indent_level', None)
+        if(indent is None): indent = self.level()
+        msg = rec.msg if isinstance(rec.msg, str) else ''
+        addSpace = ((indent > 0) & (not msg.startswith(" -")))
         rec.indent = ' -'*indent + ' '*addSpace
         out = logging.Formatter.format(self, rec)
         del rec.indent
         return out
 
+    def level(self):
+        """Current indentation level (relative to the first record, for stack-based modes).
+        """
+        if(self.mode == 'context'): return _contextLevel()
+        elif(self.mode == 'none'): return 0
+        elif(self.mode == 'stack'): depth = len(inspect.stack())
+        else: depth = _stackDepth()
+
+        if(self.baseline is None): self.baseline = depth
+        return max(depth - self.baseline, 0)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """``QueueHandler`` for a bounded queue, applying a drop policy when the queue is full.
+
+    The indentation level of each record is computed (in the logging thread) before it is
+    queued, since the call stack is not available to the listener thread.  The number of
+    discarded records is stored in ``dropped``.
+    """
+
+    def __init__(self, que, policy='drop_new', indent='depth'):
+        logging.handlers.QueueHandler.__init__(self, que)
+        if(policy not in DROP_POLICIES):
+            raise ValueError("Unrecognized drop policy '%s', must be one of %s" %
+                             (policy, str(DROP_POLICIES)))
+
+        self.policy = policy
+        self.dropped = 0
+        self._indenter = IndentFormatter(mode=indent)
+
+    def prepare(self, rec):
+        rec.indent_level = self._indenter.level()
+        return logging.handlers.QueueHandler.prepare(self, rec)
+
+    def enqueue(self, rec):
+        if(self.policy == 'block'):
+            self.queue.put(rec)
+            return
+
+        while(True):
+            try:
+                self.queue.put_nowait(rec)
+                return
+            except queue.Full:
+                self.dropped += 1
+                if(self.policy == 'drop_new'): return
+
+            # 'drop_old': discard the oldest record, and try again
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+
+
+@contextmanager
+def indent():
+    """Context manager which increases the indentation of enclosed log messages ('context' mode).
+
+    e.g.
+        >>> log.info("Loading")
+        >>> with MyLogger.indent():
+        >>>     log.debug("loaded file")      # Printed as " - loaded file"
+
+    """
+    _CONTEXT.level = _contextLevel() + 1
+    try:
+        yield
+    finally:
+        _CONTEXT.level -= 1
+
+    return
+
+
+def _contextLevel():
+    """Nesting level of ``indent`` context managers in this thread.
+    """
+    return getattr(_CONTEXT, 'level', 0)
+
+
+def _stackDepth():
+    """Number of frames in the current call stack, following frame pointers (no source is read).
+    """
+    depth = 0
+    frame = sys._getframe(1)
+    while(frame is not None):
+        depth += 1
+        frame = frame.f_back
+
+    return depth
+
+
+def stopListener(logger):
+    """Stop the background listener of an asynchronous logger, flushing its queue.
+
+    Arguments
+    ---------
+        logger <obj> : ``logging.Logger`` object (or its name).
+
+    Returns
+    -------
+        dropped <int> : number of records discarded because the queue was full.
+
+    """
+    name = logger if (logger is None or isinstance(logger, str)) else logger.name
+    if(name == 'root'): name = None
+    listener = _LISTENERS.pop(name, None)
+    if(listener is None): return 0
+
+    listener.stop()
+    return listener.handler.dropped
+
+
+def _stopAllListeners():
+    """Stop all background listeners (registered to run at exit).
+    """
+    for name in list(_LISTENERS.keys()):
+        stopListener(name)
+
+    return
+
+
+atexit.register(_stopAllListeners)
+
 
 def _getLogger(name, strFmt=None, fileFmt=None, dateFmt=None, strLevel=None, fileLevel=None,
-               tofile=None, tostr=True):
+               tofile=None, tostr=True, indent='depth', queueSize=None, dropPolicy='drop_new'):
     """Create a standard logger object which logs to file and or stdout stream ('str')
 
     Arguments
@@ -55,6 +226,9 @@ def _getLogger(name, strFmt=None, fileFmt=None, dateFmt=None, strLevel=None, fil
         fileLevel <int>  : logging level for file
         tofile  <str>  : filename to log to (turned off if `None`)
         tostr   <bool> : log to stdout stream
+        indent  <str>  : indentation mode, one of ``INDENT_MODES``
+        queueSize  <int> : log asynchronously through a queue of this size (`None` for synchronous)
+        dropPolicy <str> : policy when the queue is full, one of ``DROP_POLICIES``
 
     Returns
     -------
@@ -66,6 +240,7 @@ def _getLogger(name, strFmt=None, fileFmt=None, dateFmt=None, strLevel=None, fil
 
     logger = logging.getLogger(name)
     # Make sure handlers don't get duplicated (ipython issue)
+    stopListener(name)
     while len(logger.handlers) > 0: logger.handlers.pop()
     # Prevents duplication or something something...
     logger.propagate = 0
@@ -74,7 +249,7 @@ def _getLogger(name, strFmt=None, fileFmt=None, dateFmt=None, strLevel=None, fil
     if(fileLevel is None): fileLevel = logging.DEBUG
     if(strLevel is None): strLevel  = logging.WARNING
     # Logger object must be at minimum level; only accepts `int`
-    useLevel = int(np.min([fileLevel, strLevel]))
+    useLevel = int(min(fileLevel, strLevel))
     logger.setLevel(useLevel)
 
     if(dateFmt is None): dateFmt = '%Y/%m/%d %H:%M:%S'
@@ -82,14 +257,15 @@ def _getLogger(name, strFmt=None, fileFmt=None, dateFmt=None, strLevel=None, fil
     # Log to file
     # -----------
     if(tofile is not None):
-        zio.checkPath(tofile)
+        dname = os.path.dirname(tofile)
+        if(len(dname) > 0): os.makedirs(dname, exist_ok=True)
 
         # Create default formatting for file output
         if(fileFmt is None):
             fileFmt  = "%(asctime)s %(levelname)8.8s [%(filename)20.20s:"
             fileFmt += "%(funcName)-20.20s]%(indent)s%(message)s"
 
-        fileFormatter = IndentFormatter(fileFmt, datefmt=dateFmt)
+        fileFormatter = IndentFormatter(fileFmt, datefmt=dateFmt, mode=indent)
         fileHandler = logging.FileHandler(tofile, 'w')
         fileHandler.setFormatter(fileFormatter)
         fileHandler.setLevel(fileLevel)
@@ -102,12 +278,24 @@ def _getLogger(name, strFmt=None, fileFmt=None, dateFmt=None, strLevel=None, fil
         if(strFmt is None):
             strFmt = "%(indent)s%(message)s"
 
-        strFormatter = IndentFormatter(strFmt, datefmt=dateFmt)
+        strFormatter = IndentFormatter(strFmt, datefmt=dateFmt, mode=indent)
         strHandler = logging.StreamHandler()
         strHandler.setFormatter(strFormatter)
         strHandler.setLevel(strLevel)
         logger.addHandler(strHandler)
 
+    # Move handlers behind a queue (and background listener) for asynchronous logging
+    if(queueSize is not None):
+        handlers = list(logger.handlers)
+        while len(logger.handlers) > 0: logger.handlers.pop()
+        que = queue.Queue(maxsize=max(int(queueSize), 1))
+        queueHandler = DroppingQueueHandler(que, policy=dropPolicy, indent=indent)
+        logger.addHandler(queueHandler)
+        listener = logging.handlers.QueueListener(que, *handlers, respect_handler_level=True)
+        listener.handler = queueHandler
+        listener.start()
+        _LISTENERS[name] = listener
+
     return logger
 
 
@@ -135,6 +323,14 @@ def defaultLogger(fname, log=None, sets=None):
     elif(sets.verbose): level = logging.INFO
     else:                 level = logging.WARNING
 
-    log = _getLogger(None, tostr=True, tofile=filename, strLevel=level, fileLevel=logging.DEBUG)
+    # Records below both levels are rejected by the logger before any formatting
+    fileLevel = logging.getLevelName(sets.log_file_level)
+    if(sets.debug): fileLevel = logging.DEBUG
+
+    # Log asynchronously through a bounded queue
+    queueSize = sets.log_queue_size if sets.log_async else None
+
+    log = _getLogger(None, tostr=True, tofile=filename, strLevel=level, fileLevel=fileLevel,
+                     indent=sets.log_indent, queueSize=queueSize, dropPolicy=sets.log_drop_policy)
 
     return log
@@ -0,0 +1,279 @@
+"""Detect near-duplicate articles (e.g. the same wire story in many feeds), across sources.
+
+Each article's text (title and summary) is split into overlapping runs of words ('shingles'), and
+two articles are similar if they share a large fraction of their shingles (Jaccard similarity).
+Comparing every pair of articles is quadratic, so instead:
+
+    1) MinHash: each article is summarized by a 'signature', the minimum hash value of its
+       shingles under each of ``Settings.near_dup_perms`` different hash functions.  The fraction
+       of equal signature values between two articles estimates their similarity.
+    2) LSH banding: signatures are cut into ``Settings.near_dup_bands`` bands, and articles with
+       an identical band are candidates.  Similar articles very likely share at least one band,
+       dissimilar articles very rarely do.
+    3) Candidates whose estimated similarity is at least ``Settings.near_dup_threshold`` are
+       joined into clusters (union-find).
+
+Only candidate pairs are compared, so the cost grows (nearly) linearly with the number of
+articles.
+
+Objects
+-------
+    MinHasher : Compute MinHash signatures of texts.
+
+Functions
+---------
+    clusters    : Label each text with the cluster of near-duplicates it belongs to.
+    articleText : Plain text of an article (title and summary) used for comparison.
+    shingles    : Hashes of the overlapping runs of words in each of many texts.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import zlib
+
+import numpy as np
+
+import Search
+import Settings
+import Source
+
+# Largest 64-bit value (random multipliers and offsets of the hash functions are below this)
+_MAX64 = (1 << 64) - 1
+# Multiplier combining the hashes of the words of a shingle
+_MIX = 0x9E3779B1
+# Number of shingles hashed at once (limits memory: ``near_dup_perms`` x this many values)
+_CHUNK = 200000
+
+
+class MinHasher(object):
+    """Compute MinHash signatures of texts.
+
+    The hash functions are random 'multiply-shift' functions of the (64-bit) shingle hashes,
+    ``((a*x + b) mod 2^64) >> 32``, which need no (slow) modulus.  The same ``seed`` always
+    produces the same functions.
+
+    Methods
+    -------
+        signatures : MinHash signatures of many texts.
+
+    """
+
+    def __init__(self, num_perm=None, shingle=None, seed=1):
+        """
+        Arguments
+        ---------
+            num_perm <int> : number of hash functions (signature length), `None` for ``Settings``.
+            shingle  <int> : number of words in each shingle, `None` for ``Settings``.
+            seed     <int> : random seed of the hash functions.
+
+        """
+        sets = Settings.Settings()
+        self.num_perm = sets.near_dup_perms if (num_perm is None) else num_perm
+        self.shingle = sets.near_dup_shingle if (shingle is None) else shingle
+        rng = np.random.RandomState(seed)
+        aa = rng.randint(0, _MAX64, size=self.num_perm, dtype=np.uint64) | np.uint64(1)
+        bb = rng.randint(0, _MAX64, size=self.num_perm, dtype=np.uint64)
+        self._aa = aa[:, np.newaxis]
+        self._bb = bb[:, np.newaxis]
+        return
+
+    def signatures(self, texts):
+        """MinHash signatures of many texts.
+
+        The shingles of all texts are hashed together (in chunks), and the minimum for each text
+        is found with ``np.minimum.reduceat``, instead of hashing each text separately.
+
+        Arguments
+        ---------
+            texts <str>[N] : texts to sign.
+
+        Returns
+        -------
+            sigs  <uint32>[N, P] : signature of each text (``P = num_perm``).
+            valid <bool>[N]      : whether each text had any words (others have no signature).
+
+        """
+        vals, counts = shingles(texts, self.shingle)
+        valid = (counts > 0)
+        sigs = np.zeros((len(texts), self.num_perm), dtype=np.uint32)
+
+        # Process whole texts in chunks of (about) ``_CHUNK`` shingles
+        idx = np.flatnonzero(valid)
+        ends = np.cumsum(counts[idx])
+        starts = ends - counts[idx]
+        beg = 0
+        while(beg < idx.size):
+            # Texts whose shingles end within ``_CHUNK`` of the start of the chunk (at least one)
+            end = max(np.searchsorted(ends, starts[beg] + _CHUNK, 'right'), beg + 1)
+            hashed = vals[np.newaxis, starts[beg]:ends[end-1]]
+            hashed = (self._aa*hashed + self._bb) >> np.uint64(32)
+            offsets = starts[beg:end] - starts[beg]
+            sigs[idx[beg:end]] = np.minimum.reduceat(hashed, offsets, axis=1).T
+            beg = end
+
+        return sigs, valid
+
+
+def clusters(texts, threshold=None, bands=None, hasher=None):
+    """Label each text with the cluster of near-duplicates it belongs to.
+
+    Arguments
+    ---------
+        texts     <str>[N] : texts to compare.
+        threshold <flt>    : minimum estimated (Jaccard) similarity, `None` for ``Settings``.
+        bands     <int>    : number of LSH bands, `None` for ``Settings``.  Must divide the
+                             signature length; more bands find less similar candidates.
+        hasher    <obj>    : ``MinHasher`` object (`None` for a new one, using ``Settings``).
+
+    Returns
+    -------
+        labels <int>[N] : index of the first text in each text's cluster, i.e. ``labels[i] == i``
+                          for the first (or only) member of each cluster.
+
+    """
+    sets = Settings.Settings()
+    if(threshold is None): threshold = sets.near_dup_threshold
+    if(bands is None): bands = sets.near_dup_bands
+    if(hasher is None): hasher = MinHasher()
+
+    num = len(texts)
+    if(hasher.num_perm % bands != 0):
+        raise ValueError("Signature length %d is not divisible into %d bands" %
+                         (hasher.num_perm, bands))
+
+    parents = list(range(num))
+    if(num < 2): return np.array(parents, dtype=int)
+
+    sigs, valid = hasher.signatures(texts)
+    idx = np.flatnonzero(valid)
+    rows = hasher.num_perm // bands
+
+    for band in range(bands):
+        # Group texts by the (byte) values of this band of their signatures
+        keys = np.ascontiguousarray(sigs[idx, band*rows:(band+1)*rows])
+        keys = keys.view(np.dtype((np.void, keys.dtype.itemsize*rows))).ravel()
+        _, inverse, sizes = np.unique(keys, return_inverse=True, return_counts=True)
+        inverse = inverse.ravel()
+        # Only buckets with more than one text, each in order of index
+        sel = np.flatnonzero(sizes[inverse] > 1)
+        sel = sel[np.argsort(inverse[sel], kind='mergesort')]
+        bounds = np.flatnonzero(np.diff(inverse[sel])) + 1
+        for bucket in np.split(idx[sel], bounds):
+            if(bucket.size > 1): _joinSimilar(parents, sigs, bucket.tolist(), threshold)
+
+    # The root of each cluster is its first member (lowest index), see ``_union``
+    return np.array([_find(parents, ii) for ii in range(num)], dtype=int)
+
+
+def articleText(art):
+    """Plain text of an article (title and summary) used for comparison.
+
+    Summaries which have not been stripped of HTML yet are stripped with the (fast) 'regex' method.
+    """
+    summary = art._summary
+    if(summary is None and art._summary_html is not None):
+        summary = Source.stripHTML(art._summary_html, 'regex')
+
+    return "%s\n%s" % (art.title or '', summary or '')
+
+
+def shingles(texts, size=3):
+    """Hashes of the overlapping runs of ``size`` words ('shingles') in each of many texts.
+
+    Each word is hashed once (CRC32), and the hash of each shingle is combined from those of its
+    words (vectorized over all texts).  Texts with fewer than ``size`` words have one shingle.
+
+    Arguments
+    ---------
+        texts <str>[N] : texts to split into shingles.
+        size  <int>    : number of words in each shingle.
+
+    Returns
+    -------
+        vals   <uint64>[M] : hashes of the shingles of all texts, in order.
+        counts <int>[N]    : number of shingles of each text (zero for texts without words).
+
+    """
+    codes = _WordCodes()
+    flat = []
+    lens = np.zeros(len(texts), dtype=np.int64)
+    for ii, text in enumerate(texts):
+        words = Search.tokenize(text)
+        if(len(words) == 0): continue
+        flat.extend(map(codes.__getitem__, words))
+
+        # Pad short texts, so that they have a single shingle
+        if(len(words) < size): flat.extend([0]*(size - len(words)))
+        lens[ii] = max(len(words), size)
+
+    flat = np.array(flat, dtype=np.uint64)
+    counts = np.where(lens > 0, lens - size + 1, 0)
+
+    # Shingles start at every word except the last ``size-1`` of each text
+    starts = np.repeat(np.cumsum(lens) - lens, counts) + _withinRuns(counts)
+    vals = np.zeros(starts.size, dtype=np.uint64)
+    for jj in range(size):
+        vals = vals*np.uint64(_MIX) + flat[starts + jj]
+
+    return vals, counts
+
+
+class _WordCodes(dict):
+    """Hash (CRC32) of each word, computed when the word is first looked up.
+    """
+
+    def __missing__(self, word):
+        code = zlib.crc32(word.encode('utf-8')) & 0xffffffff
+        self[word] = code
+        return code
+
+
+def _withinRuns(counts):
+    """Position within its run of each element, for consecutive runs of the given lengths.
+    """
+    total = np.sum(counts)
+    ends = np.cumsum(counts)
+    return np.arange(total) - np.repeat(ends - counts, counts)
+
+
+def _joinSimilar(parents, sigs, bucket, threshold):
+    """Join the clusters of texts in an LSH bucket whose signatures are similar enough.
+
+    Each text is compared to the 'leaders' of the bucket (texts not similar to any earlier text),
+    and joined to the most similar, so a bucket of one story costs one comparison per text.
+    """
+    leaders = []
+    for ii in bucket:
+        # Skip texts already joined to the cluster of a leader (e.g. from another band)
+        root = _find(parents, ii)
+        if(any(_find(parents, ll) == root for ll in leaders)): continue
+        if(len(leaders) > 0):
+            sims = np.mean(sigs[leaders] == sigs[ii], axis=1)
+            best = np.argmax(sims)
+            if(sims[best] >= threshold):
+                _union(parents, leaders[best], ii)
+                continue
+
+        leaders.append(ii)
+
+    return
+
+
+def _find(parents, ii):
+    """Root of the cluster containing ``ii`` (compressing the path along the way).
+    """
+    while(parents[ii] != ii):
+        parents[ii] = parents[parents[ii]]
+        ii = parents[ii]
+
+    return ii
+
+
+def _union(parents, ii, jj):
+    """Join the clusters containing ``ii`` and ``jj`` (the lower root becomes the root of both).
+    """
+    ii = _find(parents, ii)
+    jj = _find(parents, jj)
+    if(ii < jj): parents[jj] = ii
+    elif(jj < ii): parents[ii] = jj
+    return
@@ -0,0 +1,122 @@
+"""Read and write lists of feeds in the OPML format (used by most feed readers for subscriptions).
+
+Feeds are 'outline' elements with an 'xmlUrl' attribute, optionally nested inside other 'outline'
+elements (folders).  Files are read incrementally (``xml.etree.ElementTree.iterparse``), and
+elements are cleared once read, so that very large files use little memory.
+
+Each ``Source`` corresponds to a feed: sources with a ``subname`` are written inside a folder
+named by their ``name``, with the feed titled by the ``subname``; sources without a ``subname``
+are written at the top level, titled by their ``name``.  When reading, the same convention is
+used: the innermost folder of a feed gives its ``name``, even if that is empty (as written for
+sources with a ``subname`` but no ``name``).
+
+Functions
+---------
+    iterFeeds  : Iterate over the feeds in an OPML file, as (url, name, subname).
+    writeFeeds : Write feeds to an OPML file, grouping them in folders by name.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import io
+import os
+import time
+from collections import OrderedDict
+from xml.sax.saxutils import escape, quoteattr
+
+
+def iterFeeds(fname):
+    """Iterate over the feeds in an OPML file, as (url, name, subname), in order.
+
+    Arguments
+    ---------
+        fname <str> : OPML filename.
+
+    Returns
+    -------
+        feeds <gen> : generator of (url, name, subname) for each feed outline.
+
+    """
+    import xml.etree.ElementTree as ET
+
+    # Text of each open outline (folder), and the 'body' element
+    folders = []
+    body = None
+    for event, elem in ET.iterparse(fname, events=('start', 'end')):
+        tag = _localName(elem.tag)
+        if(event == 'start'):
+            if(tag == 'body'): body = elem
+            if(tag != 'outline'): continue
+            attrs = dict((_localName(kk).lower(), vv) for kk, vv in elem.attrib.items())
+            text = (attrs.get('text') or attrs.get('title') or '').strip()
+            url = (attrs.get('xmlurl') or '').strip()
+            if(len(url) > 0):
+                if(len(folders) > 0): yield url, folders[-1], text
+                else: yield url, text, ''
+
+            folders.append(text)
+
+        elif(tag == 'outline'):
+            folders.pop()
+            elem.clear()
+            # Drop the (cleared) top-level outlines, so memory does not grow with the file
+            if(len(folders) == 0 and body is not None): body.clear()
+
+    return
+
+
+def writeFeeds(fname, feeds, title="Feeder sources"):
+    """Write feeds to an OPML file, grouping them in folders by name.
+
+    The file is written to a temporary file first, which then replaces ``fname``.
+
+    Arguments
+    ---------
+        fname <str>      : OPML filename.
+        feeds <tup>[N]   : (url, name, subname) of each feed.
+        title <str>      : title of the OPML document.
+
+    Returns
+    -------
+        num   <int> : number of feeds written.
+
+    """
+    # Group by name (in order of first appearance), feeds without a subname are not grouped
+    groups = OrderedDict()
+    for url, name, subname in feeds:
+        if(len(subname) > 0): groups.setdefault((name, True), []).append((url, subname))
+        else: groups.setdefault((url, False), []).append((url, name))
+
+    dname = os.path.dirname(fname)
+    if(len(dname) > 0 and not os.path.exists(dname)): os.makedirs(dname)
+
+    num = 0
+    temp = fname + '.temp'
+    with io.open(temp, 'w', encoding='utf-8') as out:
+        out.write('<?xml version="1.0" encoding="UTF-8"?>\n<opml version="2.0">\n')
+        out.write('  <head>\n    <title>%s</title>\n' % (escape(title)))
+        out.write('    <dateCreated>%s</dateCreated>\n  </head>\n  <body>\n' %
+                  (time.strftime('%a, %d %b %Y %H:%M:%S GMT', time.gmtime())))
+        for (key, folder), entries in groups.items():
+            indent = '    '
+            if(folder):
+                out.write('    <outline text=%s>\n' % (quoteattr(key)))
+                indent = '      '
+            for url, text in entries:
+                out.write('%s<outline type="rss" text=%s title=%s xmlUrl=%s/>\n' %
+                          (indent, quoteattr(text), quoteattr(text), quoteattr(url)))
+                num += 1
+
+            if(folder): out.write('    </outline>\n')
+
+        out.write('  </body>\n</opml>\n')
+
+    os.rename(temp, fname)
+    return num
+
+
+def _localName(tag):
+    """Name of an XML tag or attribute without its namespace, e.g. '{ns}outline' ==> 'outline'.
+    """
+    return tag.rsplit('}', 1)[-1]
+
@@ -0,0 +1,188 @@
+"""Long-running polling of sources, with an adaptive interval for each source.
+
+The ``SourceList`` is kept in memory, and each ``Source`` is scheduled in a priority queue (heap)
+by the time it is next due.  All sources which are due are fetched together (concurrently, see
+``Fetcher``), their new articles are saved, and each is rescheduled.  The interval for each source
+is estimated from the times of its articles (see ``estimateInterval``): sources which publish
+often are polled often, and dormant ones rarely.  Sources skipped after repeated failures (see
+``Source.getFeed``) are rescheduled for when their cool-down ends.
+
+Objects
+-------
+    Poller : Repeatedly fetch each ``Source`` of a ``SourceList`` when it is due.
+
+Functions
+---------
+    estimateInterval : Estimate the polling interval for a source from its article times.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import heapq
+import itertools
+import time
+
+import Fetcher
+import MyLogger
+import Settings
+
+_LOG_FILENAME = "poller.log"
+
+# Number of most recent articles used to estimate publishing rates
+_NUM_GAPS = 20
+# Fraction of the typical time between articles used as the polling interval
+_GAP_FRAC = 0.5
+# Factor by which the interval grows when a poll finds nothing new
+_BACKOFF = 1.5
+
+
+class Poller(object):
+    """Repeatedly fetch each ``Source`` of a ``SourceList`` when it is due.
+
+    Methods
+    -------
+        run      : Poll sources until interrupted (or for a number of cycles).
+        step     : Fetch all sources which are due, save new articles, and reschedule them.
+        schedule : Add a source to the queue, to be fetched after ``interval`` seconds.
+        nextDue  : Time at which the next source is due (`None` if there are no sources).
+
+    """
+
+    def __init__(self, sourceList, log=None, sets=None):
+        """
+        Arguments
+        ---------
+            sourceList <obj> : ``SourceList`` object whose sources are polled.
+            log        <obj> : ``logging.Logger`` object.
+            sets       <obj> : ``Settings`` object.
+
+        """
+        if(sets is None): sets = Settings.Settings()
+        self._sets = sets
+        self._log = MyLogger.defaultLogger(_LOG_FILENAME, log, sets)
+        self.sourceList = sourceList
+        self.num_polls = 0
+
+        # Heap of (due time, tie-breaking counter, ``Source``); intervals by source URL
+        self._queue = []
+        self._counter = itertools.count()
+        self.intervals = {}
+
+        # Start by polling everything
+        now = time.time()
+        for src in sourceList.sources:
+            self.schedule(src, 0.0, now=now)
+
+        return
+
+    def run(self, cycles=None):
+        """Poll sources until interrupted (or for ``cycles`` steps), sleeping until each is due.
+        """
+        self._log.info("Polling %d sources" % (len(self._queue)))
+        num = 0
+        try:
+            while(cycles is None or num < cycles):
+                due = self.nextDue()
+                if(due is None): break
+                wait = due - time.time()
+                if(wait > 0): time.sleep(wait)
+                self.step()
+                num += 1
+
+        except KeyboardInterrupt:
+            self._log.warning("Interrupted")
+
+        self.sourceList.save(inter=False)
+        return
+
+    def step(self, now=None):
+        """Fetch all sources which are due, save their new articles, and reschedule them.
+
+        Returns
+        -------
+            srcs <obj>[N] : the ``Source`` objects which were fetched.
+
+        """
+        if(now is None): now = time.time()
+
+        srcs = []
+        while(len(self._queue) > 0 and self._queue[0][0] <= now):
+            srcs.append(heapq.heappop(self._queue)[2])
+
+        if(len(srcs) == 0): return srcs
+
+        self._log.debug("Polling %d sources" % (len(srcs)))
+        retvals = Fetcher.fetchAll(srcs, log=self._log)
+        self.sourceList.saveArticles(srcs)
+
+        now = time.time()
+        for src, rv in zip(srcs, retvals):
+            new = (rv and not src.not_modified and src.num_saved > 0)
+            if(new): self._log.info("'%s': %d new articles" % (src.url, src.num_saved))
+
+            interval = self.intervals.get(src.url)
+            if(src.skip_until is not None and src.skip_until > now):
+                # Circuit breaker is open, wait until it closes (keeping the previous interval)
+                heapq.heappush(self._queue, (src.skip_until, next(self._counter), src))
+                continue
+            elif(new or interval is None):
+                interval = estimateInterval(src, now=now, sets=self._sets)
+            else:
+                interval = min(interval*_BACKOFF, self._sets.poll_max)
+
+            self.schedule(src, interval, now=now)
+
+        self.num_polls += len(srcs)
+        self.sourceList.update(srcs)
+        return srcs
+
+    def schedule(self, src, interval, now=None):
+        """Add a source to the queue, to be fetched after ``interval`` seconds.
+        """
+        if(now is None): now = time.time()
+        if(interval > 0): self.intervals[src.url] = interval
+        heapq.heappush(self._queue, (now + interval, next(self._counter), src))
+        return
+
+    def nextDue(self):
+        """Time at which the next source is due (`None` if there are no sources).
+        """
+        if(len(self._queue) == 0): return None
+        return self._queue[0][0]
+
+
+def estimateInterval(src, now=None, sets=None):
+    """Estimate the polling interval for a source from the times of its articles.
+
+    The interval is a fraction of the median time between its most recent articles.  If the most
+    recent article is much older than that (i.e. the source has gone quiet), the interval grows
+    with the time since that article.  Intervals are limited to between ``Settings.poll_min`` and
+    ``Settings.poll_max``; ``Settings.poll_default`` is used if there are too few article times.
+
+    Arguments
+    ---------
+        src  <obj> : ``Source`` object.
+        now  <flt> : current time (seconds since the epoch).
+        sets <obj> : ``Settings`` object.
+
+    Returns
+    -------
+        interval <flt> : seconds until the source should next be polled.
+
+    """
+    if(sets is None): sets = Settings.Settings()
+    if(now is None): now = time.time()
+
+    times = sorted(set(art.time for art in src.articles if art.time is not None), reverse=True)
+    times = times[:_NUM_GAPS+1]
+    if(len(times) < 2): return sets.poll_default
+
+    gaps = sorted(t1 - t2 for t1, t2 in zip(times[:-1], times[1:]))
+    gap = gaps[len(gaps)//2]
+    interval = _GAP_FRAC*gap
+
+    # Source is quiet, slow down in proportion to the time since the last article
+    quiet = now - times[0]
+    if(quiet > 4*gap): interval = max(interval, quiet/4)
+
+    return min(max(interval, sets.poll_min), sets.poll_max)
@@ -0,0 +1,394 @@
+"""Full-text search of sources and archived articles, using a persistent inverted index.
+
+Documents are sources (their names, subnames and URLs) and articles (their titles and summaries).
+Text is split into lower-case word 'terms' (see ``tokenize``), and for each term the index stores
+the documents containing it, with the positions of the term in each ('postings').  A query only
+reads the postings of its own terms, so searching does not depend on the size of the archive.
+
+The index is stored in an SQLite database (``Settings.file_search_index``), and is updated
+incrementally: articles are added when they are saved (see ``Source.saveArticles``), and articles
+already in the index (identified as in ``Archive``, by ``Settings.dedup_key``) are skipped.
+
+Queries
+-------
+    Queries are words and "quoted phrases", e.g. 'climate "sea level"'.  Results contain every
+    word and phrase (phrases as consecutive words), and are ranked by the 'BM25' score: terms
+    which are rare in the index, and frequent in a (short) document, score highly.
+
+Objects
+-------
+    SearchIndex : Persistent inverted index of sources and articles.
+    Hit         : A search result.
+
+Functions
+---------
+    getIndex   : Get the (shared) ``SearchIndex`` object for the given database filename.
+    tokenize   : Split text into lower-case word terms.
+    parseQuery : Split a query into terms and phrases.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import json
+import math
+import os
+import re
+import threading
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+
+import Archive
+import Settings
+
+KINDS = ['source', 'article']
+
+# BM25 parameters: term frequency saturation, and document length normalization
+_BM25_K1 = 1.2
+_BM25_B = 0.75
+
+_RE_WORD = re.compile(r'\w+', re.UNICODE)
+_RE_PHRASE = re.compile(r'"([^"]*)"')
+
+# Shared ``SearchIndex`` objects, by filename (see ``getIndex``)
+_INDICES = {}
+_INDICES_LOCK = threading.Lock()
+
+# Kind of document, source URL, title, link and time (seconds since the epoch) of a result
+Hit = namedtuple('Hit', ['score', 'kind', 'source', 'title', 'link', 'time'])
+
+
+class SearchIndex(object):
+    """Persistent inverted index of sources and articles.
+
+    A single connection is shared between threads, and guarded by a lock.  Use ``getIndex`` to
+    get the shared object for a given filename.
+
+    Methods
+    -------
+        transaction  : Context manager grouping many operations into a single transaction.
+        addArticles  : Index the articles of a source, skipping those already indexed.
+        setSources   : Index the given sources, replacing any previously indexed sources.
+        search       : Find documents matching a query, ranked by relevance.
+        count        : Number of indexed documents (of one kind, or of all kinds).
+        close        : Close the database connection.
+
+        _addDocs     : Insert documents and their postings.
+        _stats       : Number of documents and their average length, for one kind.
+
+    """
+
+    _SCHEMA = [
+        "CREATE TABLE IF NOT EXISTS docs ("
+        "id INTEGER PRIMARY KEY, kind TEXT NOT NULL, source TEXT NOT NULL, key TEXT NOT NULL, "
+        "title TEXT, link TEXT, time REAL, length INTEGER NOT NULL)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS docs_kind_source_key ON docs (kind, source, key)",
+        "CREATE TABLE IF NOT EXISTS postings ("
+        "term TEXT NOT NULL, doc INTEGER NOT NULL, freq INTEGER NOT NULL, positions TEXT NOT NULL, "
+        "PRIMARY KEY (term, doc)) WITHOUT ROWID",
+        "CREATE INDEX IF NOT EXISTS postings_doc ON postings (doc)",
+    ]
+
+    def __init__(self, fname):
+        self.fname = fname
+        dname = os.path.dirname(fname)
+        if(len(dname) > 0 and not os.path.exists(dname)): os.makedirs(dname)
+
+        self._lock = threading.RLock()
+        self._depth = 0
+        import sqlite3
+        self._conn = sqlite3.connect(fname, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        for stmt in self._SCHEMA:
+            self._conn.execute(stmt)
+
+        # Document counts and average lengths for each kind (cleared when documents are added)
+        self._cache = {}
+        return
+
+    @contextmanager
+    def transaction(self):
+        """Context manager grouping many operations into a single transaction (can be nested).
+        """
+        with self._lock:
+            if(self._depth == 0): self._conn.execute("BEGIN")
+            self._depth += 1
+            try:
+                yield self._conn
+            except:
+                self._depth -= 1
+                if(self._depth == 0): self._conn.execute("ROLLBACK")
+                raise
+
+            self._depth -= 1
+            if(self._depth == 0): self._conn.execute("COMMIT")
+
+        return
+
+    def addArticles(self, source, arts, method=None):
+        """Index the articles of a source (titles and summaries), skipping those already indexed.
+
+        Arguments
+        ---------
+            source <str>    : identifier of the source (its URL).
+            arts   <obj>[N] : ``Source.Article`` objects.
+            method <str>    : key method identifying articles, one of ``Archive.KEY_METHODS``
+                              (`None` for ``Settings``).
+
+        Returns
+        -------
+            numNew <int> : number of articles added to the index.
+
+        """
+        import Source
+
+        method = Archive._checkMethod(method)
+        keyed = {}
+        for art in arts:
+            dic = {'title': art.title, 'link': art.link, 'summary': art._summary_html}
+            if(art.guid is not None): dic['id'] = art.guid
+            keyed.setdefault(Archive.articleKey(dic, method), art)
+
+        if(len(keyed) == 0): return 0
+
+        with self.transaction() as conn:
+            # Only tokenize articles which are not already indexed (only looking up their keys,
+            #    so the cost does not grow with the number of indexed articles)
+            known = set()
+            keys = list(keyed.keys())
+            for ii in range(0, len(keys), 500):
+                batch = keys[ii:ii+500]
+                sql = ("SELECT key FROM docs WHERE kind = 'article' AND source = ? AND key IN (%s)"
+                       % (",".join("?"*len(batch))))
+                known.update(key for key, in conn.execute(sql, [source] + batch))
+
+            docs = []
+            for key, art in keyed.items():
+                if(key in known): continue
+                summary = art._summary
+                if(summary is None and art._summary_html is not None):
+                    summary = Source.stripHTML(art._summary_html, 'regex')
+                docs.append((source, key, art.title, art.link, art.time, [art.title, summary]))
+
+            self._addDocs(conn, 'article', docs)
+
+        return len(docs)
+
+    def setSources(self, sources):
+        """Index the given sources (names, subnames and URLs), replacing previously indexed ones.
+
+        Each source document is keyed by its URL, name and subname, so only sources which were
+        added, removed or changed since the last call are (re)indexed.
+        """
+        docs = OrderedDict()
+        for src in sources:
+            key = json.dumps([src.name, src.subname])
+            docs[(src.url, key)] = (src.url, key, src.name, src.url, None,
+                                    [src.name, src.subname, src.url])
+
+        with self.transaction() as conn:
+            old = dict(((source, key), doc) for doc, source, key in conn.execute(
+                "SELECT id, source, key FROM docs WHERE kind = 'source'"))
+            gone = [(doc,) for kk, doc in old.items() if kk not in docs]
+            conn.executemany("DELETE FROM postings WHERE doc = ?", gone)
+            conn.executemany("DELETE FROM docs WHERE id = ?", gone)
+            self._addDocs(conn, 'source', [doc for kk, doc in docs.items() if kk not in old])
+
+        return
+
+    def search(self, query, kind='article', limit=20, source=None):
+        """Find documents matching a query, ranked by relevance (BM25).
+
+        Arguments
+        ---------
+            query  <str> : words and "quoted phrases", all of which must match.
+            kind   <str> : kind of documents to search, one of ``KINDS``.
+            limit  <int> : maximum number of results (`None` for all).
+            source <str> : only search the articles of this source (URL).
+
+        Returns
+        -------
+            hits   <obj>[N] : ``Hit`` objects, best first.
+
+        """
+        if(kind not in KINDS):
+            raise ValueError("Unrecognized kind '%s', must be one of %s" % (kind, str(KINDS)))
+
+        terms, phrases = parseQuery(query)
+        words = set(terms)
+        for phrase in phrases:
+            words.update(phrase)
+
+        if(len(words) == 0): return []
+
+        with self._lock:
+            num, avglen = self._stats(kind)
+            # Postings of each word: {doc: (freq, positions)}
+            postings = {}
+            for word in words:
+                postings[word] = dict(
+                    (doc, (freq, pos)) for doc, freq, pos in self._conn.execute(
+                        "SELECT p.doc, p.freq, p.positions FROM postings p "
+                        "JOIN docs d ON d.id = p.doc WHERE p.term = ? AND d.kind = ?",
+                        (word, kind)))
+
+            # Documents containing every word, starting from the rarest
+            order = sorted(words, key=lambda ww: len(postings[ww]))
+            cands = set(postings[order[0]])
+            for word in order[1:]:
+                cands.intersection_update(postings[word])
+                if(len(cands) == 0): return []
+
+            # Documents containing each phrase
+            for phrase in phrases:
+                cands = set(doc for doc in cands if _hasPhrase(phrase, doc, postings))
+
+            if(len(cands) == 0): return []
+
+            # Document details
+            info = {}
+            cands = list(cands)
+            for ii in range(0, len(cands), 500):
+                batch = cands[ii:ii+500]
+                sql = ("SELECT id, source, title, link, time, length FROM docs WHERE id IN (%s)" %
+                       (",".join("?"*len(batch))))
+                for row in self._conn.execute(sql, batch):
+                    info[row[0]] = row[1:]
+
+        if(source is not None):
+            cands = [doc for doc in cands if info[doc][0] == source]
+
+        # BM25 score: sum over query words of idf * saturated (length-normalized) frequency
+        hits = []
+        for doc in cands:
+            src, title, link, tt, length = info[doc]
+            norm = _BM25_K1*(1 - _BM25_B + _BM25_B*length/avglen) if (avglen > 0) else _BM25_K1
+            score = 0.0
+            for word in words:
+                df = len(postings[word])
+                idf = math.log(1 + (num - df + 0.5)/(df + 0.5))
+                freq = postings[word][doc][0]
+                score += idf*freq*(_BM25_K1 + 1)/(freq + norm)
+
+            hits.append(Hit(score, kind, src, title, link, tt))
+
+        hits.sort(key=lambda hit: (-hit.score, -(hit.time or 0.0)))
+        if(limit is not None): hits = hits[:limit]
+        return hits
+
+    def count(self, kind=None):
+        """Number of indexed documents of the given kind (or of all kinds, if `None`).
+        """
+        with self._lock:
+            if(kind is None): cur = self._conn.execute("SELECT COUNT(*) FROM docs")
+            else: cur = self._conn.execute("SELECT COUNT(*) FROM docs WHERE kind = ?", (kind,))
+            return cur.fetchone()[0]
+
+    def close(self):
+        """Close the database connection.
+        """
+        with _INDICES_LOCK:
+            if(_INDICES.get(self.fname) is self): del _INDICES[self.fname]
+
+        with self._lock:
+            self._conn.close()
+
+        return
+
+    def _addDocs(self, conn, kind, docs):
+        """Insert documents and their postings.  Must be called within a transaction.
+
+        Arguments
+        ---------
+            conn   <obj>    : database connection.
+            kind   <str>    : kind of the documents, one of ``KINDS``.
+            docs   <tup>[N] : (source, key, title, link, time, texts) of each document, where
+                              ``texts`` are the strings (fields) to index.
+
+        """
+        rows = []
+        for source, key, title, link, tt, texts in docs:
+            # Positions continue across fields, with a gap so that phrases cannot span them
+            positions = {}
+            pos = 0
+            for text in texts:
+                for term in tokenize(text):
+                    positions.setdefault(term, []).append(pos)
+                    pos += 1
+                pos += 1
+
+            cur = conn.execute("INSERT OR IGNORE INTO docs (kind, source, key, title, link, time, "
+                               "length) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                               (kind, source, key, title, link, tt, pos))
+            if(cur.rowcount == 0): continue
+            doc = cur.lastrowid
+            rows.extend((term, doc, len(pp), ",".join(str(ii) for ii in pp))
+                        for term, pp in positions.items())
+
+        conn.executemany("INSERT INTO postings (term, doc, freq, positions) VALUES (?, ?, ?, ?)",
+                         rows)
+        self._cache.pop(kind, None)
+        return
+
+    def _stats(self, kind):
+        """Number of documents of the given kind, and their average length (in terms).
+        """
+        stats = self._cache.get(kind)
+        if(stats is None):
+            num, avglen = self._conn.execute("SELECT COUNT(*), AVG(length) FROM docs "
+                                             "WHERE kind = ?", (kind,)).fetchone()
+            stats = (num, avglen or 0.0)
+            self._cache[kind] = stats
+
+        return stats
+
+
+def getIndex(fname=None):
+    """Get the (shared) ``SearchIndex`` object for the given filename (`None` for ``Settings``).
+    """
+    if(fname is None): fname = Settings.Settings().file_search_index
+    with _INDICES_LOCK:
+        index = _INDICES.get(fname)
+        if(index is None):
+            index = SearchIndex(fname)
+            _INDICES[fname] = index
+
+    return index
+
+
+def tokenize(text):
+    """Split text into lower-case word terms, e.g. "Sea-level rise" ==> ['sea', 'level', 'rise'].
+    """
+    if(not text): return []
+    return _RE_WORD.findall(text.lower())
+
+
+def parseQuery(query):
+    """Split a query into terms and "quoted phrases".
+
+    Returns
+    -------
+        terms   <str>[N]    : words outside of quotes.
+        phrases <str>[M][L] : words of each phrase (of two or more words; single words are terms).
+
+    """
+    phrases = []
+    for phrase in _RE_PHRASE.findall(query):
+        phrases.append(tokenize(phrase))
+
+    terms = tokenize(_RE_PHRASE.sub(' ', query))
+    terms.extend(phrase[0] for phrase in phrases if len(phrase) == 1)
+    phrases = [phrase for phrase in phrases if len(phrase) > 1]
+    return terms, phrases
+
+
+def _hasPhrase(phrase, doc, postings):
+    """Whether the words of ``phrase`` appear consecutively in document ``doc``.
+    """
+    starts = set(int(ii) for ii in postings[phrase[0]][doc][1].split(','))
+    for jj, word in enumerate(phrase[1:], 1):
+        pos = set(int(ii) - jj for ii in postings[word][doc][1].split(','))
+        starts.intersection_update(pos)
+        if(len(starts) == 0): return False
+
+    return True
@@ -17,7 +17,7 @@ from __future__ import absolute_import, division, print_function, unicode_litera
 
 import argparse
 
-__version__ = '0.1.1'
+__version__ = '0.2'
 
 
 FILENAME_MIN_LEN = 8
@@ -41,6 +41,10 @@ class Settings(object):
     def __init__(self):
         """
         """
+        # Only initialize once, so that later calls don't reset modified values
+        if(getattr(self, '_initialized', False)): return
+        self._initialized = True
+
         # Basic Parameters
         # ----------------
         self.verbose = True
@@ -51,8 +55,77 @@ class Settings(object):
         self.dir_log = "./log/"
         self.dir_data = "./data/"
 
+        # Source list save file: JSON Lines since v0.2 (the '.conf' name is kept for older,
+        #    ``ConfigObj`` files, which are converted when loaded), see ``SourceList``
         self.file_sourcelist = self.dir_data + "sourcelist.conf"
 
+        # Logging
+        # -------
+        self.log_file_level = 'DEBUG'    # Minimum level of messages logged to file
+        self.log_indent = 'depth'        # {'depth', 'context', 'stack', 'none'} see ``MyLogger``
+        self.log_async = False           # Log through a queue and background thread
+        self.log_queue_size = 10000      # Maximum number of queued records (asynchronous logging)
+        self.log_drop_policy = 'drop_new'    # {'drop_new', 'drop_old', 'block'} see ``MyLogger``
+
+        # Fetching Feeds
+        # --------------
+        self.fetch_workers = 16      # Maximum number of feeds fetched simultaneously
+        self.fetch_per_host = 2      # Maximum number of simultaneous fetches from a single host
+        self.http_pool_size = 2      # Idle (keep-alive) connections kept for each host
+        self.http_pool_hosts = {}    # Number of idle connections for particular hosts (by name)
+        self.fetch_connect_timeout = 10.0    # Seconds to wait when connecting to a host
+        self.fetch_read_timeout = 30.0       # Seconds to wait for data from a host
+        self.fetch_retries = 2       # Number of times to retry a failed request
+        self.fetch_backoff = 1.0     # Base (seconds) of the (exponential) wait between retries
+        self.check_timeout = 10.0    # Seconds to wait for each URL checked when adding sources
+        self.breaker_threshold = 3           # Consecutive failures before a source is skipped
+        self.breaker_cooldown = 3600.0       # Seconds to skip a source (doubles with failures)
+        self.breaker_cooldown_max = 7*86400.0    # Longest time to skip a source
+
+        # Polling (daemon mode), intervals in seconds
+        # --------------------------------------------
+        self.daemon = False
+        self.poll_min = 300.0        # Shortest interval between polls of a source
+        self.poll_max = 86400.0      # Longest interval between polls of a source
+        self.poll_default = 3600.0   # Interval for sources without enough articles to estimate
+
+        # Article Archives
+        # ----------------
+        self.archive_backend = 'jsonl'  # {'jsonl', 'sqlite'} see ``Archive``
+        self.file_archive_db = self.dir_data + "articles.db"
+        self.dedup_key = 'guid'      # Method to identify saved articles, see ``Archive``
+
+        # Search
+        # ------
+        self.search_index = True     # Index saved articles for full-text search, see ``Search``
+        self.file_search_index = self.dir_data + "search.db"
+
+        # Articles
+        # --------
+        self.summary_stripper = 'bs4'    # {'bs4', 'html.parser', 'regex'} see ``Source.stripHTML``
+        self.article_keep_ent = True     # Store full feed entries in ``Article`` (uses more memory)
+        self.article_workers = 0         # Processes constructing ``Article``s (0: number of CPUs)
+        self.article_chunksize = 500     # Entries per process-pool task
+        self.article_pool_min = 2000     # Fewer entries than this are constructed in-process
+
+        # Output
+        # ------
+        self.river = 0               # Print this many articles from all sources, newest first
+                                     #     (0: print articles grouped by source)
+        self.collapse = False        # Collapse near-duplicate articles (across sources)
+
+        # Near-Duplicates, see ``NearDup``
+        # --------------------------------
+        self.near_dup_threshold = 0.5    # Minimum (estimated) similarity of near-duplicates
+        self.near_dup_perms = 64         # Length of MinHash signatures
+        self.near_dup_bands = 16         # LSH bands (must divide ``near_dup_perms``)
+        self.near_dup_shingle = 3        # Words in each shingle
+
+        # Statistics
+        # ----------
+        self.stats_file = None       # File to write timers and counters to at the end of a run
+        self.stats_format = 'json'   # {'json', 'prometheus'} see ``Stats``
+
         # Internal Parameters
         # -------------------
         self.version = __version__
@@ -79,6 +152,34 @@ def getParser(sets):
                         dest="SRC_FILE", default=sets.file_sourcelist,
                         help="sourcelist file.")
 
+    parser.add_argument("-w", "--workers", type=int,
+                        dest="workers", default=sets.fetch_workers,
+                        help="maximum number of feeds to fetch simultaneously.")
+
+    parser.add_argument("--daemon",
+                        action="store_true", dest="daemon", default=sets.daemon,
+                        help="keep running, polling each source at an adaptive interval.")
+
+    parser.add_argument("--per-host", type=int,
+                        dest="per_host", default=sets.fetch_per_host,
+                        help="maximum number of simultaneous fetches from a single host.")
+
+    parser.add_argument("-r", "--river", type=int,
+                        dest="river", default=sets.river,
+                        help="print this many of the newest articles from all sources together.")
+
+    parser.add_argument("--collapse",
+                        action="store_true", dest="collapse", default=sets.collapse,
+                        help="collapse near-duplicate articles (e.g. one story in many feeds).")
+
+    parser.add_argument("--stats",
+                        dest="stats_file", default=sets.stats_file,
+                        help="file to write timing statistics to at the end of the run.")
+
+    parser.add_argument("--stats-format", choices=['json', 'prometheus'],
+                        dest="stats_format", default=sets.stats_format,
+                        help="format of the timing statistics file.")
+
     return parser
 
 
@@ -94,5 +195,12 @@ def getArgs(parser, sets):
     sets.verbose = args.verbose
     sets.debug = args.debug
     sets.file_sourcelist = args.SRC_FILE
+    sets.fetch_workers = args.workers
+    sets.fetch_per_host = args.per_host
+    sets.daemon = args.daemon
+    sets.river = args.river
+    sets.collapse = args.collapse
+    sets.stats_file = args.stats_file
+    sets.stats_format = args.stats_format
 
     return args, sets
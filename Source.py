@@ -8,63 +8,124 @@ Objects
 
 Methods
 -------
-    ent_to_dict :
-    dict_to_ent :
+    ent_to_dict  :
+    stripHTML    : Convert an HTML string to plain text.
+    makeArticles : Construct ``Article`` objects from entries, using a process pool if many.
+    _toEpoch     : Convert a time (``struct_time``, number or string) to seconds since the epoch.
+    _asctime     : String representation of a time in seconds since the epoch.
+
+``feedparser`` and ``bs4`` are only imported when first needed (parsing feeds, stripping HTML).
 
 """
 from __future__ import absolute_import, division, print_function, unicode_literals
 
-import feedparser
+import calendar
+import itertools
+import re
 import time
-import json
 import os
-from bs4 import BeautifulSoup
-import numpy as np
+import threading
 
+import Archive
+import Fetcher
+import Search
 import Settings
+import Stats
+
+try:
+    from html import unescape as _unescape
+except ImportError:
+    from HTMLParser import HTMLParser
+    _unescape = HTMLParser().unescape
+
+# Elements (and their contents) removed entirely by the 'regex' ``stripHTML`` method
+_RE_HTML_BLOCKS = re.compile(r'<(script|style)\b.*?</\1\s*>', re.IGNORECASE | re.DOTALL)
+# HTML tags and comments
+_RE_HTML_TAGS = re.compile(r'<!--.*?-->|<[^>]*>', re.DOTALL)
+
+# Number of articles read from an archive and constructed at once by ``Source.loadArticles``
+_LOAD_BATCH = 20000
+
+# Process pool used by ``makeArticles`` (created on first use, and reused), and its size
+_POOL = None
+_POOL_WORKERS = 0
+_POOL_LOCK = threading.Lock()
 
 
 class Article(object):
+    """
+    Store data for a single article (i.e. feed entry).
+
+    Times are stored as seconds since the epoch (``float``), their string representations are
+    only constructed when needed.  ``__slots__`` are used to minimize the memory of each object,
+    for large archives.  If ``keep_ent`` is `False`, the original entry is not stored after the
+    persisted fields are extracted; those fields are reconstructed by ``toDict``.
+
+    Methods
+    -------
+        str     : Construct a string description of this object using its title and time.
+        toDict  : Construct a JSON-serializable dictionary of this article, for saving.
 
-    def __init__(self, ent):
-        self._ent = ent
+    """
+    __slots__ = ['_ent', 'valid', 'title', 'link', 'guid', '_summary_html', '_summary',
+                 'time', 'time_updated', 'time_published']
+
+    def __init__(self, ent, keep_ent=None):
+        if(keep_ent is None): keep_ent = Settings.Settings().article_keep_ent
+        self._ent = ent if keep_ent else None
         self.valid = False
 
         self.time = None
         self.time_updated = None
         self.time_published = None
-        self.time_updated_str = ''
-        self.time_published_str = ''
-        self.time_str = ''
 
         try:
             self.title = ent['title']
             self.link = ent['link']
-            self.summary = BeautifulSoup(ent['summary']).text
+            self.guid = ent.get('id')
+            # HTML is only stripped from the summary when it is first accessed
+            self._summary_html = ent['summary']
+            self._summary = None
 
-            if('updated_parsed' in ent): self.time_updated = ent['updated_parsed']
-            if('published_parsed' in ent): self.time_published = ent['published_parsed']
+            self.time_updated = _toEpoch(ent.get('updated_parsed'))
+            self.time_published = _toEpoch(ent.get('published_parsed'))
 
         except:
             self.title = None
             self.link = None
-            self.summary = None
+            self.guid = None
+            self._summary_html = None
+            self._summary = None
             return
 
-        if(self.time_updated is not None):
-            self.time_updated_str = time.asctime(self.time_updated)
-
-        if(self.time_published is not None):
-            self.time_published_str = time.asctime(self.time_published)
-
         if(self.time_updated is not None): self.time = self.time_updated
         elif(self.time_published is not None): self.time = self.time_published
 
-        if(self.time is not None): self.time_str = time.asctime(self.time)
-
         self.valid = True
         return
 
+    @property
+    def time_str(self):
+        return _asctime(self.time)
+
+    @property
+    def time_updated_str(self):
+        return _asctime(self.time_updated)
+
+    @property
+    def time_published_str(self):
+        return _asctime(self.time_published)
+
+    @property
+    def summary(self):
+        """
+        Plain-text summary, stripped of HTML (using ``stripHTML``) on first access and cached.
+        """
+        if(self._summary is None and self._summary_html is not None):
+            with Stats.timer('strip_html'):
+                self._summary = stripHTML(self._summary_html)
+        return self._summary
+
     def str(self):
         """
         Note: DO NOT OVERRIDE `__str__` returning unicode!
@@ -74,6 +135,24 @@ class Article(object):
                              w0=Settings.STR_TITLE_LEN, w1=Settings.STR_TIME_LEN)
         return myStr
 
+    def toDict(self):
+        """
+        Construct a JSON-serializable dictionary of this article, for saving.
+
+        If the original entry is stored, it is converted in full (see ``ent_to_dict``),
+        otherwise only the persisted fields are included.
+        """
+        if(self._ent is not None): return ent_to_dict(self._ent)
+
+        dic = {'title': self.title, 'link': self.link, 'summary': self._summary_html}
+        if(self.guid is not None): dic['id'] = self.guid
+        if(self.time_updated is not None):
+            dic['updated_parsed'] = "{:.3f}".format(self.time_updated)
+        if(self.time_published is not None):
+            dic['published_parsed'] = "{:.3f}".format(self.time_published)
+
+        return dic
+
     def _hasGet(self, ent, key):
         if(hasattr(ent, key)): return getattr(ent, key)
         else: return None
@@ -86,15 +165,24 @@ class Source(object):
     Methods
     -------
         str          : Construct a string description of this object using its title and time.
+        toRecord     : Dictionary of the persistent state of this ``Source`` (for save files).
+        fromRecord   : Construct a ``Source`` from a dictionary created by ``toRecord``.
         getFeed      : Load the RSS feed from stored url.
+        iterArticles : Iterate over previously saved articles (using constant memory).
+        loadArticles : Load all previously saved articles from this ``Source``'s archive.
+        saveArticles : Save new articles to this ``Source``'s archive.
+        _failed      : Record a failed fetch, opening the circuit breaker after repeated failures.
+        _succeeded   : Record a successful fetch, closing the circuit breaker.
         _strTimes    : Store string representations of different time attributes.
         _mostRecent  : Find time of the most recent article.
         _hasGet      : Check for attribute, retrieve if possible (otherwise ``None``).
         _getFilename : Construct a viable filename for this ``Source``.
+        _archive     : Get the (cached) ``Archive`` object for this ``Source``.
 
     """
 
-    def __init__(self, url, name='', subname='', filename='', filetime=None):
+    def __init__(self, url, name='', subname='', filename='', filetime=None, etag='',
+                 modified='', failures=0, skip_until=None):
         # Parameters Loaded from SourceList files
         self.url = url
         self.name = name
@@ -103,12 +191,28 @@ class Source(object):
         # Set filename, construct if needed
         if(len(filename) > 0): self._filename = filename
         else:                    self._filename = self._getFilename()
-        self.file_time = filetime
+        #     Times are saved as strings of seconds since the epoch
+        self.file_time = _toEpoch(filetime)
+
+        # HTTP validators from the last successful fetch, used for conditional requests
+        self.etag = etag if (etag is not None) else ''
+        self.modified = modified if (modified is not None) else ''
+        self.not_modified = False
+        self.num_saved = 0
+
+        # Circuit breaker: number of consecutive failed fetches, and time until which to skip
+        self.failures = int(failures) if failures else 0
+        self.skip_until = _toEpoch(skip_until)
+        self.skipped = False
+
+        # Archive object (and the settings it was constructed for), see ``_archive``
+        self._archive_cache = None
 
         self.valid = False
         self.articles = []
         self.count = 0
         self.status = -1
+        self.error = ''
         self.title = ''
 
         self.time = None
@@ -131,6 +235,38 @@ class Source(object):
         myStr = myStr.format(self.title, self.time_str)
         return myStr
 
+    @property
+    def filename(self):
+        """Filename in which this ``Source``'s articles are saved.
+        """
+        return self._filename
+
+    @property
+    def updated(self):
+        """String of the time (seconds since the epoch) when the save file was last updated.
+        """
+        if(self.file_time is None): return ''
+        return "{:.3f}".format(self.file_time)
+
+    def toRecord(self):
+        """
+        Dictionary of the persistent state of this ``Source`` (for ``SourceList`` save files).
+
+        Times are seconds since the epoch (`None` if unknown).
+        """
+        return dict(url=self.url, name=self.name, subname=self.subname, filename=self.filename,
+                    updated=self.file_time, etag=self.etag, modified=self.modified,
+                    failures=self.failures, skip_until=self.skip_until)
+
+    @classmethod
+    def fromRecord(cls, rec):
+        """
+        Construct a ``Source`` from a dictionary created by ``toRecord`` (missing values are empty).
+        """
+        return cls(rec['url'], rec.get('name', ''), rec.get('subname', ''), rec.get('filename', ''),
+                   rec.get('updated'), rec.get('etag', ''), rec.get('modified', ''),
+                   rec.get('failures', 0), rec.get('skip_until'))
+
     def getFeed(self):
         """
         Load the RSS feed from this ``Source``'s stored url.
@@ -139,35 +275,87 @@ class Source(object):
         ``Article`` objects stored to the ``.articles`` variable.  Time information is updated
         based on the metadata given in the RSS feed, and the timestamps of the articles themselves.
 
+        The feed is downloaded using the shared ``Fetcher.HTTPPool`` (reusing connections to each
+        host), and the downloaded data is passed to ``feedparser``.
+
+        The 'ETag' and 'Last-Modified' values from the previous successful fetch are sent with the
+        request.  If the server responds '304: Not Modified', nothing is parsed, ``not_modified``
+        and ``valid`` are set to `True` (the feed is reachable, and unchanged), and the rest of the
+        state of this ``Source`` (e.g. its articles) is left unchanged.
+
+        Requests time out and are retried (see ``Fetcher.HTTPPool``).  After
+        ``Settings.breaker_threshold`` consecutive failures (network errors, HTTP errors or
+        invalid feeds) the source is skipped (``skipped``) until ``skip_until``: a cool-down of
+        ``Settings.breaker_cooldown`` seconds, doubling with each further failure.
+
+        The time of each stage ('fetch', 'parse', 'articles') and the number of bytes and
+        articles fetched are recorded in ``Stats``.
+
         Returns
         -------
-            retval <bool> : `True` on success, `False` otherwise
+            retval <bool> : `True` on success (including 'not modified'), `False` otherwise
 
         """
 
-        # Get Parsed Feed
-        feed = feedparser.parse(self.url)
+        self.valid = False  # Make sure this is False by default
+        self.not_modified = False
+
+        # Skip source while the circuit breaker is open
+        self.skipped = (self.skip_until is not None and time.time() < self.skip_until)
+        if(self.skipped):
+            self.status = -1
+            self.error = "Skipped until %s after %d failures" % (_asctime(self.skip_until),
+                                                                  self.failures)
+            return False
+
+        # Download feed (conditional on the stored validators), using pooled connections
+        etag = self.etag if len(self.etag) > 0 else None
+        modified = self.modified if len(self.modified) > 0 else None
+        try:
+            with Stats.timer('fetch', self.url):
+                response = Fetcher.getPool().get(self.url, etag=etag, modified=modified)
+        except Fetcher.FetchError as err:
+            self.status = -1
+            return self._failed(str(err))
+
+        Stats.count('bytes_fetched', len(response.body), self.url)
+        self.status = response.status
+        self.error = ''
+
+        # Feed is unchanged since the last fetch, skip parsing
+        self.not_modified = (self.status == 304)
+        if(self.not_modified):
+            Stats.count('feeds_not_modified', 1, self.url)
+            self.valid = True
+            return self._succeeded()
+
+        # Parse downloaded feed
+        if(self.status != 200): return self._failed("HTTP status %d" % (self.status))
+        import feedparser
+        with Stats.timer('parse', self.url):
+            feed = feedparser.parse(response.body, response_headers=response.headers)
         self._feed = feed
-        self.status = feed.status
 
         # Check if source feed seems valid
-        self.valid = False  # Make sure this is False by default
-        if(self.status != 200 or not hasattr(feed, 'feed') or not hasattr(feed.feed, 'title')):
-            return False
+        if(not hasattr(feed, 'feed') or not hasattr(feed.feed, 'title')):
+            return self._failed("Invalid feed")
+
+        self._succeeded()
 
         # Set basic parameters (if available)
         self.title = feed.feed.title
         #     Look for something describing time this feed was updated
-        self.feed_time = self._hasGet(feed, 'updated_parsed')
-        if(self.feed_time is None): self.feed_time = self._hasGet(feed, 'published_parsed')
+        self.feed_time = _toEpoch(self._hasGet(feed, 'updated_parsed'))
+        if(self.feed_time is None):
+            self.feed_time = _toEpoch(self._hasGet(feed, 'published_parsed'))
 
-        # Look for 'entries', use them to create ``Articles``
+        # Look for 'entries', use them to create ``Articles`` (replacing any previous ones)
         if(hasattr(feed, 'entries')):
-            for ent in feed.entries:
-                art = Article(ent)
-                if(art.valid): self.articles.append(art)
+            with Stats.timer('articles', self.url):
+                self.articles = makeArticles(feed.entries)
 
             self.count = len(self.articles)
+            Stats.count('articles_fetched', self.count, self.url)
 
         # If no valid articls found, return False
         if(self.count == 0): return False
@@ -182,112 +370,224 @@ class Source(object):
         # Update string times
         self._strTimes()
 
+        # Store validators for the next (conditional) request
+        self.etag = response.headers.get('etag', '')
+        self.modified = response.headers.get('last-modified', '')
+
         self.valid = True
         return True
 
-    def loadArticles(self, fname=None):
+    def _failed(self, error):
+        """
+        Record a failed fetch, opening the circuit breaker after repeated failures.
+
+        Returns
+        -------
+            retval <bool> : `False`, for convenience.
+
         """
+        sets = Settings.Settings()
+        Stats.count('feeds_failed', 1, self.url)
+        self.error = error
+        self.failures += 1
+        if(self.failures >= sets.breaker_threshold):
+            cooldown = sets.breaker_cooldown * 2**(self.failures - sets.breaker_threshold)
+            cooldown = min(cooldown, sets.breaker_cooldown_max)
+            self.skip_until = time.time() + cooldown
+
+        return False
+
+    def _succeeded(self):
         """
+        Record a successful fetch, closing the circuit breaker.
+
+        Returns
+        -------
+            retval <bool> : `True`, for convenience.
 
-        print("\nLOAD")
+        """
+        self.failures = 0
+        self.skip_until = None
+        return True
+
+    def iterArticles(self, fname=None, batch=None, since=None):
+        """
+        Iterate over previously saved articles, without loading the whole archive into memory.
+
+        Articles are read from the archive one at a time (see ``Archive``), so callers can filter
+        or paginate (e.g. with ``itertools.islice``) large archives using constant memory.
+
+        Arguments
+        ---------
+            fname <str> : archive filename (`None` for the default, see ``_archive``).
+            batch <int> : if given, yield lists of (up to) this many ``Article`` objects.
+            since <flt> : only include articles with times at or after this (seconds since epoch).
+
+        Yields
+        ------
+            art   <obj> : ``Article`` object (or a list of them, if ``batch`` is given).
+
+        """
 
-        if(fname is None): fname = self._filename
+        archive = self._archive(fname)
+        if(not archive.exists()): return
 
-        if(not os.path.exists(fname)):
-            estr = "ERROR: file '%s' does not exist!" % (fname)
+        arts = []
+        for dic in archive.iterDicts():
+            art = Article(dic)
+            if(since is not None and (art.time is None or art.time < since)): continue
+
+            if(batch is None):
+                yield art
+                continue
+
+            arts.append(art)
+            if(len(arts) >= batch):
+                yield arts
+                arts = []
+
+        if(len(arts) > 0): yield arts
+
+        return
+
+    def loadArticles(self, fname=None):
+        """
+        Load all previously saved articles from this ``Source``'s archive.
+
+        The archive is read in batches of ``_LOAD_BATCH`` articles, each constructed together (in a
+        process pool, if large enough, see ``makeArticles``), so that only one batch of raw
+        dictionaries is held in memory at a time.  See ``iterArticles`` to iterate over large
+        archives without loading all of their articles.
+
+        Arguments
+        ---------
+            fname <str> : archive filename (`None` for the default, see ``_archive``).
+
+        Returns
+        -------
+            arts  <obj>[N] : ``Article`` objects in the order they were saved.
+
+        """
+
+        archive = self._archive(fname)
+        if(not archive.exists()):
+            estr = "ERROR: archive '%s' does not exist!" % (archive.fname)
             print(estr)
             return []
 
+        arts = []
+        times = [0.0, 0.0]
+        dicts = archive.iterDicts()
         try:
-            data = json.load(open(fname, 'r'))
-            print("Loaded data from '%s'" % (fname))
-        except:
-            estr = "ERROR: could not load json from '%s'" % (fname)
+            while(True):
+                beg = time.time()
+                batch = list(itertools.islice(dicts, _LOAD_BATCH))
+                times[0] += time.time() - beg
+                if(len(batch) == 0): break
+                # Construct each batch together, so that large archives use a process pool
+                beg = time.time()
+                arts.extend(makeArticles(batch))
+                times[1] += time.time() - beg
+        except ValueError:
+            estr = "ERROR: could not load json from '%s'" % (archive.fname)
             print(estr)
             return []
 
-        ents = [dict_to_ent(dic) for dic in data]
-        arts = [Article(ee) for ee in ents]
-        print("Loaded %d articles" % (len(arts)))
-
+        Stats.getStats().addTime('load_archive', times[0], self.url)
+        Stats.getStats().addTime('load_articles', times[1], self.url)
+        Stats.count('articles_loaded', len(arts), self.url)
         return arts
 
     def saveArticles(self, fname=None):
         """
-        """
+        Save new articles to this ``Source``'s archive.
+
+        Only articles not already in the archive are added to it, see ``Archive``.  The archive
+        is not loaded, so saving costs time proportional to the number of new articles.
+        Articles are identified using the ``Settings.dedup_key`` method (e.g. by 'guid').  If
+        ``Settings.search_index`` is set, new articles are also added to the search index, see
+        ``Search``.
 
-        print("\nSAVE")
+        Arguments
+        ---------
+            fname <str> : archive filename (`None` for the default, see ``_archive``).
 
-        if(fname is None): fname = self._filename
+        Returns
+        -------
+            retval <bool> : `True` on success.
 
-        print("Filename = ", fname)
+        """
 
-        if(len(fname) == 0):
-            estr = "Error: invalid filename '%s'" % (fname)
+        archive = self._archive(fname)
+        if(len(archive.fname) == 0):
+            estr = "Error: invalid filename '%s'" % (archive.fname)
             print(estr)
             return False
 
-        arts = []
-        if(os.path.exists(fname)):
-            print("Path '%s' exists" % (fname))
-            arts += self.loadArticles(fname)
-            print("\tLoaded %d articles" % (len(arts)))
+        with Stats.timer('save_articles', self.url):
+            self.num_saved = archive.add(aa.toDict() for aa in self.articles)
+        Stats.count('articles_saved', self.num_saved, self.url)
 
-        else:
-            print("Path '%s' does not exist" % (fname))
+        if(len(self.articles) > 0 and not archive.exists()):
+            estr = "ERROR: did not save to '%s'" % (archive.fname)
+            print(estr)
+            return False
 
-        titles = [aa.title for aa in arts]
-        newArts = 0
-        for aa in self.articles:
-            if(aa.title not in titles):
-                arts.append(aa)
-                newArts += 1
+        if(self.num_saved > 0):
+            self.file_time = time.time()
+            sets = Settings.Settings()
+            if(sets.search_index):
+                with Stats.timer('index_articles', self.url):
+                    Search.getIndex(sets.file_search_index).addArticles(self.url, self.articles)
 
-        print("Adding %d new articles" % (newArts))
+        self.saved = True
 
-        # Convert articles to string dictionaries
-        print("Converting entries to dictionaries")
-        data = [ent_to_dict(aa._ent) for aa in arts]
+        return True
 
-        print("Saving to '%s'" % (fname))
-        json.dump(data, open(fname, 'w'))
+    def _archive(self, fname=None):
+        """
+        Get the ``Archive`` object for this ``Source``, based on ``Settings.archive_backend``.
 
-        if(not os.path.exists(fname)):
-            estr = "ERROR: did not save to '%s'" % (fname)
-            print(estr)
-            return False
+        For the 'jsonl' backend, ``fname`` is the archive file (default: ``filename``); for the
+        'sqlite' backend, it is the database file (default: ``Settings.file_archive_db``).
+        The object is reused (so that e.g. the keys of a 'jsonl' archive are only read once)
+        until the backend, filename or ``Settings.dedup_key`` changes.
+        """
+        sets = Settings.Settings()
+        backend = sets.archive_backend
+        if(fname is None):
+            fname = sets.file_archive_db if (backend == 'sqlite') else self._filename
 
-        print("Saved")
-        self.saved = True
+        key = (backend, fname, sets.dedup_key)
+        if(self._archive_cache is not None and self._archive_cache[0] == key):
+            return self._archive_cache[1]
 
-        return True
+        if(backend == 'sqlite'): archive = Archive.SQLiteArchive(fname, self.url)
+        else:                    archive = Archive.JSONLArchive(fname)
+
+        self._archive_cache = (key, archive)
+        return archive
 
     def _strTimes(self):
         """
         Store string representations of different time attributes.
         """
-        self.time_str = time.asctime(self.time)
-        if(self.feed_time is not None): self.feed_time_str = time.asctime(self.feed_time)
-        if(self.article_time is not None): self.article_time_str = time.asctime(self.article_time)
-        if(self.file_time is not None): self.file_time_str = time.asctime(self.file_time)
+        self.time_str = _asctime(self.time)
+        self.feed_time_str = _asctime(self.feed_time)
+        self.article_time_str = _asctime(self.article_time)
+        self.file_time_str = _asctime(self.file_time)
         return
 
     def _mostRecent(self):
         """
-        Find time of the most recent article.
+        Find time of the most recent article (`None` if no articles have times).
         """
         times = [art.time for art in self.articles if art.time is not None]
         if(len(times) == 0):
             print("WARNING: NO TIMES!  %s" % (self.url))
-        elif(len(times) == 1):
-            return times[0]
-        else:
-
-            recent = times[0]
-            for tt in times[1:]:
-                if(tt > recent): recent = tt
+            return None
 
-        return recent
+        return max(times)
 
     def _hasGet(self, feed, key):
         """
@@ -339,27 +639,153 @@ def ent_to_dict(ent):
     # Copy data to new dictionary
     dic = dict(ent)
 
-    # Convert ``struct_time`` objects to strings
+    # Convert ``struct_time`` objects (or epoch times) to strings
     for key in list(dic.keys()):
         if(key.endswith('_parsed')):
-            strTime = "{:.3f}".format(time.mktime(dic[key]))
-            dic[key] = strTime
+            epoch = _toEpoch(dic[key])
+            if(epoch is None): del dic[key]
+            else:              dic[key] = "{:.3f}".format(epoch)
 
     return dic
 
 
-def dict_to_ent(dic):
+def stripHTML(html, method=None):
     """
+    Convert an HTML string to plain text.
+
+    Methods:
+        'bs4'         : ``BeautifulSoup`` using its default (best available) parser.
+        'html.parser' : ``BeautifulSoup`` using the (fast) builtin 'html.parser'.
+        'regex'       : remove tags with regular expressions and unescape entities (fastest).
+
+    Arguments
+    ---------
+        html   <str> : HTML string.
+        method <str> : one of the above methods (`None` for ``Settings.summary_stripper``).
+
+    Returns
+    -------
+        text   <str> : plain text.
+
     """
+    if(method is None): method = Settings.Settings().summary_stripper
 
-    # Copy data to new dictionary
-    ent = dict(dic)
+    if(method == 'regex'):
+        text = _RE_HTML_BLOCKS.sub('', html)
+        text = _RE_HTML_TAGS.sub('', text)
+        return _unescape(text)
+    elif(method == 'html.parser'):
+        from bs4 import BeautifulSoup
+        return BeautifulSoup(html, 'html.parser').text
+    elif(method == 'bs4'):
+        from bs4 import BeautifulSoup
+        return BeautifulSoup(html).text
 
-    # String times to ``struct_time``
-    for key in list(ent.keys()):
-        if(key.endswith('_parsed')):
-            fltTime = np.float(ent[key])
-            struct_time = time.localtime(fltTime)
-            ent[key] = struct_time
+    raise ValueError("Unrecognized HTML stripping method '%s'!" % (method))
+
+
+def makeArticles(ents, workers=None, chunksize=None):
+    """
+    Construct ``Article`` objects from feed entries (or saved dictionaries), keeping valid ones.
+
+    If there are at least ``Settings.article_pool_min`` entries, they are split into chunks of
+    ``chunksize`` and constructed in a pool of worker processes, where each summary is also
+    stripped of HTML (the CPU-intensive part).  Otherwise they are constructed in-process and
+    summaries are stripped lazily (see ``Article.summary``).
+
+    Arguments
+    ---------
+        ents      <dict>[N] : feed entries or saved article dictionaries.
+        workers   <int>     : number of processes (`None` for ``Settings.article_workers``;
+                              `0` for the number of CPUs; `1` to always work in-process).
+        chunksize <int>     : number of entries per task (`None` for ``Settings``).
+
+    Returns
+    -------
+        arts      <obj>[M]  : valid ``Article`` objects, in the same order as ``ents``.
+
+    """
+    sets = Settings.Settings()
+    if(workers is None): workers = sets.article_workers
+    if(chunksize is None): chunksize = sets.article_chunksize
+    if(workers == 0): workers = os.cpu_count() or 1
+    chunksize = max(int(chunksize), 1)
+    ents = list(ents)
+
+    # Small batches are faster in-process
+    if(workers <= 1 or len(ents) < max(sets.article_pool_min, 2*chunksize)):
+        arts = [Article(ent) for ent in ents]
+        return [art for art in arts if art.valid]
+
+    chunks = [(ents[ii:ii+chunksize], sets.article_keep_ent, sets.summary_stripper)
+              for ii in range(0, len(ents), chunksize)]
+    arts = []
+    for chunk in _getPool(workers).map(_makeArticlesChunk, chunks):
+        arts.extend(chunk)
+
+    return arts
 
-    return ent
+
+def _makeArticlesChunk(args):
+    """
+    Construct valid ``Article`` objects, with stripped summaries, from a chunk of entries.
+
+    Run in worker processes by ``makeArticles``; settings are passed explicitly because the
+    workers do not share the parent's ``Settings``.
+    """
+    ents, keep_ent, stripper = args
+    arts = []
+    for ent in ents:
+        art = Article(dict(ent), keep_ent=keep_ent)
+        if(not art.valid): continue
+        art._summary = stripHTML(art._summary_html, stripper)
+        arts.append(art)
+
+    return arts
+
+
+def _getPool(workers):
+    """
+    Get the shared process pool for ``makeArticles``, (re)creating it with ``workers`` processes.
+
+    The pool is often first used from fetch threads (``getFeed``), where forking could copy locks
+    held by other threads (e.g. of the HTTP pool or logging) into the workers, deadlocking them.
+    Workers are therefore started with the 'forkserver' method (or 'spawn' where unavailable),
+    which never fork the calling process.
+    """
+    global _POOL, _POOL_WORKERS
+    with _POOL_LOCK:
+        if(_POOL is None or _POOL_WORKERS != workers):
+            if(_POOL is not None): _POOL.shutdown(wait=False)
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            methods = multiprocessing.get_all_start_methods()
+            context = multiprocessing.get_context('forkserver' if ('forkserver' in methods)
+                                                  else 'spawn')
+            _POOL = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+            _POOL_WORKERS = workers
+
+        return _POOL
+
+
+def _toEpoch(val):
+    """
+    Convert a time (``struct_time``, number or string) to seconds since the epoch (`None` if empty).
+
+    ``struct_time`` values (e.g. feedparser's '*_parsed' times) are in UTC, and are converted
+    with ``calendar.timegm`` (not ``time.mktime``, which assumes local time).
+    """
+    if(val is None): return None
+    if(isinstance(val, (tuple, time.struct_time))): return calendar.timegm(val)
+    try:
+        return float(val)
+    except ValueError:
+        return None
+
+
+def _asctime(epoch):
+    """
+    String representation (in UTC) of a time in seconds since the epoch (empty string for `None`).
+    """
+    if(epoch is None): return ''
+    return time.asctime(time.gmtime(epoch))
@@ -5,7 +5,7 @@ Notes
     - Updating / Changing SourceList save files
       - - - - - - - - - - - - - - - - - - - - -
         + Make class of old `KEYS` (e.g. ``_KEYS__V0_1``)
-        + Create method to convert to newest version (e.g. ``_V0_1__to__V0_2``)
+        + Create method to convert to newest version (e.g. ``_V0_1_1__to__V0_2``)
         + Update ``SourceList``'s ``load``, ``save``, and ``new`` methods for changes.
             - Note that ``load`` might have to makeup some differences...
         + Update ``__version__`` number.
@@ -19,42 +19,86 @@ Functions
 ---------
     main         : Run interactive mode where the user passes options via CLI.
     _inter_add   : Interactively add a new ``SourceList`` entry.
-    _inter_del   : Interactively delete a ``SourceList`` entry.
-    _inter_find  :
+    _inter_del   : Interactively delete a ``SourceList`` entry (by index number, URL or name).
+    _inter_find  : Interactively search sources and archived articles.
+    _inter_import : Interactively add the feeds in an OPML file.
+    _inter_export : Interactively write all sources to an OPML file.
     _inter_save  : Save current ``SourceList`` to file.
+    _zio         : Import ``zcode.inout`` (when first needed).
+
+Save Files
+----------
+    Since v0.2, save files are JSON Lines: a header object (version, previous save files, and the
+    names of record fields), then one record for each ``Source`` (see ``Source.toRecord``), stored
+    as an array of values.  ``update`` appends records for changed sources, instead of rewriting
+    the whole file; when loading, the last record for each URL is used, and malformed records
+    (e.g. from an interrupted ``update``) are skipped.  ``save`` rewrites the file with a single
+    record per source (compacting it).  Older (``ConfigObj``) save files are converted when
+    loaded; the default filename (``Settings.file_sourcelist``) keeps its '.conf' extension.
+
+Heavy dependencies (``configobj``, ``zcode``, ``numpy`` through ``ArticleStore`` and ``NearDup``,
+and through ``Source``: ``feedparser`` and ``bs4``) are only imported when first needed, so that
+listing or editing sources starts quickly.
 
 To-Do
 -----
     1) Add ``info`` interactive option (and associated function) to print summary info,
        including version, number of sources, etc.
     2) Create save files for Source data.
-    3) Remove redundancy in ``SourceList`` data --- i.e. the '_src_*' arrays.
 
 """
 from __future__ import absolute_import, division, print_function, unicode_literals
 
+import heapq
+import itertools
+import json
+import numbers
 import os
 import shutil
-from configobj import ConfigObj
-import numpy as np
-
-import zcode.inout as zio
+from collections import OrderedDict
 
+import Archive
+import Fetcher
 import MyLogger
+import Search
 import Settings
 import Source
+import Stats
 
 _LOG_FILENAME = 'sources.log'
 
+# Key of the number of records in a save file (not saved), see ``SourceList._readSave``
+_NUM_RECORDS = '_num_records'
+# Appended records beyond this many (plus the number of sources) trigger a compacting ``save``
+_COMPACT_MIN = 100
+
 
 class SOURCELIST_KEYS(object):
     VERS = 'version'
     SAVE_LIST = 'savefile_list'
-    URLS = 'sources_urls'
-    NAMES = 'sources_names'
-    SUBNAMES = 'sources_subnames'
-    FILENAMES = 'sources_filenames'
-    UPDATED = 'sources_updated'
+    FIELDS = 'fields'
+    SOURCES = 'sources'
+
+
+class _RECORD_KEYS(object):
+    URL = 'url'
+    NAME = 'name'
+    SUBNAME = 'subname'
+    FILENAME = 'filename'
+    UPDATED = 'updated'
+    ETAG = 'etag'
+    MODIFIED = 'modified'
+    FAILURES = 'failures'
+    SKIP_UNTIL = 'skip_until'
+
+
+# Indexes of sources (see ``SourceList.find``), each maps a key to the list of matching sources
+_INDEXES = ['url', 'host', 'name', 'subname', 'filename']
+
+# Order of values in each saved record
+_RECORD_FIELDS = [_RECORD_KEYS.URL, _RECORD_KEYS.NAME, _RECORD_KEYS.SUBNAME, _RECORD_KEYS.FILENAME,
+                  _RECORD_KEYS.UPDATED, _RECORD_KEYS.ETAG, _RECORD_KEYS.MODIFIED,
+                  _RECORD_KEYS.FAILURES, _RECORD_KEYS.SKIP_UNTIL]
 
 
 class SourceList(object):
@@ -69,21 +113,38 @@ class SourceList(object):
         new      : Initialize a new (or clear existing) state.
         load     : Load sources list from the given filename.
         save     : Save ``SourceList`` state to file.
+        update   : Append the current state of some sources to the save file.
         add      : Add one or multiple entries to sources.
+        find     : Find the sources matching a URL, host, name, subname or filename.
+        importOPML : Add the feeds in an OPML file.
+        exportOPML : Write all sources to an OPML file.
         delete   : Remove one or multiple entries from sources.
         list     : List some or all sources to stdout.
-        getFeeds : Tell earch ``Source`` object to get its RSS feed.
+        getFeeds : Tell each ``Source`` object to get its RSS feed (concurrently).
+        saveArticles : Save new articles from all sources to their archives.
+        articleStore : Construct a columnar ``ArticleStore`` of all sources' articles.
+        river        : Merged timeline of all sources' articles, newest first.
+        nearDuplicates : Find clusters of near-duplicate articles across all sources.
+        search       : Full-text search of sources or archived articles.
+        indexArticles : Add sources' archived articles to the search index.
 
         _get             : Retrieve one or multiple sources from list (default: return all).
+        _nearDupLabels   : Cluster labels of near-duplicate articles.
         _checkVersion    : Make sure the loaded version is up-to-date.  Prompt to update.
         _backupFile      : Create a backup of the given file.
         _str_src         : Create a string representation of a single source.
         _confirm_unsaved : If there is unsaved data, Prompt user (via CLI) to confirm overwrite.
-        _recount         : Count the current number of sources and assure all lists match in length.
+        _recount         : Count the current number of sources.
+        _reindex         : Discard the indexes of sources (by URL, host, name, etc).
+        _getIndex        : Get one index of sources, building the indexes if needed.
+        _indexAdd        : Add sources to the indexes.
+        _indexRemove     : Remove sources from the indexes.
         _same_size       : Check whether all of the given arrays or lists are the same size.
-        _clearSourceList : Reset source lists to empty.
+        _readSave        : Read save data (records, or ``ConfigObj`` for old versions) from file.
+        _writeSave       : Write save data (header and records) to file.
         _updateSave      : Based on the version of old save data, delegate conversion to new style.
-        _V0_1__to__V0_2  : Convert from save data v0.1 to v0.2.
+        _V0_1__to__V0_1_1 : Convert from save data v0.1 to v0.1.1.
+        _V0_1_1__to__V0_2 : Convert from save data v0.1.1 to v0.2.
 
     """
 
@@ -97,6 +158,11 @@ class SourceList(object):
         # Set default filename
         if(fname is None): fname = sets.file_sourcelist
 
+        # Results of the last ``getFeeds`` and ``add``
+        self.num_not_modified = 0
+        self.num_skipped = 0
+        self.checks = []
+
         loaded = False
 
         # Load data from save file
@@ -150,13 +216,19 @@ class SourceList(object):
         self.savefile = None
         self._saved = True
         self.count = 0
+        self.num_not_modified = 0
+        self.num_skipped = 0
+        self.checks = []
 
         # SourceList data
-        self._clearSourceLists()
         self.sources = []
+        self._num_records = 0
+        self._indexed = False
+        self._reindex()
 
         return True
 
+    @Stats.timed('sourcelist_load')
     def load(self, fname, inter=True):
         """
         Load sources list from the given filename.
@@ -178,42 +250,23 @@ class SourceList(object):
             confirm = self._confirm_unsaved()
             if(not confirm): return False
 
-        # Load file as ``ConfigObj``
+        # Load save data (records, or ``ConfigObj`` for old versions)
         self._log.info("Loading ``SourceList`` from '%s'" % (fname))
-        config = ConfigObj(fname)
+        data = self._readSave(fname)
+        Stats.count('sourcelist_bytes_loaded', os.path.getsize(fname))
 
         # Check version, update if needed
-        config = self._checkVersion(config, fname, inter)
-        if(config is None):
+        data = self._checkVersion(data, fname, inter)
+        if(data is None):
             self._log.error("Version check on '%s' failed!" % (fname))
             return False
 
-        # Load Raw Data from save file
-        self.version = config[SOURCELIST_KEYS.VERS]
-        self._savefile_list = config[SOURCELIST_KEYS.SAVE_LIST]
-        self._src_urls = config[SOURCELIST_KEYS.URLS]
-        self._src_names = config[SOURCELIST_KEYS.NAMES]
-        self._src_subnames = config[SOURCELIST_KEYS.SUBNAMES]
-
-        numSrcs = len(self._src_urls)
-        filenames = config[SOURCELIST_KEYS.FILENAMES]
-        if(len(filenames) == numSrcs): self._src_filenames = filenames
-        else:                          self._src_filenames = ['']*numSrcs
-        updated = config[SOURCELIST_KEYS.UPDATED]
-        if(len(updated) == numSrcs): self._src_updated = updated
-        else:                        self._src_updated = [None]*numSrcs
-
-        # Construct list of ``Source``s from raw data
-        self.sources = []
-        for ii in range(numSrcs):
-            url = self._src_urls[ii]
-            nam = self._src_names[ii]
-            sub = self._src_subnames[ii]
-            fil = self._src_filenames[ii]
-            upd = self._src_updated[ii]
-
-            src = Source.Source(url, nam, sub, fil, upd)
-            self.sources.append(src)
+        # Construct list of ``Source``s from records
+        self.version = data[SOURCELIST_KEYS.VERS]
+        self._savefile_list = data[SOURCELIST_KEYS.SAVE_LIST]
+        self.sources = [Source.Source.fromRecord(rec) for rec in data[SOURCELIST_KEYS.SOURCES]]
+        self._num_records = data.get(_NUM_RECORDS, len(self.sources))
+        self._reindex()
 
         # Set metadata
         self.savefile = fname
@@ -222,6 +275,7 @@ class SourceList(object):
 
         return True
 
+    @Stats.timed('sourcelist_save')
     def save(self, fname=None, inter=True):
         """
         Save ``SourceList`` state to file.
@@ -251,31 +305,16 @@ class SourceList(object):
                 self._log.error("``savefile`` is not set, ``fname`` must be provided!")
                 return retval
 
-        # Update internal parameters based on list of sources
-        self._clearSourceLists()
-        for src in self.sources:
-            self._src_urls.append(src.url)
-            self._src_names.append(src.name)
-            self._src_subnames.append(src.subname)
-            self._src_filenames.append(src.filename)
-            self._src_updated.append(src.updated)
-
-        # Setup data using ``ConfigObj``
-        self._log.debug("Creating ``ConfigObj``")
-        config = ConfigObj()
-        config.filename = fname
-        config[SOURCELIST_KEYS.VERS] = self.version
-        config[SOURCELIST_KEYS.SAVE_LIST] = self._savefile_list
-        config[SOURCELIST_KEYS.URLS] = self._src_urls
-        config[SOURCELIST_KEYS.NAMES] = self._src_names
-        config[SOURCELIST_KEYS.SUBNAMES] = self._src_subnames
-        config[SOURCELIST_KEYS.FILENAMES] = self._src_filenames
-        config[SOURCELIST_KEYS.UPDATED] = self._src_updated
+        # One record for each ``Source``
+        data = {SOURCELIST_KEYS.VERS: self.version,
+                SOURCELIST_KEYS.SAVE_LIST: self._savefile_list,
+                SOURCELIST_KEYS.SOURCES: [src.toRecord() for src in self.sources]}
 
         # Make sure path exists, confirm overwrite in interactive mode
-        zio.checkPath(fname)
+        dname = os.path.dirname(fname)
+        if(len(dname) > 0 and not os.path.exists(dname)): os.makedirs(dname)
         if(os.path.exists(fname) and inter):
-            conf = zio.promptYesNo("\tDestination '%s' already exists, overwrite?" % (fname))
+            conf = _zio().promptYesNo("\tDestination '%s' already exists, overwrite?" % (fname))
             if(not conf): return False
 
             # Create backup
@@ -285,12 +324,14 @@ class SourceList(object):
                 return False
 
         # Save data
-        self._log.debug("Writing ``ConfigObj``")
-        config.write()
+        self._log.debug("Writing records")
+        self._writeSave(fname, data)
 
         # Make sure its saved
         if(os.path.exists(fname)):
             retval = True
+            Stats.count('sourcelist_bytes_saved', os.path.getsize(fname))
+            self._num_records = len(self.sources)
             self._recount()
             self._log.info("Saved %d sources to '%s'" % (self.count, fname))
             self.savefile = fname
@@ -304,18 +345,58 @@ class SourceList(object):
 
         return retval
 
+    @Stats.timed('sourcelist_update')
+    def update(self, sources):
+        """
+        Append the current state (e.g. update times, HTTP validators) of some sources to the file.
+
+        Only the records of the given sources are written, so the cost does not depend on the
+        total number of sources.  Other changes (e.g. added or deleted sources) require ``save``.
+        If the file has accumulated many superseded records, or does not exist yet, the whole
+        list is saved instead (see ``save``).
+
+        Arguments
+        ---------
+            sources <obj>[N] : ``Source`` objects to update.
+
+        Returns
+        -------
+            retval <bool> : `True` on success, otherwise `False`.
+
+        """
+        self._log.debug("update()")
+        fname = self.savefile
+        compact = (self._num_records + len(sources) > 2*len(self.sources) + _COMPACT_MIN)
+        if(fname is None or not os.path.exists(fname) or compact):
+            return self.save(inter=False)
+
+        # Terminate any partial record (interrupted ``update``), so new records start a new line
+        _endLine(fname)
+        with open(fname, 'a') as out:
+            _writeRecords(out, [src.toRecord() for src in sources])
+
+        self._num_records += len(sources)
+        self._log.debug("Updated %d sources in '%s'" % (len(sources), fname))
+        return True
+
     def add(self, url, title=None, subtitle=None, check=True):
         """
         Add one or multiple entries to sources.
 
         If ``title`` and/or ``subtitle`` are provided, they must match length of ``url``.
 
+        URLs already in the list (compared after ``Archive.normalizeLink``), or repeated, are
+        skipped.  If ``check``, all URLs are checked together (concurrently) with
+        ``Fetcher.checkFeeds``, and only those which parse as feeds are added.  The result for
+        each URL is logged, and stored (as ``Fetcher.FeedCheck`` objects) in ``checks``.  Entries
+        without a title are given the title of their feed.
+
         Arguments
         ---------
             url      <str>([N])  : URL of new entry/entries.
             title    <str>([N])  : Titles of new entries.
             subtitle <str>([N])  : Subtitles of new entries.
-            check    <bool>      : Check each URL for existence before adding.
+            check    <bool>      : Check that each URL is a feed before adding.
 
         Returns
         -------
@@ -326,25 +407,54 @@ class SourceList(object):
 
         # Make sure url(s) is(are) iterable
         if(isinstance(url, str)): url = [url]
+        if(isinstance(title, str)): title = [title]
+        if(isinstance(subtitle, str)): subtitle = [subtitle]
         # If no title/subtitle are provided, set to empty strings
-        if(title is None): title = ['']*np.size(url)
-        if(subtitle is None): subtitle = ['']*np.size(url)
+        if(title is None): title = ['']*len(url)
+        if(subtitle is None): subtitle = ['']*len(url)
 
         # Make sure all arrays are the same length
         if(not self._same_size(url, title, subtitle)):
             self._log.error("values to add are not the same length!")
             return False
 
-        # Iterate over and add all new entries
+        # Skip URLs which are already in the list (or repeated)
         retval = True
-        for uu, tt, ss in zip(url, title, subtitle):
-            # Check that url exists, skip if not
-            if(check and not zio.checkURL(uu)):
-                self._log.warning("URL '%s' does not exist, skipping!" % (uu))
+        keep = []
+        keys = set()
+        for ii, uu in enumerate(url):
+            key = _urlKey(uu)
+            if(key in self._getIndex('url') or key in keys):
+                self._log.warning("URL '%s' is already in the list, skipping!" % (uu))
                 retval = False
                 continue
-
-            self.sources.append(Source(uu, tt, ss))
+            keys.add(key)
+            keep.append(ii)
+
+        if(len(keep) < len(url)):
+            url, title, subtitle = [[vals[ii] for ii in keep] for vals in (url, title, subtitle)]
+
+        # Check all URLs together, skip those which are not feeds
+        self.checks = []
+        if(check):
+            self.checks = Fetcher.checkFeeds(url, log=self._log)
+            for chk in self.checks:
+                if(chk.valid): self._log.info("URL '%s' is a feed: '%s'" % (chk.url, chk.title))
+                else: self._log.warning("URL '%s' skipped: %s" % (chk.url, chk.error))
+
+        # Add all new entries at once
+        added = []
+        for ii, (uu, tt, ss) in enumerate(zip(url, title, subtitle)):
+            if(check):
+                if(not self.checks[ii].valid):
+                    retval = False
+                    continue
+                if(len(tt) == 0): tt = self.checks[ii].title
+
+            added.append(Source.Source(uu, tt, ss))
+
+        self.sources.extend(added)
+        self._indexAdd(added)
 
         # update metadata
         self._recount()
@@ -352,13 +462,76 @@ class SourceList(object):
 
         return retval
 
+    def importOPML(self, fname, check=False, save=True):
+        """
+        Add the feeds in an OPML file (e.g. exported from another feed reader), see ``OPML``.
+
+        The file is read incrementally, feeds whose URLs are already in the list (or earlier in
+        the file, compared as in ``add``) are skipped, and all new feeds are added (see ``add``)
+        and saved at once.
+
+        Arguments
+        ---------
+            fname <str>  : OPML filename.
+            check <bool> : check that each URL is a feed before adding (see ``add``).
+            save  <bool> : save the ``SourceList`` after adding.
+
+        Returns
+        -------
+            num   <int>  : number of sources added.
+
+        """
+        self._log.debug("importOPML('%s')" % (fname))
+        import OPML
+
+        keys = set()
+        new = []
+        num_dups = 0
+        for url, name, subname in OPML.iterFeeds(fname):
+            key = _urlKey(url)
+            if(key in self._getIndex('url') or key in keys):
+                num_dups += 1
+                continue
+            keys.add(key)
+            new.append((url, name, subname))
+
+        self._log.info("Read %d new feeds from '%s' (%d duplicates skipped)" %
+                       (len(new), fname, num_dups))
+        if(len(new) == 0): return 0
+
+        num = self.count
+        url, title, subtitle = [list(vals) for vals in zip(*new)]
+        self.add(url, title=title, subtitle=subtitle, check=check)
+        num = self.count - num
+        self._log.info("Added %d sources" % (num))
+        if(save and num > 0): self.save(inter=False)
+        return num
+
+    def exportOPML(self, fname):
+        """
+        Write all sources to an OPML file (sources with a ``subname`` are grouped by ``name``).
+
+        Returns
+        -------
+            num <int> : number of sources written.
+
+        """
+        self._log.debug("exportOPML('%s')" % (fname))
+        import OPML
+        num = OPML.writeFeeds(fname, [(src.url, src.name, src.subname) for src in self.sources])
+        self._log.info("Wrote %d sources to '%s'" % (num, fname))
+        return num
+
     def delete(self, index, inter=True):
         """
         Remove one or multiple entries from sources.
 
+        Entries can be given by index number, by URL, or as ``Source`` objects (e.g. from
+        ``find``).  All entries are removed in a single pass over the list.
+
         Arguments
         ---------
-            index <int>([N]) : index or indices to delete.
+            index <obj>([N]) : index number(s), URL(s) or ``Source`` object(s) to delete.
             inter <bool>     : interactive, if so, confirm delete.
 
         Returns
@@ -368,21 +541,32 @@ class SourceList(object):
         """
         self._log.debug("delete()")
 
+        # Make sure entries are iterable
+        if(isinstance(index, (numbers.Integral, str, Source.Source))): index = [index]
+
+        # Find the ``Source`` object of each entry
+        del_src = OrderedDict()
+        for item in index:
+            if(isinstance(item, numbers.Integral)): srcs = [self.sources[item]]
+            elif(isinstance(item, str)): srcs = self.find(url=item)
+            else: srcs = [item]
+            if(len(srcs) == 0):
+                self._log.error("No source with URL '%s'!" % (item))
+                return False
+
+            for src in srcs:
+                del_src[id(src)] = src
+
         # If interactive, show sources and confirm deletion
         if(inter):
             print("Delete the following sources: ")
-            self.list(index)
-            conf = zio.promptYesNo('Are you sure?')
+            self.list([ii for ii, src in enumerate(self.sources) if id(src) in del_src])
+            conf = _zio().promptYesNo('Are you sure?')
             if(not conf): return False
 
-        # Make sure indices are iterable
-        if(not np.iterable(index)): index = [index]
-
-        # Iterate over IDs and delete
-        #     MUST REVERSE ITERATE so that index numbers are preserved for subsequent entries.
-        del_src = []
-        for id in reversed(index):
-            del_src.append(self.sources.pop(id))
+        self.sources = [src for src in self.sources if id(src) not in del_src]
+        del_src = list(del_src.values())
+        self._indexRemove(del_src)
 
         # Report deleted urls
         self._log.info("Deleted URLs:")
@@ -414,16 +598,269 @@ class SourceList(object):
 
         return
 
-    def getFeeds(self):
+    def find(self, url=None, host=None, name=None, subname=None, filename=None):
+        """
+        Find the sources matching all of the given values, using hash indexes (not a scan).
+
+        URLs are compared after ``Archive.normalizeLink``, hosts as used to limit fetches per host
+        (``Fetcher.getHost``, i.e. case-insensitively), and names case-insensitively.  ``subname``
+        requires ``name``.
+
+        Arguments
+        ---------
+            url      <str> : URL of the feed.
+            host     <str> : host name, or a URL on that host.
+            name     <str> : name (title) of the source.
+            subname  <str> : subname (subtitle) of the source.
+            filename <str> : archive filename of the source.
+
+        Returns
+        -------
+            srcs <obj>[N] : matching ``Source`` objects, in list order.
+
+        """
+        if(subname is not None and name is None):
+            raise ValueError("Finding sources by ``subname`` requires ``name``")
+
+        matches = None
+        values = dict(url=url, host=host, name=name, subname=subname, filename=filename)
+        for kind in _INDEXES:
+            val = values[kind]
+            if(val is None): continue
+            if(kind == 'subname'): key = (_nameKey(name), _nameKey(subname))
+            elif(kind == 'host'): key = _hostKey(val)
+            elif(kind == 'name'): key = _nameKey(val)
+            elif(kind == 'url'): key = _urlKey(val)
+            else: key = val
+
+            srcs = self._getIndex(kind).get(key, [])
+            if(matches is None): matches = srcs
+            else:
+                ids = set(id(src) for src in srcs)
+                matches = [src for src in matches if id(src) in ids]
+
+        return list(matches) if (matches is not None) else []
+
+    def getFeeds(self, workers=None, per_host=None):
         """
-        Tell earch ``Source`` object to get its RSS feed.
+        Tell each ``Source`` object to get its RSS feed (concurrently).
+
+        Feeds are fetched using ``Fetcher.fetchAll``; wall-clock time is set by the slowest
+        feeds instead of the sum of all of them.  Each ``Source`` stores its own results.
+        The number of sources whose feeds were 'not modified' is stored to ``num_not_modified``,
+        and the number skipped after repeated failures (see ``Source.getFeed``) to ``num_skipped``.
+
+        Arguments
+        ---------
+            workers  <int> : maximum number of simultaneous fetches (`None` for ``Settings``).
+            per_host <int> : maximum number of simultaneous fetches per host.
+
+        Returns
+        -------
+            numValid <int> : number of sources which loaded a valid feed.
+
         """
         self._log.debug("getFeeds()")
-        numValid = 0
-        for src in self.sources:
-            if(src.getFeed()): numValid += 1
+        retvals = Fetcher.fetchAll(self.sources, workers=workers, per_host=per_host, log=self._log)
+        self.num_not_modified = sum(1 for src in self.sources if src.not_modified)
+        self.num_skipped = sum(1 for src in self.sources if src.skipped)
+        numValid = sum(1 for src, rv in zip(self.sources, retvals) if rv and not src.not_modified)
+        self._log.info("Loaded %d/%d valid feeds" % (numValid, len(retvals)))
+        self._log.info("%d feeds not modified" % (self.num_not_modified))
+        if(self.num_skipped > 0):
+            self._log.info("%d feeds skipped after repeated failures" % (self.num_skipped))
+        return numValid
+
+    def saveArticles(self, sources=None):
+        """
+        Save new articles from all sources to their archives (see ``Source.saveArticles``).
 
-        return
+        With the 'sqlite' archive backend, all sources are saved in a single transaction (as are
+        the additions to the search index, see ``Search``).
+
+        Arguments
+        ---------
+            sources <obj>[N] : ``Source`` objects to save (`None` for all).
+
+        Returns
+        -------
+            numNew <int> : total number of new articles saved.
+
+        """
+        self._log.debug("saveArticles()")
+        sets = Settings.Settings()
+
+        if(sources is None): sources = self.sources
+
+        def _save():
+            numNew = 0
+            for src in sources:
+                if(len(src.articles) == 0): continue
+                src.saveArticles()
+                numNew += src.num_saved
+
+            return numNew
+
+        if(sets.search_index):
+            _save = _inTransaction(Search.getIndex(sets.file_search_index).transaction, _save)
+        if(sets.archive_backend == 'sqlite'):
+            _save = _inTransaction(Archive.getArticleDB(sets.file_archive_db).transaction, _save)
+
+        numNew = _save()
+
+        self._log.info("Saved %d new articles" % (numNew))
+        # Archive update times have changed
+        if(numNew > 0): self._saved = False
+        return numNew
+
+    def articleStore(self, archived=False):
+        """
+        Construct a columnar ``ArticleStore`` of all sources' articles, for bulk time queries.
+
+        Source numbers in the store are the indices of ``sources``.
+
+        Arguments
+        ---------
+            archived <bool> : use each source's archived articles, instead of those in memory.
+
+        Returns
+        -------
+            store <obj> : ``ArticleStore.ArticleStore`` object.
+
+        """
+        self._log.debug("articleStore()")
+        import ArticleStore
+        store = ArticleStore.ArticleStore.fromSources(self.sources, archived=archived)
+        self._log.debug(" - %d articles from %d sources" % (len(store), self.count))
+        return store
+
+    def river(self, limit=None, since=None, until=None, collapse=False):
+        """
+        Merged timeline ('river') of all sources' (loaded) articles, newest first.
+
+        Each source's articles are put in order (feeds are usually in order already), then the
+        sources are merged with a heap (k-way merge), so only ``limit`` articles are compared
+        across sources, instead of sorting all articles together.  Articles without times are
+        excluded.
+
+        If ``collapse``, near-duplicate articles (see ``NearDup``) within the time window are
+        collapsed into the newest of them, and ``limit`` applies to the collapsed timeline.  All
+        articles in the window must then be compared, so use ``since``/``until`` to bound it;
+        otherwise only the first ``limit`` articles of the merge are ever compared or taken.
+
+        Arguments
+        ---------
+            limit    <int>  : maximum number of articles (`None` for all).
+            since    <flt>  : earliest time (seconds since the epoch), `None` for no limit.
+            until    <flt>  : latest time (exclusive), `None` for no limit.
+            collapse <bool> : collapse near-duplicate articles.
+
+        Returns
+        -------
+            river <obj>[N] : (``Source``, ``Article``) pairs, newest first.  If ``collapse``,
+                             (``Source``, ``Article``, dups) triples, where ``dups`` are the
+                             (``Source``, ``Article``) pairs of its (older) near-duplicates.
+
+        """
+        self._log.debug("river()")
+
+        def _stream(src):
+            arts = iter(_newestFirst(src.articles))
+            if(until is not None): arts = itertools.dropwhile(lambda art: art.time >= until, arts)
+            if(since is not None): arts = itertools.takewhile(lambda art: art.time >= since, arts)
+            return ((src, art) for art in arts)
+
+        merged = heapq.merge(*[_stream(src) for src in self.sources],
+                             key=lambda pair: pair[1].time, reverse=True)
+        if(collapse):
+            # Group all articles in the window by cluster, in order of each cluster's newest
+            pairs = list(merged)
+            groups = OrderedDict()
+            for label, pair in zip(self._nearDupLabels([art for _, art in pairs]), pairs):
+                groups.setdefault(label, []).append(pair)
+            river = [group[0] + (group[1:],) for group in itertools.islice(groups.values(), limit)]
+        else:
+            river = list(itertools.islice(merged, limit))
+        self._log.debug(" - %d articles from %d sources" % (len(river), self.count))
+        return river
+
+    def search(self, query, limit=20, kind='article'):
+        """
+        Full-text search of sources (names, subnames and URLs) or archived articles.
+
+        See ``Search`` for the query syntax and ranking.  Sources are (re)indexed first if they
+        have changed since the last search.
+
+        Arguments
+        ---------
+            query <str> : words and "quoted phrases", all of which must match.
+            limit <int> : maximum number of results (`None` for all).
+            kind  <str> : 'article' or 'source'.
+
+        Returns
+        -------
+            hits  <obj>[N] : ``Search.Hit`` objects, best first.
+
+        """
+        self._log.debug("search('%s', kind='%s')" % (query, kind))
+        index = Search.getIndex(Settings.Settings().file_search_index)
+        if(kind == 'source' and not self._indexed):
+            index.setSources(self.sources)
+            self._indexed = True
+
+        with Stats.timer('search'):
+            hits = index.search(query, kind=kind, limit=limit)
+
+        self._log.debug(" - %d results" % (len(hits)))
+        return hits
+
+    def indexArticles(self, sources=None):
+        """
+        Add sources' archived articles to the search index (e.g. archives saved before indexing).
+
+        Articles which are already indexed are skipped.
+
+        Arguments
+        ---------
+            sources <obj>[N] : ``Source`` objects to index (`None` for all).
+
+        Returns
+        -------
+            numNew <int> : number of articles added to the index.
+
+        """
+        self._log.debug("indexArticles()")
+        if(sources is None): sources = self.sources
+        index = Search.getIndex(Settings.Settings().file_search_index)
+
+        numNew = 0
+        with index.transaction():
+            for src in sources:
+                arts = src.loadArticles()
+                if(len(arts) == 0): continue
+                with Stats.timer('index_articles', src.url):
+                    numNew += index.addArticles(src.url, arts)
+
+        self._log.info("Indexed %d new articles" % (numNew))
+        return numNew
+
+    def nearDuplicates(self):
+        """
+        Find clusters of near-duplicate (loaded) articles across all sources, see ``NearDup``.
+
+        Returns
+        -------
+            dups <dict> : for each duplicate article, as (source index, article index), the
+                          first article of its cluster (in order of sources, then articles).
+
+        """
+        self._log.debug("nearDuplicates()")
+        locs = [(ii, jj) for ii, src in enumerate(self.sources) for jj in range(len(src.articles))]
+        arts = [self.sources[ii].articles[jj] for ii, jj in locs]
+        dups = dict((loc, locs[label]) for loc, label in zip(locs, self._nearDupLabels(arts))
+                    if locs[label] != loc)
+        self._log.debug(" - %d duplicates of %d articles" % (len(dups), len(arts)))
+        return dups
 
     def _get(self, index=None):
         """
@@ -441,27 +878,34 @@ class SourceList(object):
         """
         self._log.debug("_get()")
 
-        # Convert index to a slicing object
-        import numbers
+        # Convert index to a list of indices
         # Single integer number
         if(isinstance(index, numbers.Integral)):
-            ids = np.arange(index, index+1)
+            ids = [index]
         # List of numbers
-        elif(np.iterable(index)):
-            ids = np.array(index)
+        elif(hasattr(index, '__iter__')):
+            ids = list(index)
         # Otherwise, return all sources
         else:
             if(index is not None):
                 self._log.error("Unrecognized `index` = '%s'!" % (str(index)))
                 self._log.warning("Returning all entries")
 
-            ids = np.arange(len(self._src_urls))
+            ids = list(range(len(self.sources)))
 
         # Select target elements and return
         srcs = [self.sources[ii] for ii in ids]
 
         return ids, srcs
 
+    def _nearDupLabels(self, arts):
+        """
+        Cluster label of each article (index of the first article in its cluster), see ``NearDup``.
+        """
+        import NearDup
+        with Stats.timer('near_dup'):
+            return NearDup.clusters([NearDup.articleText(art) for art in arts])
+
     def _checkVersion(self, config, fname, inter):
         """
         Make sure the loaded version is up-to-date.  If not, prompt to update, or return ``None``.
@@ -500,7 +944,7 @@ class SourceList(object):
         # If interactive, prompt user to update file
         else:
             msg += "; update to load?"
-            conf = zio.promptYesNo("\t" + msg, default='y')
+            conf = _zio().promptYesNo("\t" + msg, default='y')
             if(not conf):
                 self._log.error(estr)
                 return None
@@ -520,11 +964,12 @@ class SourceList(object):
         # Convert old, loaded dictionary to new, updated one
         self._log.debug("Updating save data")
         config = self._updateSave(config)
+        if(config is None): return None
 
         # Save new version
         vers = config[SOURCELIST_KEYS.VERS]
         self._log.info("Saving new version v'%s' to '%s'" % (vers, fname))
-        config.write()
+        self._writeSave(fname, config)
         if(not os.path.exists(fname)):
             self._log.error("Filename '%s' does not exist!  Save failed!!" % (fname))
             return None
@@ -549,7 +994,7 @@ class SourceList(object):
         self._log.debug("_backupFile()")
 
         # Create backup filename
-        backname = zio.modifyFilename(fname, append=append, prepend=prepend)
+        backname = _zio().modifyFilename(fname, append=append, prepend=prepend)
 
         # If backup already exists, delete
         if(os.path.exists(backname)):
@@ -610,33 +1055,73 @@ class SourceList(object):
         """
         if(hasattr(self, '_saved')):
             if(not self._saved):
-                return zio.promptYesNo('This will overwrite unsaved data, are you sure?')
+                return _zio().promptYesNo('This will overwrite unsaved data, are you sure?')
 
         return True
 
     def _recount(self):
         """
-        Count the current number of sources and assure all lists match in length.
+        Count the current number of sources, and mark the search index as out of date.
 
         Updated count is stored to `self.count`.
 
         Returns
         -------
-            retval <bool> : `True` if all lengths match.
+            retval <bool> : `True`.
 
         """
 
         self._log.debug("_recount()")
-        uselists = [self._src_urls, self._src_names, self._src_subnames, self.sources]
+        self.count = len(self.sources)
+        # Sources have changed, the search index must be updated before searching them
+        self._indexed = False
+        self._log.debug("%d sources" % (self.count))
+        return True
 
-        count = np.size(self._src_urls)
-        if(self._same_size(*uselists)): self._log.debug("All lists have length %d" % (count))
-        else:
-            self._log.error("Sources list lengths do not match!")
-            return False
+    def _reindex(self):
+        """
+        Discard the indexes of sources, they are rebuilt when next needed (see ``_getIndex``).
+        """
+        self._index = None
+        return
 
-        self.count = count
-        return True
+    def _getIndex(self, kind):
+        """
+        Get one index of sources (one of ``_INDEXES``), building all indexes if needed.
+
+        The indexes map keys (see ``_indexKeys``) to the list of matching sources.  They are only
+        built when first used, so that loading (e.g. to fetch all feeds) does not compute keys.
+        """
+        if(self._index is None):
+            self._index = dict((key, {}) for key in _INDEXES)
+            with Stats.timer('sourcelist_index'):
+                self._indexAdd(self.sources)
+
+        return self._index[kind]
+
+    def _indexAdd(self, srcs):
+        """
+        Add sources to the indexes (if they have been built).
+        """
+        if(self._index is None): return
+        for src in srcs:
+            for kind, key in _indexKeys(src.url, src.name, src.subname, src.filename).items():
+                self._index[kind].setdefault(key, []).append(src)
+
+        return
+
+    def _indexRemove(self, srcs):
+        """
+        Remove sources from the indexes (if they have been built).
+        """
+        if(self._index is None): return
+        for src in srcs:
+            for kind, key in _indexKeys(src.url, src.name, src.subname, src.filename).items():
+                matches = [other for other in self._index[kind].get(key, []) if other is not src]
+                if(len(matches) > 0): self._index[kind][key] = matches
+                else: self._index[kind].pop(key, None)
+
+        return
 
     def _same_size(self, *arrs):
         """
@@ -651,30 +1136,93 @@ class SourceList(object):
             retval <bool> : `True` if all are same length
 
         """
-        counts = [np.size(ar) for ar in arrs]
+        counts = [len(ar) for ar in arrs]
         if(len(set(counts)) == 1): return True
         return False
 
-    def _clearSourceLists(self):
+    def _readSave(self, fname):
         """
-        Reset source lists to empty.
+        Read save data from the given file: records (v0.2+) or a ``ConfigObj`` (older versions).
+
+        The first line is the header (a JSON object), each following line is the record of a
+        ``Source`` (a JSON array of values, named by the header's ``SOURCELIST_KEYS.FIELDS``).
+        Records appended by ``update`` follow, where the last record for each URL replaces any
+        previous ones.  Malformed records (e.g. from an interrupted ``update``) are skipped, with
+        a warning.
+
+        Returns
+        -------
+            data <dict> : save data; for v0.2+ including the list of records
+                          (``SOURCELIST_KEYS.SOURCES``) and the number of records in the file.
+
+        """
+        self._log.debug("_readSave()")
+        with open(fname, 'r') as infile:
+            line = infile.readline()
+            # Old versions are ``ConfigObj`` text files
+            if(not line.lstrip().startswith('{')):
+                from configobj import ConfigObj
+                return ConfigObj(fname)
+
+            data = json.loads(line)
+            fields = data.pop(SOURCELIST_KEYS.FIELDS, _RECORD_FIELDS)
+            key = fields.index(_RECORD_KEYS.URL)
+            lines = [line for line in infile if len(line.strip()) > 0]
+
+        # Decode all records together (much faster than line by line), unless some are malformed
+        try:
+            rows = json.loads('[' + ','.join(lines) + ']')
+        except ValueError:
+            rows = []
+            for num, line in enumerate(lines):
+                try:
+                    rows.append(json.loads(line))
+                except ValueError:
+                    # e.g. a record partially written by an interrupted ``update``
+                    self._log.warning("Skipping malformed record %d in '%s'" % (num + 1, fname))
+
+        records = OrderedDict()
+        for vals in rows:
+            records[vals[key]] = dict(zip(fields, vals))
+
+        data[SOURCELIST_KEYS.SOURCES] = list(records.values())
+        data[_NUM_RECORDS] = len(rows)
+        return data
+
+    def _writeSave(self, fname, data):
         """
-        self._src_urls = []
-        self._src_names = []
-        self._src_subnames = []
-        self._src_filenames = []
-        self._src_updated = []
+        Write save data (header and records, see ``_readSave``) to the given file.
+
+        The file is written to a temporary file which then replaces the original, so an existing
+        save file is never left partially written.
+        """
+        self._log.debug("_writeSave()")
+        header = dict((kk, vv) for kk, vv in data.items()
+                      if kk not in [SOURCELIST_KEYS.SOURCES, _NUM_RECORDS])
+        header[SOURCELIST_KEYS.FIELDS] = _RECORD_FIELDS
+        temp = fname + '.temp'
+        with open(temp, 'w') as out:
+            out.write(json.dumps(header, sort_keys=True) + '\n')
+            _writeRecords(out, data[SOURCELIST_KEYS.SOURCES])
+
+        os.rename(temp, fname)
         return
 
     def _updateSave(self, old):
         """
         Based on the version of old dictionary save data, delegate conversion to new style.
+
+        Conversions are applied in sequence, e.g. v0.1 ==> v0.1.1 ==> v0.2.
         """
         self._log.debug("_updateSave()")
         vers = old[SOURCELIST_KEYS.VERS]
 
-        if(vers.startswith('0.1')):
-            new = self._V0_1__to__V0_2(old)
+        if(vers == '0.1'):
+            old = self._V0_1__to__V0_1_1(old)
+            vers = old[SOURCELIST_KEYS.VERS]
+
+        if(vers == '0.1.1'):
+            new = self._V0_1_1__to__V0_2(old)
 
         else:
             estr = "Unknown version v'%s'!" % (vers)
@@ -683,20 +1231,56 @@ class SourceList(object):
 
         return new
 
-    def _V0_1__to__V0_2(self, old):
+    def _V0_1__to__V0_1_1(self, old):
         """
-        Convert from save data v0.1 to v0.2.
+        Convert from save data v0.1 to v0.1.1.
         """
-        self._log.debug("_V0_1__to__V0_2()")
-        new = ConfigObj()
-        new.filename = old.filename
-        new[SOURCELIST_KEYS.VERS] = '0.1.1'
-        new[SOURCELIST_KEYS.URLS] = old[_KEYS__V0_1.SOURCES_URL]
-        new[SOURCELIST_KEYS.NAMES] = old[_KEYS__V0_1.SOURCES_TITLE]
-        new[SOURCELIST_KEYS.SUBNAMES] = old[_KEYS__V0_1.SOURCES_SUBTITLE]
-        new[SOURCELIST_KEYS.SAVE_LIST] = old[_KEYS__V0_1.SAVE_LIST]
-        new[SOURCELIST_KEYS.FILENAMES] = []
-        new[SOURCELIST_KEYS.UPDATED] = []
+        self._log.debug("_V0_1__to__V0_1_1()")
+        new = {}
+        new[_KEYS__V0_1_1.VERS] = '0.1.1'
+        new[_KEYS__V0_1_1.URLS] = old[_KEYS__V0_1.SOURCES_URL]
+        new[_KEYS__V0_1_1.NAMES] = old[_KEYS__V0_1.SOURCES_TITLE]
+        new[_KEYS__V0_1_1.SUBNAMES] = old[_KEYS__V0_1.SOURCES_SUBTITLE]
+        new[_KEYS__V0_1_1.SAVE_LIST] = old[_KEYS__V0_1.SAVE_LIST]
+        new[_KEYS__V0_1_1.FILENAMES] = []
+        new[_KEYS__V0_1_1.UPDATED] = []
+
+        return new
+
+    def _V0_1_1__to__V0_2(self, old):
+        """
+        Convert from save data v0.1.1 (parallel lists of values) to v0.2 (a record per source).
+
+        HTTP validators and circuit-breaker state may not be present in older v0.1.1 files.
+        """
+        self._log.debug("_V0_1_1__to__V0_2()")
+        urls = _asList(old[_KEYS__V0_1_1.URLS])
+        num = len(urls)
+
+        def _values(key, default):
+            vals = _asList(old.get(key, []))
+            return vals if len(vals) == num else [default]*num
+
+        cols = [(_RECORD_KEYS.URL, urls),
+                (_RECORD_KEYS.NAME, _values(_KEYS__V0_1_1.NAMES, '')),
+                (_RECORD_KEYS.SUBNAME, _values(_KEYS__V0_1_1.SUBNAMES, '')),
+                (_RECORD_KEYS.FILENAME, _values(_KEYS__V0_1_1.FILENAMES, '')),
+                (_RECORD_KEYS.UPDATED, _values(_KEYS__V0_1_1.UPDATED, '')),
+                (_RECORD_KEYS.ETAG, _values(_KEYS__V0_1_1.ETAGS, '')),
+                (_RECORD_KEYS.MODIFIED, _values(_KEYS__V0_1_1.MODIFIED, '')),
+                (_RECORD_KEYS.FAILURES, _values(_KEYS__V0_1_1.FAILURES, 0)),
+                (_RECORD_KEYS.SKIP_UNTIL, _values(_KEYS__V0_1_1.SKIP_UNTIL, ''))]
+
+        # Convert through ``Source`` objects, so that values are stored as in new records
+        records = []
+        for ii in range(num):
+            rec = dict((key, vals[ii]) for key, vals in cols)
+            records.append(Source.Source.fromRecord(rec).toRecord())
+
+        new = {}
+        new[SOURCELIST_KEYS.VERS] = '0.2'
+        new[SOURCELIST_KEYS.SAVE_LIST] = _asList(old.get(_KEYS__V0_1_1.SAVE_LIST, []))
+        new[SOURCELIST_KEYS.SOURCES] = records
 
         return new
 
@@ -711,6 +1295,8 @@ def main():
         [d]elete : delete an existing sources entry
         [l]ist   : list all current sources
         [f]ind   : find/search for a particular source
+        [i]mport : add the feeds in an OPML file
+        [e]xport : write all sources to an OPML file
         [s]ave   : save the current sources to file
         [h]elp   : This help information
 
@@ -734,7 +1320,8 @@ def main():
 
     # Interactive Routine
     # -------------------
-    prompt = "\n\tAction?  [q]uit, [a]dd, [d]elete, [l]ist, [f]ind, [s]ave, [h]elp : "
+    prompt = ("\n\tAction?  [q]uit, [a]dd, [d]elete, [l]ist, [f]ind, [i]mport, [e]xport, "
+              "[s]ave, [h]elp : ")
     while(True):
         arg = input(prompt)
         arg = arg.strip().lower()
@@ -751,6 +1338,10 @@ def main():
             sourceList.list()
         elif(arg.startswith('f')):
             _inter_find(sourceList, log)
+        elif(arg.startswith('i')):
+            _inter_import(sourceList, log)
+        elif(arg.startswith('e')):
+            _inter_export(sourceList, log)
         elif(arg.startswith('s')):
             _inter_save(sourceList, sets, log)
         elif(arg.startswith('h')):
@@ -787,6 +1378,7 @@ def _inter_add(sourceList, log):
         if(url == 'q'):
             log.debug("Break '%s'" % (url))
             return
+        if(len(url) > 0): break
 
     # Title
     titl = input("\tTitle (e.g. 'NewYork Times'): ")
@@ -806,31 +1398,100 @@ def _inter_add(sourceList, log):
 
 def _inter_del(sourceList, log):
     """
-    Interactively delete a ``SourceList`` entry.
+    Interactively delete a ``SourceList`` entry (given by index number, URL or name).
     """
     log.debug("_inter_del()")
 
-    index = input("\tIndex number: ").strip().lower()
-    if(index.startswith('q')):
+    index = input("\tIndex number, URL or name: ").strip()
+    if(len(index) == 0 or index.lower() == 'q'):
         log.debug("Break")
         return
 
+    # Not a number: find sources by URL, else by name
     try:
-        index = np.int(index)
-    except:
-        log.error("Could not convert '%s' to integer" % (index))
-        return
+        index = int(index)
+    except ValueError:
+        srcs = sourceList.find(url=index) or sourceList.find(name=index)
+        if(len(srcs) == 0):
+            log.error("No source with index number, URL or name '%s'" % (index))
+            return
+        index = srcs
 
+    label = str(index) if isinstance(index, int) else ", ".join(src.url for src in index)
     retval = sourceList.delete(index, inter=True)
-    if(retval): log.info("Deleted entry '%d'" % (index))
-    else: log.error("Could not delete entry '%d'!" % (index))
+    if(retval): log.info("Deleted entry '%s'" % (label))
+    else: log.error("Could not delete entry '%s'!" % (label))
 
     return
 
 
 def _inter_find(sourceList, log):
+    """
+    Interactively search sources and archived articles.
+
+    Prompts user for a query (words and "quoted phrases"), and lists matching sources (with their
+    index numbers) and the best matching articles.
+    """
     log.debug("_inter_find()")
 
+    query = input("\tSearch (e.g. 'climate \"sea level\"') : ").strip()
+    if(len(query) == 0 or query == 'q'):
+        log.debug("Break '%s'" % (query))
+        return
+
+    # Matching sources, listed by index number
+    hits = sourceList.search(query, limit=None, kind='source')
+    index = dict((src.url, ii) for ii, src in enumerate(sourceList.sources))
+    print("Sources: %d" % (len(hits)))
+    for hit in hits:
+        ii = index.get(hit.source)
+        if(ii is not None): print(sourceList._str_src(ii, sourceList.sources[ii]))
+
+    # Matching articles
+    hits = sourceList.search(query, limit=20, kind='article')
+    print("\nArticles: %d" % (len(hits)))
+    for hit in hits:
+        print("%s  %s\n\t%s" % (Source._asctime(hit.time), hit.title, hit.link))
+
+    return
+
+
+def _inter_import(sourceList, log):
+    """
+    Interactively add the feeds in an OPML file.
+    """
+    log.debug("_inter_import()")
+
+    fname = input("\tOPML filename : ").strip()
+    if(len(fname) == 0 or fname == 'q'):
+        log.debug("Break '%s'" % (fname))
+        return
+
+    if(not os.path.exists(fname)):
+        log.error("File '%s' does not exist!" % (fname))
+        return
+
+    check = _zio().promptYesNo("\tCheck that each URL is a feed?", default='n')
+    num = sourceList.importOPML(fname, check=check)
+    log.info("Imported %d sources from '%s'" % (num, fname))
+
+    return
+
+
+def _inter_export(sourceList, log):
+    """
+    Interactively write all sources to an OPML file.
+    """
+    log.debug("_inter_export()")
+
+    fname = input("\tOPML filename : ").strip()
+    if(len(fname) == 0 or fname == 'q'):
+        log.debug("Break '%s'" % (fname))
+        return
+
+    num = sourceList.exportOPML(fname)
+    log.info("Exported %d sources to '%s'" % (num, fname))
+
     return
 
 
@@ -858,6 +1519,115 @@ def _inter_save(sourceList, sets, log):
     return
 
 
+def _newestFirst(arts):
+    """
+    Articles with times, newest first (only sorted if they are not in order already).
+    """
+    arts = [art for art in arts if art.time is not None]
+    if(any(art1.time < art2.time for art1, art2 in zip(arts[:-1], arts[1:]))):
+        arts = sorted(arts, key=lambda art: art.time, reverse=True)
+
+    return arts
+
+
+def _endLine(fname):
+    """
+    Make sure that a (non-empty) file ends with a newline, adding one if needed.
+    """
+    with open(fname, 'rb+') as out:
+        if(out.seek(0, os.SEEK_END) == 0): return
+        out.seek(-1, os.SEEK_END)
+        if(out.read(1) != b'\n'): out.write(b'\n')
+
+    return
+
+
+def _writeRecords(out, records):
+    """
+    Write records to an open file, one compact JSON array (of ``_RECORD_FIELDS`` values) per line.
+    """
+    for rec in records:
+        vals = [rec.get(kk) for kk in _RECORD_FIELDS]
+        out.write(json.dumps(vals, separators=(',', ':')) + '\n')
+
+    return
+
+
+def _indexKeys(url, name='', subname='', filename=''):
+    """
+    Keys of a source in each of the indexes (``_INDEXES``).
+    """
+    return dict(url=_urlKey(url), host=_hostKey(url), name=_nameKey(name),
+                subname=(_nameKey(name), _nameKey(subname)), filename=filename)
+
+
+def _urlKey(url):
+    """
+    Normalized URL (see ``Archive.normalizeLink``), URLs without a scheme are taken to start with
+    the host, e.g. 'www.A.com/b/' ==> 'a.com/b'.
+    """
+    url = url.strip()
+    if('//' not in url): url = '//' + url
+    return Archive.normalizeLink(url)
+
+
+def _hostKey(url):
+    """
+    Host of a URL (or a host name) as used to limit fetches per host, see ``Fetcher.getHost``.
+    """
+    url = url.strip()
+    if('//' not in url): url = '//' + url
+    return Fetcher.getHost(url)
+
+
+def _nameKey(name):
+    """
+    Normalized (case-insensitive) name, for the indexes.
+    """
+    return ' '.join((name or '').split()).lower()
+
+
+def _inTransaction(transaction, func):
+    """
+    Wrap ``func`` so that it is called within the context manager returned by ``transaction()``.
+    """
+    def _wrapper():
+        with transaction():
+            return func()
+
+    return _wrapper
+
+
+def _asList(val):
+    """
+    Values loaded by ``ConfigObj`` as a list (a single value may be loaded as a plain string).
+    """
+    if(isinstance(val, str)): return [val]
+    return list(val)
+
+
+def _zio():
+    """
+    Import ``zcode.inout`` when first needed (it imports many heavy dependencies).
+    """
+    import zcode.inout as zio
+    return zio
+
+
+class _KEYS__V0_1_1(object):
+    VERS = 'version'
+    SAVE_LIST = 'savefile_list'
+    URLS = 'sources_urls'
+    NAMES = 'sources_names'
+    SUBNAMES = 'sources_subnames'
+    FILENAMES = 'sources_filenames'
+    UPDATED = 'sources_updated'
+    ETAGS = 'sources_etags'
+    MODIFIED = 'sources_modified'
+    FAILURES = 'sources_failures'
+    SKIP_UNTIL = 'sources_skip_until'
+
+
 class _KEYS__V0_1(object):
     VERS = 'version'
     SAVE_LIST = 'savefile_list'
@@ -0,0 +1,247 @@
+"""Timers and counters for each stage of the pipeline, per run and per source.
+
+Stages (e.g. 'fetch', 'parse', 'articles') are timed with the ``timer`` context manager, and
+quantities (e.g. 'bytes_fetched', 'articles_saved') are accumulated with ``count``.  Each is
+recorded for the whole run, and, if a source (URL) is given, for that source.  All methods are
+thread-safe, so sources fetched concurrently (see ``Fetcher``) can record to the same object.
+
+Results are available as a dictionary (``Stats.toDict``), and can be written as JSON or in the
+Prometheus text exposition format (``Stats.dump``), e.g. at the end of a run of ``Feeder``.
+
+Objects
+-------
+    Stats : Thread-safe timers and counters, for the whole run and for each source.
+
+Functions
+---------
+    getStats : Get the shared ``Stats`` object.
+    timer    : Context manager timing a stage, recorded to the shared ``Stats`` object.
+    count    : Add to a counter of the shared ``Stats`` object.
+    timed    : Decorator timing each call of a function as a stage.
+
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import functools
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+STATS_FORMATS = ['json', 'prometheus']
+
+# High resolution clock for intervals
+_clock = getattr(time, 'perf_counter', time.time)
+
+# Shared ``Stats`` (see ``getStats``)
+_STATS = None
+_STATS_LOCK = threading.Lock()
+
+
+class Stats(object):
+    """Thread-safe timers and counters, for the whole run and for each source.
+
+    For each stage, the number of calls, total time and longest time (seconds) are stored.
+
+    Methods
+    -------
+        timer        : Context manager timing the enclosed code as a stage.
+        addTime      : Record one call of a stage, taking the given time.
+        count        : Add to a counter.
+        reset        : Clear all timers and counters.
+        toDict       : All timers and counters, as a dictionary (suitable for JSON).
+        toPrometheus : All timers and counters, in the Prometheus text exposition format.
+        summary      : Lines of text summarizing the time and calls of each stage.
+        dump         : Write all timers and counters to a file.
+
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+        return
+
+    @contextmanager
+    def timer(self, stage, source=None):
+        """Context manager timing the enclosed code as ``stage`` (optionally for ``source``).
+        """
+        beg = _clock()
+        try:
+            yield
+        finally:
+            self.addTime(stage, _clock() - beg, source)
+
+        return
+
+    def addTime(self, stage, secs, source=None):
+        """Record one call of ``stage`` which took ``secs`` seconds (optionally for ``source``).
+        """
+        with self._lock:
+            _addTime(self._times, stage, secs)
+            if(source is not None):
+                _addTime(self._sources.setdefault(source, ({}, {}))[0], stage, secs)
+
+        return
+
+    def count(self, name, num=1, source=None):
+        """Add ``num`` to the counter ``name`` (optionally for ``source``).
+        """
+        with self._lock:
+            self._counts[name] = self._counts.get(name, 0) + num
+            if(source is not None):
+                counts = self._sources.setdefault(source, ({}, {}))[1]
+                counts[name] = counts.get(name, 0) + num
+
+        return
+
+    def reset(self):
+        """Clear all timers and counters.
+        """
+        with self._lock:
+            self.start = time.time()
+            # Stage ==> [calls, total, max]
+            self._times = {}
+            # Counter name ==> value
+            self._counts = {}
+            # Source ==> (times, counts)
+            self._sources = {}
+
+        return
+
+    def toDict(self):
+        """All timers and counters, as a dictionary (suitable for JSON).
+
+        Returns
+        -------
+            stats <dict> : 'start' and 'duration' (seconds) of the run, 'stages' (for each: 'calls',
+                           'total' and 'max' seconds), 'counts', and 'sources' (for each source URL,
+                           its own 'stages' and 'counts').
+
+        """
+        with self._lock:
+            sources = dict((src, dict(stages=_stagesDict(times), counts=dict(counts)))
+                           for src, (times, counts) in self._sources.items())
+            return dict(start=self.start, duration=time.time() - self.start,
+                        stages=_stagesDict(self._times), counts=dict(self._counts),
+                        sources=sources)
+
+    def toPrometheus(self, prefix='feeder'):
+        """All timers and counters, in the Prometheus text exposition format.
+        """
+        stats = self.toDict()
+        lines = []
+
+        def _metric(name, mtype, helps, values):
+            name = prefix + '_' + name
+            lines.append("# HELP %s %s" % (name, helps))
+            lines.append("# TYPE %s %s" % (name, mtype))
+            for labels, val in values:
+                labels = ",".join('%s="%s"' % (kk, _escape(vv)) for kk, vv in labels)
+                if(len(labels) > 0): labels = "{" + labels + "}"
+                lines.append("%s%s %s" % (name, labels, repr(float(val))))
+
+        _metric('run_duration_seconds', 'gauge', "Duration of the run.",
+                [([], stats['duration'])])
+        stages = sorted(stats['stages'].items())
+        _metric('stage_seconds_total', 'counter', "Total time spent in each stage.",
+                [([('stage', kk)], vv['total']) for kk, vv in stages])
+        _metric('stage_calls_total', 'counter', "Number of calls of each stage.",
+                [([('stage', kk)], vv['calls']) for kk, vv in stages])
+        _metric('count_total', 'counter', "Counters (e.g. bytes and articles).",
+                [([('name', kk)], vv) for kk, vv in sorted(stats['counts'].items())])
+
+        sources = sorted(stats['sources'].items())
+        _metric('source_stage_seconds_total', 'counter', "Total time in each stage, per source.",
+                [([('source', src), ('stage', kk)], vv['total'])
+                 for src, ss in sources for kk, vv in sorted(ss['stages'].items())])
+        _metric('source_count_total', 'counter', "Counters, per source.",
+                [([('source', src), ('name', kk)], vv)
+                 for src, ss in sources for kk, vv in sorted(ss['counts'].items())])
+
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """Lines of text summarizing the time and calls of each stage, and each counter.
+        """
+        stats = self.toDict()
+        lines = ["%-24s %8d calls %10.4f s (max %.4f s)" % (kk, vv['calls'], vv['total'], vv['max'])
+                 for kk, vv in sorted(stats['stages'].items())]
+        lines.extend("%-24s %d" % (kk, vv) for kk, vv in sorted(stats['counts'].items()))
+        return lines
+
+    def dump(self, fname, fmt='json'):
+        """Write all timers and counters to the file ``fname``, in one of ``STATS_FORMATS``.
+        """
+        if(fmt not in STATS_FORMATS):
+            raise ValueError("Unrecognized stats format '%s', must be one of %s" %
+                             (fmt, str(STATS_FORMATS)))
+
+        if(fmt == 'json'): out = json.dumps(self.toDict(), indent=2, sort_keys=True) + "\n"
+        else:              out = self.toPrometheus()
+
+        with open(fname, 'w') as outfile:
+            outfile.write(out)
+
+        return
+
+
+def getStats():
+    """Get the shared ``Stats`` object (created on first use), recording the current run.
+    """
+    global _STATS
+    with _STATS_LOCK:
+        if(_STATS is None): _STATS = Stats()
+        return _STATS
+
+
+def timer(stage, source=None):
+    """Context manager timing the enclosed code as ``stage``, recorded to the shared ``Stats``.
+    """
+    return getStats().timer(stage, source)
+
+
+def count(name, num=1, source=None):
+    """Add ``num`` to the counter ``name`` of the shared ``Stats`` object.
+    """
+    getStats().count(name, num, source)
+    return
+
+
+def timed(stage):
+    """Decorator timing each call of the decorated function as ``stage`` (in the shared ``Stats``).
+    """
+    def _decorator(func):
+        @functools.wraps(func)
+        def _wrapper(*args, **kwargs):
+            with timer(stage):
+                return func(*args, **kwargs)
+
+        return _wrapper
+
+    return _decorator
+
+
+def _addTime(times, stage, secs):
+    """Add one call taking ``secs`` to the [calls, total, max] of ``stage`` in ``times``.
+    """
+    vals = times.get(stage)
+    if(vals is None):
+        times[stage] = [1, secs, secs]
+        return
+
+    vals[0] += 1
+    vals[1] += secs
+    if(secs > vals[2]): vals[2] = secs
+    return
+
+
+def _stagesDict(times):
+    """Convert stage timers to dictionaries of 'calls', 'total' and 'max'.
+    """
+    return dict((kk, dict(calls=vv[0], total=vv[1], max=vv[2])) for kk, vv in times.items())
+
+
+def _escape(val):
+    """Escape a Prometheus label value.
+    """
+    return str(val).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
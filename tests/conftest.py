@@ -0,0 +1,55 @@
+"""Shared configuration for the tests: make the (top-level) modules importable.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import logging
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import Settings  # noqa: E402
+
+
+@pytest.fixture
+def settings(tmp_path):
+    """The ``Settings`` object, with all files in a temporary directory (restored afterwards).
+    """
+    sets = Settings.Settings()
+    saved = dict(sets.__dict__)
+    sets.dir_data = os.path.join(str(tmp_path), 'data', '')
+    sets.dir_log = os.path.join(str(tmp_path), 'log', '')
+    sets.file_sourcelist = sets.dir_data + "sourcelist.conf"
+    sets.file_archive_db = sets.dir_data + "articles.db"
+    sets.file_search_index = sets.dir_data + "search.db"
+    sets.search_index = False
+    sets.summary_stripper = 'regex'
+    os.makedirs(sets.dir_data)
+    yield sets
+    sets.__dict__.clear()
+    sets.__dict__.update(saved)
+
+
+@pytest.fixture
+def log():
+    """A logger which discards all records.
+    """
+    logger = logging.getLogger('tests')
+    logger.handlers = [logging.NullHandler()]
+    logger.propagate = False
+    return logger
+
+
+@pytest.fixture
+def new_york(monkeypatch):
+    """Use a local time zone which is not UTC (restored afterwards).
+    """
+    if(not hasattr(time, 'tzset')): pytest.skip("time zones cannot be changed here")
+    monkeypatch.setenv('TZ', 'America/New_York')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
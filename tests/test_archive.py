@@ -0,0 +1,121 @@
+"""Tests for the article archives in ``Archive``.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import io
+import json
+import os
+
+import Archive
+
+
+def _dicts(*ids):
+    return [dict(id='guid-%d' % ii, title='Title %d' % ii, link='http://a.com/%d' % ii)
+            for ii in ids]
+
+
+def _readLines(fname):
+    with io.open(fname, 'r', encoding='utf-8') as data:
+        return data.read().splitlines()
+
+
+def test_jsonl_add_and_keys(tmp_path):
+    fname = str(tmp_path / 'arch.json')
+    arch = Archive.JSONLArchive(fname, 'guid')
+    assert arch.add(_dicts(0, 1)) == 2
+    assert arch.add(_dicts(1, 2)) == 1
+
+    arch = Archive.JSONLArchive(fname, 'guid')
+    assert arch.keys() == set(['id:guid-0', 'id:guid-1', 'id:guid-2'])
+    assert [dd['id'] for dd in arch.iterDicts()] == ['guid-0', 'guid-1', 'guid-2']
+
+
+def test_jsonl_interrupted_save(tmp_path):
+    """A save interrupted while writing the archive must not lose later articles.
+    """
+    fname = str(tmp_path / 'arch.json')
+    arch = Archive.JSONLArchive(fname, 'guid')
+    arch.add(_dicts(0))
+
+    # Interrupted save: part of an article was written, but not its key
+    with io.open(fname, 'a', encoding='utf-8') as out:
+        out.write(json.dumps(_dicts(1)[0])[:20])
+
+    arch = Archive.JSONLArchive(fname, 'guid')
+    assert arch.add(_dicts(1, 2)) == 2
+
+    lines = _readLines(fname)
+    assert [json.loads(ll)['id'] for ll in lines] == ['guid-0', 'guid-1', 'guid-2']
+    assert Archive.JSONLArchive(fname, 'guid').keys() == arch.keys()
+    assert len(arch.keys()) == 3
+
+
+def test_jsonl_keys_record_size(tmp_path, monkeypatch):
+    """Loading the keys of a consistent archive does not read (or rebuild) the archive.
+    """
+    fname = str(tmp_path / 'arch.json')
+    Archive.JSONLArchive(fname, 'guid').add(_dicts(0, 1))
+    Archive.JSONLArchive(fname, 'guid').add(_dicts(2))
+    assert json.loads(_readLines(fname + '.guid' + Archive.KEYS_SUFFIX)[-1]) == \
+        os.path.getsize(fname)
+
+    def _fail(self):
+        raise AssertionError("archive was read")
+
+    monkeypatch.setattr(Archive.JSONLArchive, 'iterDicts', _fail)
+    arch = Archive.JSONLArchive(fname, 'guid')
+    assert arch.keys() == set(['id:guid-0', 'id:guid-1', 'id:guid-2'])
+
+
+def test_jsonl_missing_keys(tmp_path):
+    """Articles written without their keys (interrupted save) are found when keys are loaded.
+    """
+    fname = str(tmp_path / 'arch.json')
+    arch = Archive.JSONLArchive(fname, 'guid')
+    arch.add(_dicts(0))
+    Archive._appendLines(fname, [json.dumps(dd) for dd in _dicts(1)])
+
+    arch = Archive.JSONLArchive(fname, 'guid')
+    assert 'id:guid-1' in arch.keys()
+    assert arch.add(_dicts(1)) == 0
+    assert len(_readLines(fname)) == 2
+
+
+def test_truncate_partial(tmp_path):
+    fname = str(tmp_path / 'lines.txt')
+    with io.open(fname, 'w', encoding='utf-8') as out:
+        out.write('one\ntwo\nthr')
+
+    Archive._truncatePartial(fname)
+    assert _readLines(fname) == ['one', 'two']
+    Archive._truncatePartial(fname)
+    assert _readLines(fname) == ['one', 'two']
+
+    with io.open(fname, 'w', encoding='utf-8') as out:
+        out.write('partial')
+
+    Archive._truncatePartial(fname)
+    assert _readLines(fname) == []
+
+
+def test_db_change_key_method(tmp_path):
+    """Changing the key method merges articles which become duplicates, keeping the newest.
+    """
+    db = Archive.ArticleDB(str(tmp_path / 'arts.db'))
+    try:
+        dicts = _dicts(0, 1, 2)
+        dicts[1]['title'] = dicts[0]['title']
+        for dd, tt in zip(dicts, [10.0, 20.0, 5.0]):
+            dd['updated_parsed'] = tt
+
+        assert db.add('src', dicts, 'guid') == 3
+        assert db.add('other', dicts[:1], 'guid') == 1
+
+        assert db.add('src', _dicts(3), 'title') == 1
+        assert [dd['id'] for dd in db.iterDicts('src')] == ['guid-1', 'guid-2', 'guid-3']
+        assert db.count('other') == 1
+
+        # Keys use the new method, and remain unique
+        assert db.add('src', dicts, 'title') == 0
+    finally:
+        db.close()
@@ -0,0 +1,63 @@
+"""Tests for the columnar article store (``ArticleStore``).
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import numpy as np
+
+import ArticleStore
+import Source
+
+
+def _article(ii, tt):
+    dic = dict(id='g%d' % ii, title='Title %d' % (ii % 3), link='http://a.com/%d' % ii,
+               summary='')
+    if(tt is not None): dic['updated_parsed'] = str(tt)
+    return Source.Article(dic)
+
+
+def _store():
+    store = ArticleStore.ArticleStore(['http://a.com/feed', 'http://b.com/feed'])
+    store.addArticles(0, [_article(ii, tt) for ii, tt in enumerate([30, 10, None, 50])])
+    store.addDicts(1, [dict(title='Title 0', link='http://b.com/0', published_parsed='20'),
+                       dict(title='Other', link='http://b.com/1', updated_parsed='40',
+                            published_parsed='5')])
+    return store
+
+
+def test_window():
+    store = _store()
+    assert len(store) == 6
+    # Columns are only updated by a query
+    inds = store.window()
+    assert store.time[inds].tolist() == [50, 40, 30, 20, 10]
+    # [since, until): inclusive, exclusive
+    assert store.time[store.window(since=20, until=50)].tolist() == [40, 30, 20]
+    assert store.window(since=60).size == 0
+    assert store.time[store.window(index=1)].tolist() == [40, 20]
+    assert store.titles(store.window(until=25)) == ['Title 0', 'Title 1']
+    assert store.links(store.window(since=45)) == ['http://a.com/3']
+
+
+def test_append_growth():
+    """Articles added after a query are included in the next query.
+    """
+    store = _store()
+    assert store.counts().tolist() == [4, 2]
+    store.addArticles(1, [_article(10 + ii, 100 + ii) for ii in range(1000)])
+    assert len(store) == 1006
+    inds = store.window(since=100)
+    assert inds.size == 1000 and store.time[inds[0]] == 1099
+    assert np.all(np.diff(store.time[store.window()]) <= 0)
+    assert store.counts().tolist() == [4, 1002]
+    assert store.counts(since=25).tolist() == [2, 1001]
+    # Titles are interned: only 4 distinct titles were added
+    assert len(store._titles) == 4
+
+
+def test_most_recent():
+    store = _store()
+    assert store.mostRecent().tolist() == [50, 40]
+    assert store.mostRecent(1) == 40
+    store = ArticleStore.ArticleStore(['http://c.com/feed'])
+    store.addArticles(0, [_article(0, None)])
+    assert np.isnan(store.mostRecent(0)) and np.isnan(store.mostRecent()[0])
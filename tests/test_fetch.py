@@ -0,0 +1,136 @@
+"""Tests for fetching feeds (conditional requests and the circuit breaker) from a local server.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import threading
+import time
+
+import pytest
+
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+except ImportError:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+
+import Fetcher
+import Source
+
+_ETAG = '"v1"'
+_FEED = (b"<?xml version=\"1.0\" encoding=\"utf-8\"?>\n<rss version=\"2.0\"><channel>"
+         b"<title>Test</title><link>http://example.com/</link><description>Test</description>"
+         b"<item><title>One</title><link>http://example.com/1</link><guid>g1</guid>"
+         b"<description>First</description></item></channel></rss>\n")
+_PAGE = b"<html><head></head><body><p>Not a feed</p></body></html>\n"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Serve ``_FEED`` at '/feed' (honouring 'If-None-Match'), an HTML page at '/page', and '500'
+    elsewhere (e.g. '/broken').
+    """
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        if(self.path == '/feed' and self.headers.get('If-None-Match') == _ETAG):
+            self.send_response(304)
+            self.send_header('ETag', _ETAG)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+        elif(self.path == '/feed'):
+            self.send_response(200)
+            self.send_header('ETag', _ETAG)
+            self.send_header('Content-Type', 'application/rss+xml')
+            self.send_header('Content-Length', str(len(_FEED)))
+            self.end_headers()
+            self.wfile.write(_FEED)
+        elif(self.path == '/page'):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html')
+            self.send_header('Content-Length', str(len(_PAGE)))
+            self.end_headers()
+            self.wfile.write(_PAGE)
+        else:
+            self.send_response(500)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(settings, monkeypatch):
+    """Local feed server, with fetches made by a pool without retries.
+    """
+    httpd = HTTPServer(('127.0.0.1', 0), _Handler)
+    httpd.requests = []
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.daemon = True
+    thread.start()
+    pool = Fetcher.HTTPPool(timeout=5.0, retries=0)
+    monkeypatch.setattr(Fetcher, 'getPool', lambda: pool)
+    yield httpd
+    pool.close()
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _url(server, path):
+    return "http://127.0.0.1:%d%s" % (server.server_address[1], path)
+
+
+def test_not_modified(server):
+    src = Source.Source(_url(server, '/feed'), name='Test')
+    assert src.getFeed()
+    assert src.valid and not src.not_modified
+    assert src.etag == _ETAG and len(src.articles) == 1
+
+    # The stored ETag is sent, and the '304' response leaves the source unchanged
+    assert src.getFeed()
+    assert src.not_modified and src.valid and src.status == 304
+    assert len(src.articles) == 1 and src.title == 'Test'
+
+
+def test_circuit_breaker(server, settings):
+    settings.breaker_threshold = 2
+    settings.breaker_cooldown = 100.0
+    src = Source.Source(_url(server, '/broken'), name='Broken')
+
+    assert not src.getFeed() and src.skip_until is None
+    assert not src.getFeed() and src.failures == 2
+    assert src.skip_until > time.time() + 50
+
+    # Open breaker: the source is skipped without a request
+    num = len(server.requests)
+    assert not src.getFeed() and src.skipped
+    assert len(server.requests) == num
+
+    # After the cool-down, a success closes the breaker
+    src.skip_until = time.time() - 1
+    src.url = _url(server, '/feed')
+    assert src.getFeed()
+    assert src.failures == 0 and src.skip_until is None and not src.skipped
+
+
+def test_invalid_host(server):
+    """A URL which cannot be requested at all (invalid port) counts as a failed fetch.
+    """
+    src = Source.Source('http://127.0.0.1:notaport/feed', name='Invalid')
+    assert not src.getFeed()
+    assert src.failures == 1 and 'Invalid host' in src.error
+    with pytest.raises(Fetcher.FetchError):
+        Fetcher.getPool().get(src.url)
+
+
+def test_check_feeds(server):
+    urls = [_url(server, '/feed'), _url(server, '/broken'), _url(server, '/page'),
+            'http://127.0.0.1:notaport/feed']
+    checks = Fetcher.checkFeeds(urls * 3, workers=4, per_host=2, timeout=5.0)
+    assert [chk.url for chk in checks] == urls * 3
+    for feed, broken, page, invalid in zip(*[iter(checks)] * 4):
+        assert feed.valid and feed.status == 200 and feed.title == 'Test' and not feed.error
+        assert not broken.valid and broken.status == 500 and broken.error == "HTTP status 500"
+        assert not page.valid and page.status == 200 and page.error == "Invalid feed"
+        assert not invalid.valid and invalid.status == -1 and invalid.error
+
+    # Each URL on the server was requested once per check, i.e. without retries
+    assert sorted(server.requests) == sorted(['/feed', '/broken', '/page'] * 3)
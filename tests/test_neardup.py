@@ -0,0 +1,43 @@
+"""Tests for near-duplicate detection (``NearDup``).
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import numpy as np
+
+import NearDup
+
+_STORY = ("The city council voted on Tuesday to approve a new budget that increases funding for "
+          "public transit, parks and libraries, while cutting spending on road construction")
+
+
+def test_clusters():
+    texts = [_STORY,
+             "Election officials said turnout was the highest in two decades across the state",
+             _STORY.replace("Tuesday", "Wednesday") + ", officials said",
+             "",
+             _STORY.upper(),
+             "A new species of frog was discovered in the rainforest by a team of biologists"]
+    labels = NearDup.clusters(texts, threshold=0.5)
+    assert labels.tolist() == [0, 1, 0, 3, 0, 5]
+
+
+def test_clusters_many():
+    """Copies of many distinct stories are grouped with their originals, and only with them.
+    """
+    rng = np.random.RandomState(42)
+    vocab = ["word%d" % ii for ii in range(2000)]
+    stories = [" ".join(rng.choice(vocab, 40)) for _ in range(200)]
+    copies = [story + " updated" for story in stories]
+    labels = NearDup.clusters(stories + copies, threshold=0.7)
+    num = len(stories)
+    assert labels[:num].tolist() == list(range(num))
+    assert labels[num:].tolist() == list(range(num))
+
+
+def test_signatures_reproducible():
+    texts = ["one two three four", "five six seven eight", ""]
+    sigs, valid = NearDup.MinHasher(num_perm=16, shingle=2).signatures(texts)
+    again, _ = NearDup.MinHasher(num_perm=16, shingle=2).signatures(texts)
+    assert sigs.shape == (3, 16) and valid.tolist() == [True, True, False]
+    assert np.array_equal(sigs, again)
+    assert not np.array_equal(sigs[0], sigs[1])
@@ -0,0 +1,59 @@
+"""Tests for reading and writing OPML files (``OPML``, ``SourceList.importOPML``/``exportOPML``).
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import io
+
+import OPML
+import Source
+import SourceList
+
+_FEEDS = [('http://a.com/feed', 'Alpha', ''),
+          ('http://b.com/rss', 'News', 'Beta & Co'),
+          ('http://c.com/rss', 'News', 'Gamma <World>'),
+          ('http://d.com/atom', '', 'Only a subname'),
+          ('http://e.com/feed', 'Epsilon', '')]
+
+
+def test_round_trip(tmp_path):
+    fname = str(tmp_path / 'feeds.opml')
+    assert OPML.writeFeeds(fname, _FEEDS) == len(_FEEDS)
+    assert list(OPML.iterFeeds(fname)) == _FEEDS
+
+
+def test_nested_folders(tmp_path):
+    """Feeds take their name from the innermost folder, and may use 'title' instead of 'text'.
+    """
+    fname = str(tmp_path / 'nested.opml')
+    with io.open(fname, 'w', encoding='utf-8') as out:
+        out.write('<?xml version="1.0"?>\n<opml version="1.0"><head><title>T</title></head><body>'
+                  '<outline text="Top" xmlUrl="http://top.com/feed"/>'
+                  '<outline text="Science"><outline text="Space">'
+                  '<outline title="NASA" xmlUrl="http://nasa.gov/rss" type="rss"/>'
+                  '</outline>'
+                  '<outline text="Nature" xmlUrl=" http://nature.com/feed "/></outline>'
+                  '<outline text="Not a feed"/>'
+                  '</body></opml>\n')
+
+    assert list(OPML.iterFeeds(fname)) == [('http://top.com/feed', 'Top', ''),
+                                           ('http://nasa.gov/rss', 'Space', 'NASA'),
+                                           ('http://nature.com/feed', 'Science', 'Nature')]
+
+
+def test_import_export(settings, log, tmp_path):
+    fname = str(tmp_path / 'feeds.opml')
+    OPML.writeFeeds(fname, _FEEDS + [('HTTP://www.A.com/feed/', 'Alpha again', '')])
+
+    # Existing sources, and repeated feeds (compared as normalized URLs) are skipped
+    slist = SourceList.SourceList(log=log)
+    slist.sources = [Source.Source('http://e.com/feed', name='Epsilon')]
+    slist._reindex()
+    slist._recount()
+    assert slist.importOPML(fname, save=False) == 4
+    assert [(src.url, src.name, src.subname) for src in slist.sources] == \
+        [_FEEDS[-1]] + _FEEDS[:-1]
+    assert slist.importOPML(fname, save=False) == 0
+
+    out = str(tmp_path / 'out.opml')
+    assert slist.exportOPML(out) == 5
+    assert sorted(OPML.iterFeeds(out)) == sorted(_FEEDS)
@@ -0,0 +1,111 @@
+"""Tests for polling sources (``Poller``), with fixed article times and a mocked clock.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import time
+
+import pytest
+
+import Fetcher
+import Poller
+import Source
+import SourceList
+
+# Fixed 'current' time (seconds since the epoch)
+_NOW = 1600000000.0
+
+
+class _Clock(object):
+    """Mocked ``time`` module: ``sleep`` advances ``time`` instead of waiting.
+    """
+
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, secs):
+        self.now += secs
+
+
+def _source(name, times):
+    src = Source.Source('http://%s.com/feed' % name, name=name)
+    src.articles = [Source.Article(dict(id='%s%d' % (name, ii), title='%s %d' % (name, ii),
+                                        link='http://%s.com/%d' % (name, ii), summary='',
+                                        updated_parsed=str(tt)))
+                    for ii, tt in enumerate(times)]
+    return src
+
+
+def test_estimate_interval(settings):
+    # Half the median gap between articles
+    src = _source('hourly', [_NOW - 3600*ii for ii in range(10)])
+    assert Poller.estimateInterval(src, now=_NOW) == 1800.0
+    # Limited to ``poll_min`` and ``poll_max``
+    src = _source('busy', [_NOW - 10*ii for ii in range(10)])
+    assert Poller.estimateInterval(src, now=_NOW) == settings.poll_min
+    src = _source('weekly', [_NOW - 7*86400*ii for ii in range(10)])
+    assert Poller.estimateInterval(src, now=_NOW) == settings.poll_max
+    # Too few article times
+    assert Poller.estimateInterval(_source('new', [_NOW]), now=_NOW) == settings.poll_default
+
+
+def test_estimate_interval_quiet(settings):
+    """A source which has not published for a long time is polled less often.
+    """
+    src = _source('quiet', [_NOW - 40*3600 - 3600*ii for ii in range(10)])
+    assert Poller.estimateInterval(src, now=_NOW) == 10*3600.0
+
+
+def test_estimate_interval_feed_times(settings, new_york):
+    """Intervals from feed times (UTC) do not depend on the local time zone.
+    """
+    stamps = [time.strftime("%a, %d %b %Y %H:%M:%S GMT", time.gmtime(_NOW - 3600*ii))
+              for ii in range(5)]
+    src = Source.Source('http://utc.com/feed', name='utc')
+    src.articles = [Source.Article(dict(id='u%d' % ii, title='u', link='http://utc.com/',
+                                        summary='', updated_parsed=time.strptime(
+                                            ss, "%a, %d %b %Y %H:%M:%S GMT")))
+                    for ii, ss in enumerate(stamps)]
+    assert src.articles[0].time == _NOW
+    # Last article 'now': the interval is not stretched as if the source were quiet
+    assert Poller.estimateInterval(src, now=_NOW + 60) == 1800.0
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock(_NOW)
+    monkeypatch.setattr(Poller, 'time', clock)
+    return clock
+
+
+def test_schedule(settings, log, clock, monkeypatch):
+    """Sources are fetched when due, at their estimated intervals, backing off when nothing is
+    new, and failing sources wait for their circuit breaker to close.
+    """
+    slist = SourceList.SourceList(log=log)
+    busy = _source('busy', [_NOW - 600*ii for ii in range(10)])
+    quiet = _source('quiet', [_NOW - 30*86400 - 3600*ii for ii in range(10)])
+    broken = Source.Source('http://broken.com/feed', name='broken')
+    slist.sources = [busy, quiet, broken]
+    slist._reindex()
+    slist._recount()
+
+    fetched = []
+
+    def _fetchAll(srcs, log=None):
+        fetched.append((clock.now - _NOW, sorted(src.name for src in srcs)))
+        for src in srcs:
+            if(src is broken): src.skip_until = clock.now + 1000.0
+        return [src is not broken for src in srcs]
+
+    monkeypatch.setattr(Fetcher, 'fetchAll', _fetchAll)
+    poller = Poller.Poller(slist, log=log)
+    poller.run(cycles=4)
+
+    # 'busy': every 300s (``poll_min``), then 1.5 times longer when nothing was new
+    assert fetched == [(0.0, ['broken', 'busy', 'quiet']), (300.0, ['busy']),
+                       (750.0, ['busy']), (1000.0, ['broken'])]
+    assert poller.intervals[quiet.url] == settings.poll_max
+    assert poller.nextDue() == _NOW + 750.0 + 450.0*1.5
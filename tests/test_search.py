@@ -0,0 +1,85 @@
+"""Tests for the full-text search index (``Search``).
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import pytest
+
+import Search
+import Source
+
+
+def _article(ii, title, summary):
+    return Source.Article(dict(id='g%d' % ii, title=title, link='http://a.com/%d' % ii,
+                               summary=summary))
+
+
+@pytest.fixture
+def index(settings, tmp_path):
+    index = Search.SearchIndex(str(tmp_path / 'search.db'))
+    yield index
+    index.close()
+
+
+def test_tokenize_and_query():
+    assert Search.tokenize("Sea-level rise, 2 cm!") == ['sea', 'level', 'rise', '2', 'cm']
+    terms, phrases = Search.parseQuery('ice "sea level" melt')
+    assert sorted(terms) == ['ice', 'melt'] and phrases == [['sea', 'level']]
+
+
+def test_bm25_ranking(index):
+    arts = [_article(0, "Storm warning", "Heavy rain expected along the coast tonight."),
+            _article(1, "Rain, rain, rain", "More rain: a rainy week of rain ahead."),
+            _article(2, "Election results", "Votes counted after a long night."),
+            _article(3, "Weather roundup", "Sun, wind, and some rain in the hills, with a long "
+                     "list of other details about the weather in many different places.")]
+    assert index.addArticles('http://a.com/feed', arts) == 4
+    assert index.addArticles('http://a.com/feed', arts) == 0
+
+    # More occurrences (in shorter documents) rank higher; all words must match
+    hits = index.search('rain')
+    assert [hit.title for hit in hits] == ["Rain, rain, rain", "Storm warning", "Weather roundup"]
+    assert hits[0].score > hits[1].score > hits[2].score
+    assert [hit.title for hit in index.search('rain coast')] == ["Storm warning"]
+    assert index.search('rain votes') == []
+    assert index.search('rain', source='http://other.com/feed') == []
+
+
+def test_phrases(index):
+    arts = [_article(0, "Sea level", "The sea level is rising."),
+            _article(1, "Level seas", "Level with the sea, at last.")]
+    index.addArticles('http://a.com/feed', arts)
+    assert len(index.search('sea level')) == 2
+    assert [hit.title for hit in index.search('"sea level"')] == ["Sea level"]
+
+
+def test_add_articles_incremental(index):
+    """Only new articles are indexed; known articles are looked up by key, not all loaded.
+    """
+    arts = [_article(ii, "Title %d" % ii, "Summary number %d" % ii) for ii in range(1200)]
+    assert index.addArticles('http://a.com/feed', arts[:1000]) == 1000
+    assert index.addArticles('http://a.com/feed', arts[900:]) == 200
+    assert index.addArticles('http://b.com/feed', arts[:10]) == 10
+    assert index.count('article') == 1210
+    assert len(index.search('summary 1100')) == 1
+
+
+def test_set_sources(index):
+    srcs = [Source.Source('http://a.com/feed', name='Alpha News'),
+            Source.Source('http://b.com/feed', name='Beta', subname='Sports')]
+    index.setSources(srcs)
+    ids = dict(index._conn.execute("SELECT source, id FROM docs WHERE kind = 'source'"))
+
+    # Only the changed source is reindexed, removed sources are dropped
+    srcs[0].name = 'Gamma News'
+    index.setSources(srcs)
+    new = dict(index._conn.execute("SELECT source, id FROM docs WHERE kind = 'source'"))
+    assert new['http://b.com/feed'] == ids['http://b.com/feed']
+    assert new['http://a.com/feed'] != ids['http://a.com/feed']
+    assert index.search('alpha', kind='source') == []
+    assert [hit.title for hit in index.search('news', kind='source')] == ['Gamma News']
+
+    index.setSources(srcs[1:])
+    assert index.count('source') == 1
+    assert [hit.source for hit in index.search('sports', kind='source')] == ['http://b.com/feed']
+    assert index._conn.execute("SELECT COUNT(*) FROM postings WHERE doc NOT IN "
+                               "(SELECT id FROM docs)").fetchone()[0] == 0
@@ -0,0 +1,86 @@
+"""Tests for ``Source``.
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import calendar
+
+import Archive
+import Source
+
+_FEED = ("<?xml version=\"1.0\" encoding=\"utf-8\"?>\n<rss version=\"2.0\"><channel>"
+         "<title>Test</title><link>http://example.com/</link><description>Test</description>"
+         "<pubDate>Mon, 06 Jan 2020 15:00:00 GMT</pubDate>"
+         "<item><title>One</title><link>http://example.com/1</link><guid>g1</guid>"
+         "<pubDate>Mon, 06 Jan 2020 12:00:00 +0000</pubDate>"
+         "<description>First</description></item></channel></rss>\n")
+
+
+def test_archive_cached(settings):
+    src = Source.Source('http://example.com/feed', name='Example')
+    arch = src._archive()
+    assert isinstance(arch, Archive.JSONLArchive)
+    assert src._archive() is arch
+
+    # Changing the filename, key method or backend constructs a new archive
+    assert src._archive(arch.fname + '.other') is not arch
+    settings.dedup_key = 'link'
+    other = src._archive()
+    assert other is not arch and other.method == 'link'
+    settings.archive_backend = 'sqlite'
+    assert isinstance(src._archive(), Archive.SQLiteArchive)
+    Archive.getArticleDB(settings.file_archive_db).close()
+
+
+def test_times_utc(settings, new_york):
+    """Feed times (UTC ``struct_time`` values) become epochs independent of the local time zone.
+    """
+    import feedparser
+
+    feed = feedparser.parse(_FEED)
+    art = Source.Article(feed.entries[0])
+    assert art.time == calendar.timegm((2020, 1, 6, 12, 0, 0))
+    assert art.time_str == 'Mon Jan  6 12:00:00 2020'
+    assert Source._toEpoch(feed.feed.published_parsed) == calendar.timegm((2020, 1, 6, 15, 0, 0))
+
+    # Saved (string) times are read back unchanged
+    dic = Source.ent_to_dict(feed.entries[0])
+    assert float(dic['published_parsed']) == art.time
+    assert Source.Article(dic).time == art.time
+
+
+def test_make_articles_pool(settings):
+    """Articles built in the process pool (from a fetch-like thread) match those built in-process.
+    """
+    import threading
+
+    ents = [dict(id='g%d' % ii, title='Title %d' % ii, link='http://a.com/%d' % ii,
+                 summary='<p>Summary <b>%d</b></p>' % ii) for ii in range(40)]
+    ents.append(dict(title='Invalid, no link or summary'))
+    settings.article_pool_min = 10
+    results = []
+    thread = threading.Thread(
+        target=lambda: results.append(Source.makeArticles(ents, workers=2, chunksize=5)))
+    try:
+        thread.start()
+        thread.join(60)
+        assert Source._POOL._mp_context.get_start_method() != 'fork'
+    finally:
+        if(Source._POOL is not None): Source._POOL.shutdown()
+        Source._POOL = None
+
+    arts = results[0]
+    assert [art.guid for art in arts] == ['g%d' % ii for ii in range(40)]
+    assert arts[7].summary == 'Summary 7'
+    assert [art.title for art in Source.makeArticles(ents, workers=1)] == \
+        [art.title for art in arts]
+
+
+def test_load_articles_batches(settings, monkeypatch):
+    """Articles are loaded in batches, in the order saved.
+    """
+    monkeypatch.setattr(Source, '_LOAD_BATCH', 7)
+    src = Source.Source('http://example.com/feed', name='Example')
+    src.articles = [Source.Article(dict(id='g%d' % ii, title='T%d' % ii, summary='S%d' % ii,
+                                        link='http://a.com/%d' % ii)) for ii in range(20)]
+    assert src.saveArticles()
+    assert [art.guid for art in src.loadArticles()] == ['g%d' % ii for ii in range(20)]
@@ -0,0 +1,156 @@
+"""Tests for ``SourceList``: save files, finding sources and the merged timeline ('river').
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import io
+import json
+
+import Source
+import SourceList
+
+
+def _sourceList(settings, log, num=3):
+    slist = SourceList.SourceList(log=log)
+    slist.sources = [Source.Source('http://site%d.com/feed' % ii, name='Site %d' % ii)
+                     for ii in range(num)]
+    slist._reindex()
+    slist._recount()
+    assert slist.save(inter=False)
+    return slist
+
+
+def _readLines(fname):
+    with io.open(fname, 'r', encoding='utf-8') as data:
+        return data.read().splitlines()
+
+
+def test_save_format(settings, log):
+    slist = _sourceList(settings, log)
+    lines = _readLines(settings.file_sourcelist)
+    header = json.loads(lines[0])
+    assert header[SourceList.SOURCELIST_KEYS.FIELDS] == SourceList._RECORD_FIELDS
+    assert [json.loads(ll)[0] for ll in lines[1:]] == [src.url for src in slist.sources]
+
+
+def test_update_appends(settings, log):
+    slist = _sourceList(settings, log)
+    slist.sources[1].etag = 'abc'
+    assert slist.update([slist.sources[1]])
+
+    # A single record is appended, and replaces the earlier one when loading
+    assert len(_readLines(settings.file_sourcelist)) == 1 + 3 + 1
+    loaded = SourceList.SourceList(log=log)
+    assert [src.url for src in loaded.sources] == [src.url for src in slist.sources]
+    assert loaded.sources[1].etag == 'abc'
+    assert loaded._num_records == 4
+
+
+def test_update_after_interrupted(settings, log):
+    """A partially written record (interrupted ``update``) is skipped, and does not break loading
+    or later updates.
+    """
+    slist = _sourceList(settings, log)
+    with io.open(settings.file_sourcelist, 'a', encoding='utf-8') as out:
+        out.write('["http://site1.com/feed","Si')
+
+    loaded = SourceList.SourceList(log=log)
+    assert len(loaded.sources) == 3
+
+    loaded.sources[2].etag = 'xyz'
+    assert loaded.update([loaded.sources[2]])
+    loaded = SourceList.SourceList(log=log)
+    assert [src.url for src in loaded.sources] == [src.url for src in slist.sources]
+    assert loaded.sources[2].etag == 'xyz'
+
+
+def test_find_host(settings, log):
+    """Hosts are found as they are grouped to limit fetches per host (``Fetcher.getHost``).
+    """
+    import Fetcher
+
+    slist = SourceList.SourceList(log=log)
+    urls = ['http://www.A.com/feed', 'https://a.com/rss', 'http://a.com:8080/feed']
+    slist.sources = [Source.Source(url, name='Feed %d' % ii) for ii, url in enumerate(urls)]
+    slist._reindex()
+
+    for url in urls:
+        found = slist.find(host=Fetcher.getHost(url))
+        assert [src.url for src in found] == [url]
+
+    assert [src.url for src in slist.find(host='a.com')] == [urls[1]]
+    assert [src.url for src in slist.find(host='http://WWW.a.com/other')] == [urls[0]]
+    assert slist.find(url='www.a.com/feed/', name='feed 0') == slist.sources[:1]
+
+
+def _timed(ii, tt, title=None):
+    return Source.Article(dict(id='g%d' % ii, title=title or 'Title %d' % ii, summary='',
+                               link='http://a.com/%d' % ii, updated_parsed=str(tt)))
+
+
+def _riverList(log):
+    slist = SourceList.SourceList(log=log)
+    slist.sources = [Source.Source('http://site%d.com/feed' % ii, name='Site %d' % ii)
+                     for ii in range(3)]
+    # Article times: newest first, except for the last source (out of order, one without a time)
+    times = [[100, 70, 40, 10], [90, 60, 30], [20, 80, 50, None]]
+    num = 0
+    for src, tts in zip(slist.sources, times):
+        src.articles = []
+        for tt in tts:
+            art = _timed(num, tt or 0)
+            if(tt is None): art.time = None
+            src.articles.append(art)
+            num += 1
+
+    return slist
+
+
+def test_river_order(settings, log):
+    slist = _riverList(log)
+    river = slist.river()
+    assert [art.time for _, art in river] == [100, 90, 80, 70, 60, 50, 40, 30, 20, 10]
+    assert [src.name for src, _ in river[:3]] == ['Site 0', 'Site 1', 'Site 2']
+
+
+def test_river_limit(settings, log, monkeypatch):
+    """``limit`` stops the merge early: only about ``limit`` articles are compared.
+    """
+    slist = _riverList(log)
+    compared = []
+    merge = SourceList.heapq.merge
+
+    def _merge(*iters, **kwargs):
+        key = kwargs.pop('key')
+        return merge(*iters, key=lambda pair: compared.append(pair) or key(pair), **kwargs)
+
+    monkeypatch.setattr(SourceList.heapq, 'merge', _merge)
+    assert [art.time for _, art in slist.river(limit=3)] == [100, 90, 80]
+    assert len(compared) <= 3 + len(slist.sources)
+
+
+def test_river_window(settings, log):
+    """``since`` is inclusive and ``until`` exclusive.
+    """
+    slist = _riverList(log)
+    assert [art.time for _, art in slist.river(since=40, until=90)] == [80, 70, 60, 50, 40]
+    assert [art.time for _, art in slist.river(since=100)] == [100]
+    assert slist.river(until=10) == []
+    assert [art.time for _, art in slist.river(since=30, until=100, limit=2)] == [90, 80]
+
+
+def test_river_collapse(settings, log):
+    slist = _riverList(log)
+    story = ("The city council voted on Tuesday to approve a new budget that increases funding "
+             "for public transit, parks and libraries, while cutting spending on roads")
+    slist.sources[0].articles[1] = _timed(20, 70, story)
+    slist.sources[2].articles[2] = _timed(21, 50, story)
+    river = slist.river(collapse=True)
+    assert [art.time for _, art, _ in river] == [100, 90, 80, 70, 60, 40, 30, 20, 10]
+    assert [(src.name, art.time) for src, art in river[3][2]] == [('Site 2', 50)]
+    assert [art.time for _, art, _ in slist.river(limit=4, collapse=True)] == [100, 90, 80, 70]
+
+
+def test_loaded_attributes(settings, log):
+    _sourceList(settings, log)
+    loaded = SourceList.SourceList(log=log)
+    assert loaded.num_not_modified == 0 and loaded.num_skipped == 0 and loaded.checks == []
@@ -0,0 +1,71 @@
+"""Tests for timers and counters (``Stats``).
+"""
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import json
+import threading
+
+import pytest
+
+import Stats
+
+_SRC = 'http://a.com/feed?x="1"'
+
+
+def _stats():
+    stats = Stats.Stats()
+    stats.addTime('fetch', 0.5, _SRC)
+    stats.addTime('fetch', 1.5, 'http://b.com/feed')
+    stats.addTime('parse', 0.25)
+    stats.count('bytes_fetched', 100, _SRC)
+    stats.count('bytes_fetched', 50)
+    return stats
+
+
+def test_json(tmp_path):
+    fname = str(tmp_path / 'stats.json')
+    _stats().dump(fname, 'json')
+    with open(fname, 'r') as infile:
+        data = json.load(infile)
+
+    assert data['stages']['fetch'] == dict(calls=2, total=2.0, max=1.5)
+    assert data['stages']['parse'] == dict(calls=1, total=0.25, max=0.25)
+    assert data['counts'] == dict(bytes_fetched=150)
+    assert data['sources'][_SRC] == dict(stages=dict(fetch=dict(calls=1, total=0.5, max=0.5)),
+                                         counts=dict(bytes_fetched=100))
+    assert data['duration'] >= 0
+
+
+def test_prometheus():
+    lines = _stats().toPrometheus().splitlines()
+    assert '# TYPE feeder_stage_seconds_total counter' in lines
+    assert 'feeder_stage_seconds_total{stage="fetch"} 2.0' in lines
+    assert 'feeder_stage_calls_total{stage="parse"} 1.0' in lines
+    assert 'feeder_count_total{name="bytes_fetched"} 150.0' in lines
+    # Label values are escaped
+    assert ('feeder_source_count_total{source="http://a.com/feed?x=\\"1\\"",name="bytes_fetched"} '
+            '100.0') in lines
+    with pytest.raises(ValueError):
+        _stats().dump('unused', 'xml')
+
+
+def test_threads():
+    """Timers and counters from many threads are all recorded.
+    """
+    stats = Stats.Stats()
+
+    def _work():
+        for _ in range(1000):
+            with stats.timer('work', 'src'):
+                stats.count('items', 1, 'src')
+
+    threads = [threading.Thread(target=_work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    data = stats.toDict()
+    assert data['stages']['work']['calls'] == 8000
+    assert data['counts']['items'] == 8000
+    assert data['sources']['src']['counts']['items'] == 8000